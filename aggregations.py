@@ -0,0 +1,103 @@
+import polars as pl
+
+from category_hierarchy import CATEGORY_COLUMNS
+
+# Claves del cubo pre-agregado
+CUBE_KEYS = ['Anio', 'Clasificacion']
+
+# Número de filas originales que resume cada celda del cubo
+CUBE_COUNT_COLUMN = 'Num_Registros'
+
+def get_cube_value_columns(df):
+    """
+    Columnas aditivas que se pueden sumar en el cubo.
+    Los porcentajes de contribución y las columnas del índice de categorías no son aditivos, por lo que se excluyen.
+    """
+    return [
+        col for col, dtype in df.schema.items()
+        if col not in CUBE_KEYS and col != CUBE_COUNT_COLUMN and col not in CATEGORY_COLUMNS and dtype.is_numeric()
+        and not col.endswith('_porcentaje_contribucion')
+    ]
+
+def build_emissions_cube(df):
+    """
+    Construye el cubo de sumas y conteos por (Anio, Clasificacion) para todas las columnas de emisiones.
+
+    El cubo conserva los mismos nombres de columna que los datos procesados, por lo que
+    las funciones de gráficos que agrupan por `Anio` o `Clasificacion` y suman una
+    columna de emisiones producen el mismo resultado sobre el cubo que sobre las filas.
+    Las sumas se acumulan en Float64 aunque los datos usen el esquema compacto (Float32).
+    """
+    value_cols = get_cube_value_columns(df)
+    # Las columnas del índice de categorías son constantes por clasificación y se conservan tal cual
+    category_cols = [col for col in CATEGORY_COLUMNS if col in df.columns]
+    return df.group_by(CUBE_KEYS).agg(
+        [pl.col(col).cast(pl.Float64).sum().alias(col) for col in value_cols]
+        + [pl.len().alias(CUBE_COUNT_COLUMN)]
+        + [pl.first(col).alias(col) for col in category_cols]
+    ).sort(CUBE_KEYS)
+
+def update_emissions_cube(cube, delta_cube):
+    """
+    Incorpora al cubo las sumas y conteos de un cubo de filas nuevas.
+
+    Solo se recalculan las celdas (Anio, Clasificacion) presentes en el delta; el resto
+    del cubo se conserva tal cual. Las columnas de valores del delta deben coincidir con
+    las del cubo.
+    """
+    value_cols = get_cube_value_columns(cube)
+    affected = delta_cube.select(CUBE_KEYS)
+    untouched = cube.join(affected, on=CUBE_KEYS, how='anti')
+    merged = pl.concat([
+        cube.join(affected, on=CUBE_KEYS, how='semi'),
+        delta_cube.select(cube.columns)
+    ]).group_by(CUBE_KEYS).agg(
+        [pl.sum(col).alias(col) for col in value_cols + [CUBE_COUNT_COLUMN]]
+        + [pl.first(col).alias(col) for col in cube.columns if col in CATEGORY_COLUMNS]
+    ).select(cube.columns)
+    return pl.concat([untouched, merged]).sort(CUBE_KEYS)
+
+def slice_cube(cube, selected_years=None):
+    """
+    Devuelve la porción del cubo para los años seleccionados (todos si no hay selección).
+    """
+    if not selected_years:
+        return cube
+    return cube.filter(pl.col('Anio').is_in(selected_years))
+
+def cube_totals(cube, columns):
+    """
+    Totales de las columnas indicadas sobre una porción del cubo, en una sola pasada.
+    """
+    return cube.select([pl.sum(col) for col in columns]).row(0, named=True)
+
+def yearly_totals(df, columns):
+    """
+    Suma anual de las columnas indicadas, ordenada por año.
+    """
+    return df.group_by('Anio').agg([pl.sum(col).alias(col) for col in columns]).sort('Anio')
+
+def classification_totals(df, emission_col, top_n=None):
+    """
+    Suma de `emission_col` por clasificación como `Suma_Total_Emisiones`, de mayor a menor
+    (solo las `top_n` primeras si se indica).
+    """
+    totals = df.group_by('Clasificacion').agg(
+        pl.sum(emission_col).alias('Suma_Total_Emisiones')
+    ).sort('Suma_Total_Emisiones', descending=True)
+    return totals if top_n is None else totals.head(top_n)
+
+def section_results(df, emission_col, gas_cols):
+    """
+    Agregados que necesita una sección del dashboard (métricas, tendencia, gases y
+    clasificaciones) para una porción del cubo, como diccionario nombre -> DataFrame.
+
+    `clasificaciones` contiene la clasificación completa; el top N de la sección es
+    un `head(top_n)` sin copia, así que el valor de N no forma parte del cálculo.
+    """
+    columns = [emission_col] + [col for col in gas_cols if col != emission_col]
+    return {
+        'totales': df.select([pl.sum(col) for col in columns]),
+        'anual': yearly_totals(df, columns),
+        'clasificaciones': classification_totals(df, emission_col)
+    }
@@ -0,0 +1,397 @@
+"""
+API HTTP local, sin Streamlit, con los mismos agregados que el dashboard.
+
+Un único dataset en memoria (datos procesados, cubo por año y clasificación e índice
+de categorías, abiertos desde la caché Arrow de `data_cache`) se comparte entre todas
+las conexiones, que se atienden en hilos (`ThreadingHTTPServer`, con keep-alive). Los
+resultados se memorizan en una `ResultCache` común, con la versión del dataset en la clave.
+
+Endpoints:
+    GET  /health
+    GET  /yearly_totals?years=1990,2000-2005&columns=Total_Emisiones,CO2_eq
+    GET  /top_classifications?column=Total_GWP_weighted&top_n=10
+    GET  /weighted_statistics?years=2010-2020&only_leaves=0
+    POST /batch  {"queries": [{"query": "yearly_totals", "years": [2010, 2011]}, ...]}
+
+Filtros comunes: `years` (lista o rangos), `only_leaves` (por defecto 1, como el dashboard)
+y `sectors` (códigos IPCC, por ejemplo `1.A.1,2`). Con `format=arrow` (o la cabecera
+`Accept: application/vnd.apache.arrow.stream`) la respuesta es un stream Arrow IPC: la
+propia tabla si el resultado tiene una sola, o si no una tabla con las columnas `query`,
+`name` e `ipc` (cada tabla serializada como stream IPC).
+
+Uso:
+    python api_server.py data/proyecto2.csv --port 8000
+"""
+import argparse
+import io
+import json
+import os
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import polars as pl
+
+from aggregations import slice_cube, yearly_totals, classification_totals, get_cube_value_columns
+from category_hierarchy import build_category_index, attach_category_index, leaves_only, filter_subtrees
+from data_cache import load_cached_processed_data, load_cached_emissions_cube, get_dataset_version
+from enhanced_data_processing import calculate_weighted_statistics
+from result_cache import ResultCache
+
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+
+DEFAULT_COLUMNS = ['Total_Emisiones', 'CH4_eq', 'CO2_eq', 'N2O_eq']
+
+# Tamaño máximo del cuerpo de una petición POST
+MAX_BODY_BYTES = 1024 * 1024
+
+class EmissionsDataset:
+    """
+    Dataset compartido por todas las conexiones. Los DataFrames no se modifican, así que
+    los hilos los leen sin bloqueo; para recargar se crea otro `EmissionsDataset` y se
+    sustituye la referencia del servidor de una vez (cada petición usa el que leyó al empezar).
+    """
+
+    def __init__(self, file_path, compact=True, results=None):
+        self.file_path = file_path
+        self.compact = compact
+        self.results = results if results is not None else ResultCache()
+        self.version = get_dataset_version(file_path, compact=compact)
+        df = load_cached_processed_data(file_path, compact=compact)
+        self.category_index = build_category_index(df['Clasificacion'].unique().to_list())
+        self.rows = attach_category_index(df, self.category_index)
+        self.cube = attach_category_index(load_cached_emissions_cube(file_path, compact=compact), self.category_index)
+
+    def is_current(self):
+        """
+        Indica si la fuente sigue en la misma versión (no hay deltas ingeridos desde la carga).
+        """
+        return get_dataset_version(self.file_path, compact=self.compact) == self.version
+
+    def filtered(self, source, filters):
+        """
+        Porción del cubo (`source='cube'`) o de las filas (`source='rows'`) según los filtros.
+        """
+        def compute():
+            df = self.cube if source == 'cube' else self.rows
+            if filters['years']:
+                df = slice_cube(df, filters['years'])
+            if filters['sectors']:
+                df = filter_subtrees(df, self.category_index, filters['sectors'])
+            return leaves_only(df) if filters['only_leaves'] else df
+        return self.results.get_or_compute((self.version, source) + _filters_key(filters), compute)
+
+def _filters_key(filters):
+    return (tuple(filters['years']), filters['only_leaves'], tuple(filters['sectors']))
+
+# Consultas: cada una recibe el dataset y los parámetros ya normalizados y devuelve nombre -> DataFrame
+
+def query_yearly_totals(dataset, params):
+    columns = _split(params.get('columns')) or DEFAULT_COLUMNS
+    _check_columns(dataset.cube, columns)
+    return {'anual': yearly_totals(dataset.filtered('cube', params), columns)}
+
+def query_top_classifications(dataset, params):
+    column = _first(params.get('column')) or 'Total_Emisiones'
+    _check_columns(dataset.cube, [column])
+    top_n = _to_int(params.get('top_n'), 10, 'top_n')
+    if top_n < 1:
+        raise ValueError(f"El parámetro 'top_n' debe ser al menos 1: {top_n}")
+    return {'clasificaciones': classification_totals(dataset.filtered('cube', params), column, top_n)}
+
+def query_weighted_statistics(dataset, params):
+    stats = calculate_weighted_statistics(dataset.filtered('rows', params))
+    scalars = {name: [value] for name, value in stats.items() if not isinstance(value, pl.DataFrame)}
+    return {
+        'totales': pl.DataFrame(scalars, schema={name: pl.Float64 for name in scalars}),
+        'anual': stats['emissions_by_year'],
+        'clasificaciones': stats['top_classifications']
+    }
+
+QUERIES = {
+    'yearly_totals': query_yearly_totals,
+    'top_classifications': query_top_classifications,
+    'weighted_statistics': query_weighted_statistics
+}
+
+# Lectura de parámetros: admiten tanto la query string (listas de cadenas) como JSON
+
+def _first(value):
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+def _split(value):
+    """
+    Lista a partir de `a,b`, de parámetros repetidos o de una lista JSON.
+    """
+    if value is None:
+        return []
+    items = value if isinstance(value, list) else [value]
+    result = []
+    for item in items:
+        result += [part.strip() for part in item.split(',')] if isinstance(item, str) else [item]
+    return [item for item in result if item != '']
+
+def _to_int(value, default, name):
+    value = _first(value)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"El parámetro '{name}' debe ser un entero: {value!r}")
+
+def _parse_years(value):
+    years = set()
+    for item in _split(value):
+        text = str(item)
+        if '-' in text:
+            start, end = (_to_int(part, None, 'years') for part in text.split('-', 1))
+            if start > end:
+                # Un rango vacío dejaría la lista sin años, que equivale a no filtrar
+                raise ValueError(f"Rango de años no válido en 'years': {text!r}")
+            years.update(range(start, end + 1))
+        else:
+            years.add(_to_int(text, None, 'years'))
+    return sorted(years)
+
+def _parse_bool(value, default):
+    value = _first(value)
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() not in ('0', 'false', 'no')
+
+def _check_columns(cube, columns):
+    unknown = [col for col in columns if col not in get_cube_value_columns(cube)]
+    if unknown:
+        raise ValueError(f"Columnas desconocidas: {unknown}. Disponibles: {get_cube_value_columns(cube)}")
+
+def _check_sectors(category_index, sectors):
+    # Un código inexistente no es un filtro vacío: devolvería un resultado vacío sin avisar
+    known = set(category_index['Categoria_codigo'].drop_nulls().to_list())
+    unknown = [code for code in sectors if code not in known]
+    if unknown:
+        raise ValueError(f"Códigos de sector desconocidos: {unknown}")
+
+def normalize_params(params):
+    """
+    Normaliza los filtros comunes (`years`, `only_leaves`, `sectors`) y conserva el resto.
+    """
+    normalized = dict(params)
+    normalized['years'] = _parse_years(params.get('years'))
+    normalized['only_leaves'] = _parse_bool(params.get('only_leaves'), True)
+    normalized['sectors'] = sorted(str(code) for code in _split(params.get('sectors')))
+    return normalized
+
+def run_query(dataset, name, params):
+    """
+    Ejecuta la consulta `name` con memorización en la caché de resultados del dataset.
+    """
+    if name not in QUERIES:
+        raise ValueError(f"Consulta desconocida: '{name}'. Disponibles: {sorted(QUERIES)}")
+    params = normalize_params(params)
+    _check_sectors(dataset.category_index, params['sectors'])
+    extra = tuple(sorted((key, tuple(str(item) for item in _split(value))) for key, value in params.items()
+                         if key not in ('years', 'only_leaves', 'sectors', 'format', 'query')))
+    key = (dataset.version, 'consulta', name) + _filters_key(params) + extra
+    return dataset.results.get_or_compute(key, lambda: QUERIES[name](dataset, params))
+
+# Serialización
+
+def _portable(df):
+    # Enum/Categorical como texto para que cualquier cliente Arrow (o JSON) lea las etiquetas
+    return df.with_columns(
+        pl.col(name).cast(pl.String) for name, dtype in df.schema.items()
+        if isinstance(dtype, (pl.Enum, pl.Categorical))
+    )
+
+def _ipc_bytes(df):
+    buffer = io.BytesIO()
+    _portable(df).write_ipc_stream(buffer, compression="uncompressed")
+    return buffer.getvalue()
+
+def to_json_payload(frames):
+    # Los NaN (por ejemplo, promedios de 0/0) no son JSON válido: se envían como null
+    return {name: _portable(df).fill_nan(None).to_dicts() for name, df in frames.items()}
+
+def to_arrow_payload(results):
+    """
+    `results` es una lista de diccionarios nombre -> DataFrame (uno por consulta).
+    """
+    if len(results) == 1 and len(results[0]) == 1:
+        return _ipc_bytes(next(iter(results[0].values())))
+    envelope = pl.DataFrame({
+        'query': [i for i, frames in enumerate(results) for _ in frames],
+        'name': [name for frames in results for name in frames],
+        'ipc': [_ipc_bytes(df) for frames in results for df in frames.values()]
+    }, schema={'query': pl.UInt32, 'name': pl.String, 'ipc': pl.Binary})
+    return _ipc_bytes(envelope)
+
+def read_arrow_payload(data):
+    """
+    Operación inversa de `to_arrow_payload` para los clientes en Python: devuelve una
+    lista (una entrada por consulta) de diccionarios nombre -> DataFrame.
+    """
+    df = pl.read_ipc_stream(io.BytesIO(data))
+    if df.columns != ['query', 'name', 'ipc']:
+        return [{'resultado': df}]
+    results = {}
+    for query, name, ipc in df.iter_rows():
+        results.setdefault(query, {})[name] = pl.read_ipc_stream(io.BytesIO(ipc))
+    return [results[query] for query in sorted(results)]
+
+class EmissionsRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: cada conexión reutiliza su hilo
+    server_version = "EmisionesAPI/1.0"
+    # Cabeceras y cuerpo van en escrituras separadas: sin TCP_NODELAY, Nagle y el ACK
+    # retardado del cliente añaden ~40 ms a cada respuesta en una conexión keep-alive
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _wants_arrow(self, params):
+        requested = _first(params.get('format'))
+        if requested is not None:
+            return str(requested).lower() == 'arrow'
+        return ARROW_MIME in self.headers.get('Accept', '')
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload, ensure_ascii=False, default=str).encode(), "application/json; charset=utf-8")
+
+    def _send_server_error(self, error):
+        # Cualquier otro fallo (de Polars, de serialización...) responde 500 en lugar de cortar la conexión
+        traceback.print_exc()
+        self.close_connection = True
+        try:
+            self._send_json(500, {'error': f"Error interno: {type(error).__name__}: {error}"})
+        except OSError:
+            pass
+
+    def _content_length(self):
+        value = self.headers.get('Content-Length', '0')
+        try:
+            length = int(value)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # El cuerpo no se puede leer: la conexión no puede reutilizarse
+            self.close_connection = True
+            raise ValueError(f"Cabecera Content-Length no válida: {value!r}")
+        return length
+
+    def _send_results(self, results, params, batch):
+        if self._wants_arrow(params):
+            self._send(200, to_arrow_payload(results), ARROW_MIME)
+        elif batch:
+            self._send_json(200, {'results': [to_json_payload(frames) for frames in results]})
+        else:
+            self._send_json(200, to_json_payload(results[0]))
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        name = url.path.strip('/')
+        params = parse_qs(url.query)
+        dataset = self.server.dataset
+        try:
+            if name == 'health':
+                self._send_json(200, {'version': dataset.version, 'rows': dataset.rows.height,
+                                      'cube_rows': dataset.cube.height, 'cache': dataset.results.stats()})
+                return
+            if name not in QUERIES:
+                self._send_json(404, {'error': f"Ruta desconocida: '{url.path}'"})
+                return
+            self._send_results([run_query(dataset, name, params)], params, batch=False)
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            self._send_server_error(e)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path.strip('/') != 'batch':
+            self._send_json(404, {'error': f"Ruta desconocida: '{url.path}'"})
+            return
+        try:
+            length = self._content_length()
+            if length > MAX_BODY_BYTES:
+                self.close_connection = True
+                self._send_json(413, {'error': f"El cuerpo supera {MAX_BODY_BYTES} bytes"})
+                return
+            body = json.loads(self.rfile.read(length) or b'{}')
+            queries = body.get('queries') if isinstance(body, dict) else None
+            if not isinstance(queries, list) or not queries or not all(isinstance(query, dict) for query in queries):
+                raise ValueError("Se esperaba {'queries': [{'query': ..., ...}, ...]}")
+            params = {'format': body.get('format')} if body.get('format') else parse_qs(url.query)
+            results = [run_query(self.server.dataset, query.get('query'), query) for query in queries]
+            self._send_results(results, params, batch=True)
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            self._send_server_error(e)
+
+def create_server(file_path, host="127.0.0.1", port=8000, compact=True, cache_mb=256, verbose=False):
+    """
+    Carga el dataset una vez y devuelve el servidor listo para `serve_forever()`.
+    Con `port=0` el sistema asigna un puerto libre (ver `server.server_address`).
+    """
+    server = ThreadingHTTPServer((host, port), EmissionsRequestHandler)
+    server.daemon_threads = True
+    server.dataset = EmissionsDataset(file_path, compact=compact, results=ResultCache(max_bytes=cache_mb * 1_000_000))
+    server.verbose = verbose
+    return server
+
+def start_background_server(file_path, **kwargs):
+    """
+    Arranca el servidor en un hilo y devuelve `(server, url)`; útil para pruebas de carga.
+    """
+    server = create_server(file_path, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file_path", nargs="?", default="data/proyecto2.csv", help="CSV fuente del inventario")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--full-schema", action="store_true", help="Usar el esquema completo en lugar del compacto")
+    parser.add_argument("--cache-mb", type=int, default=int(os.environ.get("EMISSIONS_RESULT_CACHE_MB", "256")))
+    parser.add_argument("--reload-seconds", type=float, default=0,
+                        help="Comprueba periódicamente si hay deltas nuevos y recarga el dataset (0 = nunca)")
+    parser.add_argument("--verbose", action="store_true", help="Registrar cada petición")
+    args = parser.parse_args()
+
+    server = create_server(args.file_path, args.host, args.port, compact=not args.full_schema,
+                           cache_mb=args.cache_mb, verbose=args.verbose)
+    if args.reload_seconds > 0:
+        def watch():
+            while True:
+                time.sleep(args.reload_seconds)
+                dataset = server.dataset
+                if not dataset.is_current():
+                    # La caché se comparte: las claves llevan la versión, las antiguas acaban expulsadas
+                    server.dataset = EmissionsDataset(dataset.file_path, dataset.compact, dataset.results)
+                    print(f"Dataset recargado: versión {server.dataset.version}")
+        threading.Thread(target=watch, daemon=True).start()
+    host, port = server.server_address[:2]
+    print(f"API de emisiones en http://{host}:{port} ({server.dataset.rows.height} filas, versión {server.dataset.version})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,175 @@
+"""
+Exportación por lotes (sin interfaz) del conjunto completo de gráficos del dashboard.
+
+Genera los gráficos de `main.py` para muchas combinaciones de filtros (año, tipo de
+emisión y subárbol de sector), repartiendo el renderizado en un pool de procesos, y
+escribe HTML y/o JSON de Plotly junto con un `manifest.json` que describe cada archivo.
+
+Uso:
+    python batch_export.py --output reportes --years each --sectors level1 --workers 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import polars as pl
+
+from aggregations import slice_cube
+from category_hierarchy import (build_category_index, attach_category_index, leaves_only, filter_subtrees,
+                                INDUSTRIAL_CATEGORY_CODES)
+from charts import (EMISSION_TYPES, generate_emissions_by_year, generate_emissions_by_gas_type,
+                    generate_top_classifications, generate_pie_chart_by_classification, generate_correlation_heatmap)
+from correlations import correlation_matrix
+from data_cache import load_cached_processed_data, load_cached_emissions_cube
+
+# Estado de cada proceso del pool: los datos se abren una sola vez (memory-map de la caché Arrow)
+_worker_state = {}
+
+def _init_worker(file_path, compact, only_leaves):
+    df = load_cached_processed_data(file_path, compact=compact)
+    index = build_category_index(df['Clasificacion'].unique().to_list())
+    df = attach_category_index(df, index)
+    cube = attach_category_index(load_cached_emissions_cube(file_path, compact=compact), index)
+    if only_leaves:
+        df, cube = leaves_only(df), leaves_only(cube)
+    _worker_state.update(df=df, cube=cube, index=index)
+
+def build_chart_set(df, cube, index, emission_type, top_n=10, top_n_industry=5):
+    """
+    Construye el conjunto de gráficos del dashboard para unos datos ya filtrados.
+    Devuelve un diccionario nombre -> figura de Plotly.
+    """
+    emission_col, gas_cols, title_suffix = EMISSION_TYPES[emission_type]
+    figures = {
+        'tendencia_anual': generate_emissions_by_year(cube, emission_col, title_suffix),
+        'emisiones_por_gas': generate_emissions_by_gas_type(cube, gas_cols, title_suffix),
+        'top_clasificaciones': generate_top_classifications(cube, emission_col, top_n, title_suffix),
+        'distribucion_clasificaciones': generate_pie_chart_by_classification(cube, emission_col, title_suffix),
+        'correlacion_gases': generate_correlation_heatmap(correlation_matrix(df))
+    }
+    industrial = filter_subtrees(cube, index, INDUSTRIAL_CATEGORY_CODES)
+    if not industrial.is_empty():
+        industrial_suffix = f"{title_suffix} (Industrial)"
+        figures['industrial_top'] = generate_top_classifications(industrial, emission_col, top_n_industry, industrial_suffix)
+        figures['industrial_tendencia'] = generate_emissions_by_year(industrial, emission_col, industrial_suffix)
+        figures['industrial_por_gas'] = generate_emissions_by_gas_type(industrial, gas_cols, industrial_suffix)
+    return figures
+
+def _job_id(job):
+    years = 'todos' if job['years'] is None else '-'.join(str(year) for year in job['years'])
+    emission = EMISSION_TYPES[job['emission_type']][0]
+    sector = job['sector'] or 'todos'
+    return f"anio={years}/tipo={emission}/sector={sector}"
+
+def _render_job(job, output_dir, formats, top_n, top_n_industry):
+    """
+    Filtra los datos del proceso según el trabajo, renderiza sus gráficos y los escribe en disco.
+    """
+    df, cube, index = _worker_state['df'], _worker_state['cube'], _worker_state['index']
+    cube = slice_cube(cube, job['years'])
+    if job['years']:
+        df = df.filter(pl.col('Anio').is_in(job['years']))
+    if job['sector']:
+        cube = filter_subtrees(cube, index, [job['sector']])
+        df = filter_subtrees(df, index, [job['sector']])
+
+    job_id = _job_id(job)
+    job_dir = os.path.join(output_dir, job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    files = []
+    if cube.is_empty():
+        return {'id': job_id, **job, 'files': files, 'empty': True}
+    for name, fig in build_chart_set(df, cube, index, job['emission_type'], top_n, top_n_industry).items():
+        if 'html' in formats:
+            fig.write_html(os.path.join(job_dir, f"{name}.html"), include_plotlyjs="cdn")
+            files.append(f"{job_id}/{name}.html")
+        if 'json' in formats:
+            with open(os.path.join(job_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+                f.write(fig.to_json())
+            files.append(f"{job_id}/{name}.json")
+    return {'id': job_id, **job, 'files': files, 'empty': False}
+
+def build_jobs(years, sector_codes, emission_types=None):
+    """
+    Producto cartesiano de filtros: cada elemento de `years` es una tupla de años (o None
+    para todos) y cada elemento de `sector_codes` un código IPCC (o None para todos).
+    """
+    return [
+        {'years': list(year_set) if year_set else None, 'emission_type': emission_type, 'sector': sector}
+        for year_set in years
+        for emission_type in (emission_types or list(EMISSION_TYPES))
+        for sector in sector_codes
+    ]
+
+def export_charts(file_path, output_dir, jobs, formats=('html', 'json'), workers=None,
+                  compact=True, only_leaves=True, top_n=10, top_n_industry=5):
+    """
+    Renderiza todos los trabajos en un pool de procesos y escribe el manifiesto.
+    Devuelve el manifiesto como diccionario. Un trabajo que falla no detiene la exportación:
+    queda en el manifiesto como `{'job': ..., 'error': ...}` (y en `failed`, su número).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    # Preparar la caché en disco antes de lanzar los procesos, para que todos la abran con memory-map
+    load_cached_emissions_cube(file_path, compact=compact)
+    start = time.perf_counter()
+    # "spawn" en lugar de "fork": polars mantiene un pool de hilos que no sobrevive a un fork
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker,
+                             initargs=(file_path, compact, only_leaves)) as pool:
+        futures = [pool.submit(_render_job, job, output_dir, formats, top_n, top_n_industry) for job in jobs]
+        entries = []
+        for job, future in zip(jobs, futures):
+            try:
+                entries.append(future.result())
+            except Exception as e:
+                entries.append({'job': job, 'error': f"{type(e).__name__}: {e}"})
+    manifest = {
+        'source': file_path,
+        'generated_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'elapsed_seconds': round(time.perf_counter() - start, 3),
+        'only_leaves': only_leaves,
+        'formats': list(formats),
+        'failed': sum('error' in entry for entry in entries),
+        'jobs': entries
+    }
+    with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default="data/proyecto2.csv", help="CSV fuente del inventario")
+    parser.add_argument("--output", default="reportes", help="Directorio de salida")
+    parser.add_argument("--years", choices=["all", "each", "both"], default="both",
+                        help="Todos los años juntos, cada año por separado o ambos")
+    parser.add_argument("--sectors", choices=["all", "level1", "both"], default="both",
+                        help="Sin filtro de sector, cada sector IPCC de nivel 1 o ambos")
+    parser.add_argument("--format", nargs="+", choices=["html", "json"], default=["html", "json"])
+    parser.add_argument("--workers", type=int, default=None, help="Procesos del pool (por defecto, número de CPUs)")
+    parser.add_argument("--include-parents", action="store_true", help="Sumar también categorías padre (doble conteo)")
+    parser.add_argument("--top-n", type=int, default=10)
+    args = parser.parse_args()
+
+    df = load_cached_processed_data(args.file, compact=True)
+    index = build_category_index(df['Clasificacion'].unique().to_list())
+    available_years = sorted(df['Anio'].unique().to_list())
+    year_sets = ([None] if args.years in ("all", "both") else []) + \
+                ([(year,) for year in available_years] if args.years in ("each", "both") else [])
+    level1 = index.filter(pl.col('Categoria_nivel') == 1)['Categoria_codigo'].unique().sort().to_list()
+    sector_codes = ([None] if args.sectors in ("all", "both") else []) + \
+                   (level1 if args.sectors in ("level1", "both") else [])
+
+    jobs = build_jobs(year_sets, sector_codes)
+    manifest = export_charts(args.file, args.output, jobs, formats=args.format, workers=args.workers,
+                             only_leaves=not args.include_parents, top_n=args.top_n)
+    n_files = sum(len(job.get('files', [])) for job in manifest['jobs'])
+    print(f"{len(jobs)} combinaciones, {n_files} archivos en {manifest['elapsed_seconds']:.1f} s -> {args.output}/manifest.json")
+    if manifest['failed']:
+        for entry in manifest['jobs']:
+            if 'error' in entry:
+                print(f"Error en {entry['job']}: {entry['error']}", file=sys.stderr)
+        sys.exit(f"{manifest['failed']} de {len(jobs)} combinaciones fallaron (detalle en el manifiesto)")
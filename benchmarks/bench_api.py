@@ -0,0 +1,149 @@
+"""
+Prueba de carga de `api_server.py`: varios clientes concurrentes, cada uno con su propia
+conexión keep-alive, lanzan una mezcla de consultas con filtros de años aleatorios.
+Informa del rendimiento (peticiones/s) y de los percentiles de latencia p50/p95/p99 por
+endpoint.
+
+Sin `--url` arranca el servidor en este mismo proceso, en un puerto libre, y antes de la
+prueba de carga comprueba que `/weighted_statistics` (con el esquema compacto por defecto
+del servidor) coincide con `calculate_weighted_statistics` sobre las filas en Float64.
+
+Uso:
+    python benchmarks/bench_api.py [--clients 1 8 32] [--requests 2000] [--format json]
+    python benchmarks/bench_api.py --url http://127.0.0.1:8000 --clients 16
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from urllib.parse import urlsplit, urlencode
+
+import numpy as np
+import polars as pl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_server import read_arrow_payload, start_background_server  # noqa: E402
+from bench_streaming import COMPACT_REL_TOL, same_stats  # noqa: E402
+from enhanced_data_processing import process_data_with_weighting, calculate_weighted_statistics  # noqa: E402
+
+YEARS = list(range(1990, 2022))
+
+def random_filters(rng):
+    start = rng.choice(YEARS)
+    return {'years': f"{start}-{min(start + rng.randint(0, 10), YEARS[-1])}", 'only_leaves': rng.choice(['1', '0'])}
+
+def random_request(rng, fmt, distinct):
+    """
+    Devuelve (endpoint, método, ruta, cuerpo). Con `distinct` pequeño se repiten los filtros
+    y la mayoría de las peticiones acierta en la caché de resultados del servidor.
+    """
+    rng = random.Random(rng.randrange(distinct))
+    kind = rng.choice(['yearly_totals', 'top_classifications', 'weighted_statistics', 'batch'])
+    filters = random_filters(rng)
+    if kind == 'batch':
+        body = {'format': fmt, 'queries': [
+            {'query': 'yearly_totals', **filters},
+            {'query': 'top_classifications', 'column': 'Total_GWP_weighted', **filters},
+            {'query': 'weighted_statistics', **filters}
+        ]}
+        return kind, 'POST', '/batch', json.dumps(body).encode()
+    params = {**filters, 'format': fmt}
+    if kind == 'top_classifications':
+        params['top_n'] = rng.choice([5, 10, 20])
+    return kind, 'GET', f"/{kind}?{urlencode(params)}", None
+
+def run_client(base_url, count, fmt, distinct, seed, latencies, errors):
+    url = urlsplit(base_url)
+    connection = http.client.HTTPConnection(url.hostname, url.port)
+    connection.connect()
+    # http.client envía las cabeceras y el cuerpo del POST por separado
+    connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    rng = random.Random(seed)
+    for _ in range(count):
+        kind, method, path, body = random_request(rng, fmt, distinct)
+        start = time.perf_counter()
+        connection.request(method, path, body=body, headers={'Content-Type': 'application/json'} if body else {})
+        response = connection.getresponse()
+        response.read()
+        latencies.setdefault(kind, []).append(time.perf_counter() - start)
+        if response.status != 200:
+            errors.append((kind, response.status))
+    connection.close()
+
+def load_test(base_url, clients, total_requests, fmt, distinct):
+    per_client = max(1, total_requests // clients)
+    results = [({}, []) for _ in range(clients)]
+    threads = [threading.Thread(target=run_client, args=(base_url, per_client, fmt, distinct, i, *results[i]))
+               for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = {}
+    for client_latencies, _ in results:
+        for kind, values in client_latencies.items():
+            latencies.setdefault(kind, []).extend(values)
+    errors = [error for _, client_errors in results for error in client_errors]
+    return per_client * clients / elapsed, latencies, errors
+
+def check_weighted_statistics(base_url, file_path):
+    """
+    Compara `/weighted_statistics` (en Arrow, sin filtro de hojas, con y sin filtro de años)
+    con `calculate_weighted_statistics` sobre las filas procesadas con el esquema completo.
+    """
+    url = urlsplit(base_url)
+    connection = http.client.HTTPConnection(url.hostname, url.port)
+    full_df = process_data_with_weighting(file_path)
+    for years in [None, (2010, 2020)]:
+        params = {'only_leaves': '0', 'format': 'arrow'}
+        expected = full_df
+        if years is not None:
+            params['years'] = f"{years[0]}-{years[1]}"
+            expected = full_df.filter(pl.col('Anio').is_between(*years))
+        connection.request('GET', f"/weighted_statistics?{urlencode(params)}")
+        response = connection.getresponse()
+        body = response.read()
+        assert response.status == 200, f"/weighted_statistics respondió {response.status}: {body[:200]!r}"
+        frames = read_arrow_payload(body)[0]
+        received = {**frames['totales'].row(0, named=True),
+                    'emissions_by_year': frames['anual'], 'top_classifications': frames['clasificaciones']}
+        assert same_stats(calculate_weighted_statistics(expected), received, COMPACT_REL_TOL), \
+            f"/weighted_statistics ({params.get('years', 'todos los años')}) no coincide con calculate_weighted_statistics"
+    connection.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="Servidor ya arrancado (por defecto se arranca uno local)")
+    parser.add_argument("--file-path", default="data/proyecto2.csv")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=2000, help="Peticiones totales por ronda")
+    parser.add_argument("--format", choices=["json", "arrow"], default="json")
+    parser.add_argument("--distinct", type=int, default=200, help="Combinaciones de filtros distintas")
+    args = parser.parse_args()
+
+    base_url = args.url
+    if base_url is None:
+        _, base_url = start_background_server(args.file_path, port=0)
+        check_weighted_statistics(base_url, args.file_path)
+
+    print(f"{'clientes':>8} {'endpoint':>22} {'peticiones':>11} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}")
+    for clients in args.clients:
+        throughput, latencies, errors = load_test(base_url, clients, args.requests, args.format, args.distinct)
+        all_latencies = [value for values in latencies.values() for value in values]
+        for kind, values in sorted(latencies.items()) + [("total", all_latencies)]:
+            p50, p95, p99 = np.percentile(np.array(values) * 1e3, [50, 95, 99])
+            print(f"{clients:>8} {kind:>22} {len(values):>11} {p50:>9.2f} {p95:>9.2f} {p99:>9.2f}")
+        print(f"{clients:>8} {'rendimiento':>22} {throughput:>11.0f} peticiones/s"
+              + (f", {len(errors)} errores" if errors else ""))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Latencia y memoria por gráfico: funciones originales (agregación en Polars + `to_pandas()`
++ Plotly Express) frente a los constructores de `charts.py` (arrays de NumPy directos a
+Plotly graph objects), sobre el cubo pre-agregado y sobre las filas procesadas escaladas.
+
+La memoria se mide como el pico de asignaciones de Python durante la construcción
+(`tracemalloc`, que incluye los buffers de NumPy y pandas pero no los de Polars).
+
+Uso:
+    python benchmarks/bench_charts.py [--scales 1 10] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import plotly.express as px
+import polars as pl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregations import build_emissions_cube  # noqa: E402
+from charts import (generate_emissions_by_year, generate_emissions_by_gas_type, generate_top_classifications,  # noqa: E402
+                    generate_pie_chart_by_classification, generate_correlation_heatmap)
+from correlations import correlation_matrix  # noqa: E402
+from enhanced_data_processing import process_data_with_weighting  # noqa: E402
+from synthetic import write_scaled_csv  # noqa: E402
+
+GAS_COLS = ["CH4_eq", "CO2_eq", "N2O_eq"]
+
+# Implementaciones anteriores de los gráficos, conservadas como referencia
+
+def legacy_emissions_by_year(df, emission_col):
+    emisiones_por_anio = df.group_by("Anio").agg(pl.sum(emission_col).alias("Total_Emisiones_Anual")).sort("Anio")
+    return px.line(emisiones_por_anio.to_pandas(), x="Anio", y="Total_Emisiones_Anual",
+                   labels={"Anio": "Año", "Total_Emisiones_Anual": "Emisiones Totales (CO2eq)"})
+
+def legacy_emissions_by_gas_type(df, gas_cols):
+    emisiones_gases_por_anio = df.group_by("Anio").agg([pl.sum(col).alias(col) for col in gas_cols]).sort("Anio")
+    long = emisiones_gases_por_anio.to_pandas().melt(id_vars=["Anio"], value_vars=gas_cols,
+                                                      var_name="Tipo_Gas", value_name="Emisiones")
+    return px.area(long, x="Anio", y="Emisiones", color="Tipo_Gas")
+
+def legacy_top_classifications(df, emission_col, top_n=10):
+    top = df.group_by("Clasificacion").agg(pl.sum(emission_col).alias("Suma_Total_Emisiones")) \
+        .sort("Suma_Total_Emisiones", descending=True).head(top_n)
+    return px.bar(top.to_pandas(), x="Suma_Total_Emisiones", y="Clasificacion", orientation="h")
+
+def legacy_pie_chart(df, emission_col):
+    totals = df.group_by("Clasificacion").agg(pl.sum(emission_col).alias("Suma_Total_Emisiones")) \
+        .sort("Suma_Total_Emisiones", descending=True)
+    return px.pie(totals.to_pandas(), values="Suma_Total_Emisiones", names="Clasificacion", hole=0.3)
+
+def legacy_correlation_heatmap(df):
+    return px.imshow(df.select(GAS_COLS).to_pandas().corr(), text_auto=True, aspect="auto")
+
+CHARTS = {
+    "tendencia_anual": (lambda df: legacy_emissions_by_year(df, "Total_Emisiones"),
+                        lambda df: generate_emissions_by_year(df, "Total_Emisiones")),
+    "emisiones_por_gas": (lambda df: legacy_emissions_by_gas_type(df, GAS_COLS),
+                          lambda df: generate_emissions_by_gas_type(df, GAS_COLS)),
+    "top_clasificaciones": (lambda df: legacy_top_classifications(df, "Total_Emisiones"),
+                            lambda df: generate_top_classifications(df, "Total_Emisiones")),
+    "distribucion": (lambda df: legacy_pie_chart(df, "Total_Emisiones"),
+                     lambda df: generate_pie_chart_by_classification(df, "Total_Emisiones")),
+    "correlacion": (legacy_correlation_heatmap,
+                    lambda df: generate_correlation_heatmap(correlation_matrix(df)))
+}
+
+def trace_values(fig):
+    """
+    Valores numéricos de las trazas, ordenados por nombre, para comparar ambas implementaciones.
+    """
+    values = []
+    for trace in sorted(fig.data, key=lambda trace: trace.name or ""):
+        for attr in ("x", "y", "values", "z"):
+            data = getattr(trace, attr, None)
+            if data is not None:
+                array = np.asarray(data)
+                if array.dtype.kind in "fiu":
+                    values.append(np.sort(array.astype(np.float64), axis=None))
+    return values
+
+def measure(func, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fig = func(df)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func(df)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak, fig
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'datos':>12} {'gráfico':>20} {'original (ms)':>14} {'nuevo (ms)':>11} {'aceleración':>12} "
+          f"{'original (KB)':>14} {'nuevo (KB)':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            df = process_data_with_weighting(write_scaled_csv(scale, os.path.join(tmp, f"proyecto2_x{scale}.csv")))
+            inputs = {f"filas {scale}x": df}
+            if scale == args.scales[0]:
+                inputs["cubo"] = build_emissions_cube(df)
+            for label, data in inputs.items():
+                for name, (legacy, new) in CHARTS.items():
+                    if name == "correlacion" and label == "cubo":
+                        continue  # la correlación se calcula sobre filas individuales
+                    legacy_time, legacy_peak, legacy_fig = measure(legacy, data, args.repeat)
+                    new_time, new_peak, new_fig = measure(new, data, args.repeat)
+                    legacy_values, new_values = trace_values(legacy_fig), trace_values(new_fig)
+                    assert len(legacy_values) == len(new_values), f"'{name}' no tiene las mismas trazas"
+                    for a, b in zip(legacy_values, new_values):
+                        assert np.allclose(a, b, equal_nan=True), f"'{name}' no coincide con la versión original"
+                    print(f"{label:>12} {name:>20} {legacy_time * 1e3:>14.2f} {new_time * 1e3:>11.2f} "
+                          f"{legacy_time / new_time:>11.2f}x {legacy_peak / 1024:>14.0f} {new_peak / 1024:>11.0f}")
+
+if __name__ == "__main__":
+    main()
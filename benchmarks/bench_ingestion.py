@@ -0,0 +1,90 @@
+"""
+Compara la ingesta original (lectura ansiosa + un `with_columns` por paso) con el
+plan perezoso de `process_data_with_weighting` sobre datos escalados 1x/10x/100x.
+
+Uso:
+    python benchmarks/bench_ingestion.py [--scales 1 10 100] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import polars as pl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enhanced_data_processing import GWP_VALUES, ENVIRONMENTAL_DAMAGE_FACTORS, process_data_with_weighting  # noqa: E402
+from synthetic import write_scaled_csv  # noqa: E402
+
+def legacy_process_data_with_weighting(file_path):
+    """
+    Implementación anterior (una copia del DataFrame por cada `with_columns`), conservada como referencia.
+    """
+    df = pl.read_csv(file_path)
+    df = df.rename({'AÑO': 'Anio', 'CLASIFICACION': 'Clasificacion'})
+    numeric_cols = ['CH4_eq', 'CO2_eq', 'N2O_eq', 'Total_Emisiones', 'Emisiones_netas']
+    for col in numeric_cols:
+        if col in df.columns:
+            df = df.with_columns(pl.col(col).cast(pl.String).str.replace_all(",", ".").cast(pl.Float64))
+    for col in numeric_cols:
+        if col in df.columns:
+            df = df.with_columns(pl.col(col).fill_null(0))
+    df = df.filter(pl.col('Anio').is_not_null())
+    df = df.with_columns([
+        (pl.col('CO2_eq') * GWP_VALUES['CO2']).alias('CO2_GWP_weighted'),
+        (pl.col('CH4_eq') * GWP_VALUES['CH4']).alias('CH4_GWP_weighted'),
+        (pl.col('N2O_eq') * GWP_VALUES['N2O']).alias('N2O_GWP_weighted')
+    ])
+    df = df.with_columns(
+        (pl.col('CO2_GWP_weighted') + pl.col('CH4_GWP_weighted') + pl.col('N2O_GWP_weighted')).alias('Total_GWP_weighted')
+    )
+    df = df.with_columns([
+        (pl.col('CO2_eq') * ENVIRONMENTAL_DAMAGE_FACTORS['CO2']).alias('CO2_damage_weighted'),
+        (pl.col('CH4_eq') * ENVIRONMENTAL_DAMAGE_FACTORS['CH4']).alias('CH4_damage_weighted'),
+        (pl.col('N2O_eq') * ENVIRONMENTAL_DAMAGE_FACTORS['N2O']).alias('N2O_damage_weighted')
+    ])
+    df = df.with_columns(
+        (pl.col('CO2_damage_weighted') + pl.col('CH4_damage_weighted') + pl.col('N2O_damage_weighted')).alias('Total_damage_weighted')
+    )
+    df = df.with_columns(
+        ((pl.col('Total_GWP_weighted') * 0.7) + (pl.col('Total_damage_weighted') * 0.3)).alias('Impacto_Combinado')
+    )
+    df = df.with_columns([
+        (pl.col('CO2_GWP_weighted') / pl.col('Total_GWP_weighted') * 100).alias('CO2_porcentaje_contribucion'),
+        (pl.col('CH4_GWP_weighted') / pl.col('Total_GWP_weighted') * 100).alias('CH4_porcentaje_contribucion'),
+        (pl.col('N2O_GWP_weighted') / pl.col('Total_GWP_weighted') * 100).alias('N2O_porcentaje_contribucion')
+    ])
+    df = df.with_columns([
+        pl.col('CO2_porcentaje_contribucion').fill_null(0),
+        pl.col('CH4_porcentaje_contribucion').fill_null(0),
+        pl.col('N2O_porcentaje_contribucion').fill_null(0)
+    ])
+    return df
+
+def best_of(func, file_path, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(file_path)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'escala':>7} {'filas':>10} {'original (s)':>13} {'perezoso (s)':>13} {'aceleración':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            csv_path = write_scaled_csv(scale, os.path.join(tmp, f"proyecto2_x{scale}.csv"))
+            legacy_time, legacy_df = best_of(legacy_process_data_with_weighting, csv_path, args.repeat)
+            lazy_time, lazy_df = best_of(process_data_with_weighting, csv_path, args.repeat)
+            assert legacy_df.equals(lazy_df), "Los resultados de ambas rutas no coinciden"
+            print(f"{scale:>6}x {lazy_df.height:>10,} {legacy_time:>13.4f} {lazy_time:>13.4f} {legacy_time / lazy_time:>11.2f}x")
+
+if __name__ == "__main__":
+    main()
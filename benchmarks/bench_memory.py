@@ -0,0 +1,49 @@
+"""
+Mide la memoria del DataFrame procesado con el esquema completo y con el esquema
+compacto (`process_data_with_weighting(..., compact=True)`), sobre el CSV real y
+sobre una expansión sintética, para dimensionar los pods. Comprueba además que
+`calculate_weighted_statistics` devuelve con ambos esquemas los mismos tipos y los
+mismos totales (salvo el redondeo Float32 de cada fila).
+
+Uso:
+    python benchmarks/bench_memory.py [--scales 1 100]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_streaming import COMPACT_REL_TOL, same_stats  # noqa: E402
+from enhanced_data_processing import (  # noqa: E402
+    process_data_with_weighting, estimate_memory_savings, calculate_weighted_statistics
+)
+from synthetic import write_scaled_csv  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 100])
+    args = parser.parse_args()
+
+    print(f"{'escala':>7} {'filas':>10} {'completo (MB)':>14} {'compacto (MB)':>14} {'ahorro':>8} {'máx. error Float32':>19}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            csv_path = write_scaled_csv(scale, os.path.join(tmp, f"proyecto2_x{scale}.csv"))
+            full_df = process_data_with_weighting(csv_path)
+            compact_df = process_data_with_weighting(csv_path, compact=True)
+            full_bytes = full_df.estimated_size()
+            compact_bytes = compact_df.estimated_size()
+            # Error relativo máximo del total ponderado al guardarlo en Float32
+            reference = full_df['Total_GWP_weighted']
+            error = ((compact_df['Total_GWP_weighted'].cast(reference.dtype) - reference).abs()
+                     / reference.abs().clip(lower_bound=1e-9)).max()
+            estimate = estimate_memory_savings(compact_df)
+            assert abs(estimate['full_bytes'] - full_bytes) / full_bytes < 0.05, "La estimación de ahorro se desvía de la medición"
+            assert same_stats(calculate_weighted_statistics(full_df), calculate_weighted_statistics(compact_df),
+                              COMPACT_REL_TOL), "Las estadísticas con el esquema compacto no coinciden con las del completo"
+            print(f"{scale:>6}x {full_df.height:>10,} {full_bytes / 1e6:>14.2f} {compact_bytes / 1e6:>14.2f} "
+                  f"{(1 - compact_bytes / full_bytes) * 100:>7.1f}% {error:>19.2e}")
+
+if __name__ == "__main__":
+    main()
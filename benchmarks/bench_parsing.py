@@ -0,0 +1,89 @@
+"""
+Mide el rendimiento de lectura del CSV: el parseo original de `process_data_for_viz`
+(inferencia de tipos + conversión a texto y vuelta a Float64 columna por columna)
+frente al cargador compartido `csv_loader.load_emissions_csv` (esquema explícito y
+lectura directa como Float64), sobre el CSV incluido y archivos escalados.
+
+También mide el cargador sobre variantes del mismo archivo con coma decimal
+(separador ';' y valores entre comillas con separador ',').
+
+Uso:
+    python benchmarks/bench_parsing.py [--scales 1 10 100] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import polars as pl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csv_loader import load_emissions_csv  # noqa: E402
+from synthetic import scale_dataset  # noqa: E402
+
+def legacy_process_data_for_viz(file_path):
+    """
+    Implementación anterior de `visualization.process_data_for_viz`, conservada como referencia.
+    """
+    df = pl.read_csv(file_path)
+    df = df.rename({'AÑO': 'Anio', 'CLASIFICACION': 'Clasificacion'})
+    numeric_cols = ['CH4_eq', 'CO2_eq', 'N2O_eq', 'Total_Emisiones', 'Emisiones_netas']
+    for col in numeric_cols:
+        if col in df.columns:
+            df = df.with_columns(pl.col(col).cast(pl.String).str.replace_all(",", ".").cast(pl.Float64))
+    for col in numeric_cols:
+        if col in df.columns:
+            df = df.with_columns(pl.col(col).fill_null(0))
+    return df
+
+def write_decimal_comma_csv(df, dest, separator):
+    """
+    Escribe `df` con coma decimal; con separador ',' el CSV entrecomilla los valores.
+    """
+    df.with_columns(pl.col(pl.Float64).cast(pl.String).str.replace(r"\.", ",")).write_csv(dest, separator=separator)
+    return dest
+
+def best_of(func, file_path, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(file_path)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def throughput(file_path, seconds):
+    return os.path.getsize(file_path) / 1e6 / seconds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'escala':>7} {'variante':>16} {'filas':>10} {'MB':>8} {'original (MB/s)':>16} {'cargador (MB/s)':>16} {'aceleración':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            raw = scale_dataset(scale)
+            csv_path = os.path.join(tmp, f"proyecto2_x{scale}.csv")
+            raw.write_csv(csv_path)
+            size_mb = os.path.getsize(csv_path) / 1e6
+
+            legacy_time, legacy_df = best_of(legacy_process_data_for_viz, csv_path, args.repeat)
+            loader_time, loader_df = best_of(load_emissions_csv, csv_path, args.repeat)
+            assert legacy_df.equals(loader_df), "Los resultados de ambas rutas no coinciden"
+            print(f"{scale:>6}x {'punto decimal':>16} {loader_df.height:>10,} {size_mb:>8.1f} "
+                  f"{throughput(csv_path, legacy_time):>16.1f} {throughput(csv_path, loader_time):>16.1f} "
+                  f"{legacy_time / loader_time:>11.2f}x")
+
+            # El parseo original no reconoce el separador ';', por lo que estas variantes solo miden el cargador
+            for name, separator in (("coma decimal ;", ";"), ("coma decimal \"\"", ",")):
+                variant_path = write_decimal_comma_csv(raw, os.path.join(tmp, f"proyecto2_x{scale}_{separator}.csv"), separator)
+                variant_time, variant_df = best_of(load_emissions_csv, variant_path, args.repeat)
+                assert variant_df.equals(loader_df), f"La variante '{name}' no coincide con el CSV original"
+                print(f"{scale:>6}x {name:>16} {variant_df.height:>10,} {os.path.getsize(variant_path) / 1e6:>8.1f} "
+                      f"{'-':>16} {throughput(variant_path, variant_time):>16.1f} {'-':>12}")
+
+if __name__ == "__main__":
+    main()
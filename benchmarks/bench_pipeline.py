@@ -0,0 +1,233 @@
+"""
+Benchmark de extremo a extremo: carga, ponderación, cada agregación y cada gráfico sobre
+inventarios sintéticos (`synthetic.write_synthetic_csv`, jerarquía IPCC conservada) de
+distintos tamaños, con el tiempo y el pico de memoria residente (RSS) de cada etapa.
+
+Cada tamaño se mide en un subproceso propio. El pico de RSS se obtiene muestreando
+`/proc/self/statm` en un hilo mientras dura cada etapa (en sistemas sin `/proc` se usa
+`ru_maxrss`, que solo da el pico acumulado del proceso). El resultado se escribe en JSON
+para comparar ejecuciones entre commits.
+
+Uso:
+    python benchmarks/bench_pipeline.py [--rows 100000 1000000 10000000] [--repeat 3] [--output resultados.json]
+    python benchmarks/bench_pipeline.py --rows 1000000 --compare base.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import polars as pl
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic import write_synthetic_csv  # noqa: E402
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def current_rss():
+    """
+    Memoria residente actual del proceso en bytes (None si no hay `/proc`).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return None
+
+class PeakRSSSampler:
+    """
+    Hilo que muestrea el RSS cada `interval` segundos; `reset()` empieza una etapa nueva.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = current_rss() or 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = current_rss()
+            if rss is not None and rss > self.peak:
+                self.peak = rss
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def reset(self):
+        self.peak = current_rss() or 0
+
+    def read(self):
+        rss = current_rss()
+        if rss is None:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KB en Linux
+        return max(self.peak, rss)
+
+def build_stages(csv_path):
+    """
+    Etapas en orden; cada una recibe el diccionario de resultados anteriores y devuelve su salida.
+    """
+    from aggregations import build_emissions_cube, yearly_totals, classification_totals, section_results
+    from category_hierarchy import build_category_index, attach_category_index, leaves_only
+    from charts import (generate_emissions_by_year, generate_emissions_by_gas_type, generate_top_classifications,
+                        generate_pie_chart_by_classification, generate_correlation_heatmap,
+                        generate_scenario_comparison, emissions_by_year_figure, top_classifications_figure)
+    from correlations import correlation_matrix, correlation_by_sector
+    from csv_loader import load_emissions_csv
+    from enhanced_data_processing import (build_weighting_pipeline, process_data_with_weighting, apply_compact_schema,
+                                          calculate_weighted_statistics)
+    from scenarios import compute_scenarios
+
+    gas_cols = ["CH4_eq", "CO2_eq", "N2O_eq"]
+    return [
+        # Carga y ponderación
+        ("carga_csv", lambda r: load_emissions_csv(csv_path)),
+        ("ponderacion", lambda r: build_weighting_pipeline(r["carga_csv"].lazy()).collect()),
+        ("carga_y_ponderacion", lambda r: process_data_with_weighting(csv_path)),
+        ("esquema_compacto", lambda r: apply_compact_schema(r["carga_y_ponderacion"])),
+        ("indice_categorias", lambda r: attach_category_index(
+            r["carga_y_ponderacion"], build_category_index(r["carga_y_ponderacion"]["Clasificacion"].unique().to_list()))),
+        # Agregaciones
+        ("estadisticas_ponderadas", lambda r: calculate_weighted_statistics(r["carga_y_ponderacion"])),
+        ("cubo", lambda r: build_emissions_cube(r["indice_categorias"])),
+        ("solo_hojas", lambda r: leaves_only(r["indice_categorias"])),
+        ("totales_anuales", lambda r: yearly_totals(r["carga_y_ponderacion"], ["Total_Emisiones"] + gas_cols)),
+        ("totales_clasificacion", lambda r: classification_totals(r["carga_y_ponderacion"], "Total_Emisiones")),
+        ("seccion_desde_cubo", lambda r: section_results(r["cubo"], "Total_Emisiones", gas_cols)),
+        ("correlacion", lambda r: correlation_matrix(r["carga_y_ponderacion"])),
+        ("correlacion_por_sector", lambda r: correlation_by_sector(
+            r["indice_categorias"], build_category_index(r["carga_y_ponderacion"]["Clasificacion"].unique().to_list()))),
+        ("escenarios", lambda r: compute_scenarios(r["carga_y_ponderacion"])),
+        # Gráficos desde las filas (funciones `generate_*`) y desde el cubo
+        ("grafico_tendencia_anual", lambda r: generate_emissions_by_year(r["carga_y_ponderacion"], "Total_Emisiones")),
+        ("grafico_por_gas", lambda r: generate_emissions_by_gas_type(r["carga_y_ponderacion"], gas_cols)),
+        ("grafico_top_clasificaciones", lambda r: generate_top_classifications(r["carga_y_ponderacion"], "Total_Emisiones")),
+        ("grafico_distribucion", lambda r: generate_pie_chart_by_classification(r["carga_y_ponderacion"], "Total_Emisiones")),
+        ("grafico_correlacion", lambda r: generate_correlation_heatmap(r["correlacion"])),
+        ("grafico_escenarios", lambda r: generate_scenario_comparison(r["escenarios"], "Total_GWP_weighted")),
+        ("grafico_tendencia_cubo", lambda r: emissions_by_year_figure(r["seccion_desde_cubo"]["anual"], "Total_Emisiones")),
+        ("grafico_top_cubo", lambda r: top_classifications_figure(r["seccion_desde_cubo"]["clasificaciones"]))
+    ]
+
+def run_size(csv_path, repeat, output):
+    """
+    Ejecutado en el subproceso: mide todas las etapas sobre `csv_path` y escribe el JSON en `output`.
+    """
+    # Plotly carga sus clases de forma perezosa; el primer gráfico no debe cargar con ese coste
+    import plotly.graph_objects as go
+    go.Figure(go.Scatter(x=[0], y=[0]))
+
+    results, stages = {}, {}
+    with PeakRSSSampler() as sampler:
+        baseline_rss = sampler.read()
+        for name, func in build_stages(csv_path):
+            timings = []
+            sampler.reset()
+            before = sampler.read()
+            for _ in range(repeat):
+                start = time.perf_counter()
+                results[name] = func(results)
+                timings.append(time.perf_counter() - start)
+            peak = sampler.read()
+            stages[name] = {
+                'seconds': min(timings),
+                'seconds_all': timings,
+                'peak_rss_mb': peak / 1e6,
+                'peak_increase_mb': (peak - before) / 1e6
+            }
+        process_peak = max(stage['peak_rss_mb'] for stage in stages.values())
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            'rows': results["carga_y_ponderacion"].height,
+            'file_mb': os.path.getsize(csv_path) / 1e6,
+            'baseline_rss_mb': baseline_rss / 1e6,
+            'peak_rss_mb': process_peak,
+            'stages': stages
+        }, f)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_results(report, baseline=None):
+    base_runs = {run['rows']: run for run in baseline['runs']} if baseline else {}
+    for run in report['runs']:
+        base = base_runs.get(run['rows'])
+        print(f"\n{run['rows']:,} filas ({run['file_mb']:.0f} MB de CSV), pico de RSS {run['peak_rss_mb']:,.0f} MB")
+        header = f"{'etapa':>28} {'tiempo (ms)':>12} {'pico RSS (MB)':>14} {'+RSS (MB)':>10}"
+        print(header + (f" {'base (ms)':>10} {'cambio':>8}" if base else ""))
+        for name, stage in run['stages'].items():
+            line = (f"{name:>28} {stage['seconds'] * 1e3:>12.1f} {stage['peak_rss_mb']:>14.0f} "
+                    f"{stage['peak_increase_mb']:>10.0f}")
+            if base and name in base['stages']:
+                base_seconds = base['stages'][name]['seconds']
+                line += f" {base_seconds * 1e3:>10.1f} {(stage['seconds'] / base_seconds - 1) * 100:>+7.0f}%"
+            print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench_pipeline.json", help="Archivo JSON de resultados")
+    parser.add_argument("--compare", default=None, help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--data-dir", default=None, help="Directorio para los CSV generados (se reutilizan)")
+    args = parser.parse_args()
+
+    report = {
+        'metadata': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'polars': pl.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'repeat': args.repeat
+        },
+        'runs': []
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        for rows in args.rows:
+            csv_path = os.path.join(data_dir, f"sintetico_{rows}.csv")
+            if not os.path.exists(csv_path):
+                write_synthetic_csv(rows, csv_path)
+            output = os.path.join(tmp, f"resultado_{rows}.json")
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--run-size", csv_path, str(args.repeat), output],
+                           check=True)
+            with open(output, encoding="utf-8") as f:
+                report['runs'].append(json.load(f))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(report, baseline)
+    print(f"\nResultados en {args.output}")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == "--run-size":
+        run_size(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+    else:
+        main()
@@ -0,0 +1,119 @@
+"""
+Modo en memoria frente a modo streaming sobre un directorio de fragmentos CSV/Parquet,
+con el esquema completo y con el compacto: tiempo, pico de memoria residente (RSS) y
+comprobación de que los agregados y el top de clasificaciones de
+`calculate_weighted_statistics` son idénticos entre motores, y de que con el esquema
+compacto solo difieren del completo en el redondeo Float32 de cada fila (mismos tipos).
+
+Cada modo se ejecuta en un subproceso propio para que el pico de RSS (`ru_maxrss`)
+no incluya la memoria del otro ni la de la generación de los datos.
+
+Uso:
+    python benchmarks/bench_streaming.py [--scales 10 100] [--shards 8]
+"""
+import argparse
+import os
+import pickle
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enhanced_data_processing import process_data_with_weighting, calculate_weighted_statistics  # noqa: E402
+from synthetic import scale_dataset  # noqa: E402
+
+MODES = ["memoria", "streaming", "memoria_compacto", "streaming_compacto"]
+
+# Error relativo admitido entre el esquema compacto (columnas derivadas en Float32) y el completo
+COMPACT_REL_TOL = 1e-6
+
+# Comparaciones (referencia, modo, error relativo admitido): entre motores el resultado es idéntico
+CHECKS = [
+    ("memoria", "streaming", 0.0),
+    ("memoria_compacto", "streaming_compacto", 0.0),
+    ("memoria", "memoria_compacto", COMPACT_REL_TOL)
+]
+
+def write_shards(scale, directory, shards):
+    """
+    Reparte el inventario escalado en `shards` fragmentos, alternando CSV y Parquet.
+    """
+    df = scale_dataset(scale)
+    bounds = [df.height * i // shards for i in range(shards + 1)]
+    for i in range(shards):
+        part = df.slice(bounds[i], bounds[i + 1] - bounds[i])
+        if i % 2:
+            part.write_parquet(os.path.join(directory, f"parte_{i:04d}.parquet"))
+        else:
+            part.write_csv(os.path.join(directory, f"parte_{i:04d}.csv"))
+    return df.height
+
+def run_mode(mode, source, output):
+    """
+    Ejecutado en el subproceso: calcula las estadísticas y guarda el resultado con el tiempo y el pico de RSS.
+    """
+    compact = mode.endswith("_compacto")
+    start = time.perf_counter()
+    if mode.startswith("streaming"):
+        lf = process_data_with_weighting(source, lazy=True, compact=compact)
+        stats = calculate_weighted_statistics(lf, streaming=True)
+    else:
+        stats = calculate_weighted_statistics(process_data_with_weighting(source, compact=compact))
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KB en Linux
+    with open(output, "wb") as f:
+        pickle.dump({'stats': stats, 'seconds': elapsed, 'peak_mb': peak_kb / 1024}, f)
+
+def same_values(a, b, rel_tol=0.0):
+    if a == b or (a != a and b != b):  # NaN == NaN
+        return True
+    return rel_tol > 0 and isinstance(a, float) and abs(a - b) <= rel_tol * max(abs(a), abs(b))
+
+def same_stats(a, b, rel_tol=0.0):
+    """
+    Compara dos resultados de `calculate_weighted_statistics`. Los DataFrames deben tener el
+    mismo esquema; con `rel_tol` los valores Float64 pueden diferir en ese error relativo.
+    """
+    for key, value in a.items():
+        other = b[key]
+        if not hasattr(value, 'equals'):
+            if not same_values(value, other, rel_tol):
+                return False
+        elif value.schema != other.schema or value.height != other.height:
+            return False
+        elif not all(same_values(x, y, rel_tol) for col in value.columns
+                     for x, y in zip(value[col].to_list(), other[col].to_list())):
+            return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--shards", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{'escala':>7} {'filas':>12} {'modo':>18} {'tiempo (s)':>11} {'pico RSS (MB)':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            source = os.path.join(tmp, f"fragmentos_x{scale}")
+            os.makedirs(source)
+            rows = write_shards(scale, source, args.shards)
+            results = {}
+            for mode in MODES:
+                output = os.path.join(tmp, f"{mode}_x{scale}.pkl")
+                subprocess.run([sys.executable, os.path.abspath(__file__), "--run-mode", mode, source, output], check=True)
+                with open(output, "rb") as f:
+                    results[mode] = pickle.load(f)
+                print(f"{scale:>6}x {rows:>12,} {mode:>18} {results[mode]['seconds']:>11.2f} {results[mode]['peak_mb']:>14.0f}")
+            for reference, mode, rel_tol in CHECKS:
+                assert same_stats(results[reference]['stats'], results[mode]['stats'], rel_tol), \
+                    f"Las estadísticas en modo '{mode}' no coinciden con las del modo '{reference}'"
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == "--run-mode":
+        run_mode(*sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,99 @@
+"""
+Generación de datos sintéticos a partir de `data/proyecto2.csv` para los benchmarks.
+
+`scale_dataset` replica el inventario con ruido en todas las filas; `write_synthetic_csv`
+genera inventarios de decenas de millones de filas por bloques, conservando la jerarquía
+IPCC (cada categoría padre sigue siendo la suma de sus hojas) y la distribución de los
+valores de cada categoría.
+"""
+import math
+import os
+import sys
+
+import numpy as np
+import polars as pl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csv_loader import COLUMN_RENAMES, load_emissions_csv  # noqa: E402
+from category_hierarchy import build_category_index, attach_category_index  # noqa: E402
+
+SOURCE_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "proyecto2.csv")
+VALUE_COLUMNS = ['CH4_eq', 'CO2_eq', 'N2O_eq', 'Total_Emisiones', 'Emisiones_netas']
+
+def scale_dataset(factor, source=SOURCE_CSV, seed=0):
+    """
+    Replica el inventario `factor` veces (como si fueran inventarios regionales)
+    aplicando un ruido multiplicativo a los valores para que no sean idénticos.
+    """
+    base = pl.read_csv(source)
+    if factor <= 1:
+        return base
+    rng = np.random.default_rng(seed)
+    replicas = pl.concat([base] * factor)
+    noise = rng.lognormal(mean=0.0, sigma=0.1, size=replicas.height)
+    return replicas.with_columns([
+        (pl.col(col) * pl.Series(noise)).alias(col) for col in VALUE_COLUMNS if col in replicas.columns
+    ])
+
+def write_scaled_csv(factor, dest, source=SOURCE_CSV, seed=0):
+    """
+    Escribe en `dest` el inventario escalado y devuelve la ruta.
+    """
+    scale_dataset(factor, source=source, seed=seed).write_csv(dest)
+    return dest
+
+def _hierarchy_template(source=SOURCE_CSV):
+    """
+    Inventario base con el índice de categorías y la tabla (hoja, ancestro) de cada hoja.
+    """
+    base = load_emissions_csv(source).filter(pl.col('Anio').is_not_null() & pl.col('Clasificacion').is_not_null())
+    index = build_category_index(base['Clasificacion'].unique().to_list())
+    base = attach_category_index(base, index).with_row_index('_orden')
+    ancestors = index.filter(~pl.col('Categoria_es_hoja')).select(
+        pl.col('Categoria_id').alias('Ancestro_id'), pl.col('Categoria_fin').alias('Ancestro_fin'))
+    pairs = (index.filter(pl.col('Categoria_es_hoja')).select('Categoria_id').join(ancestors, how='cross')
+             .filter(pl.col('Categoria_id').is_between(pl.col('Ancestro_id'), pl.col('Ancestro_fin')))
+             .select('Categoria_id', 'Ancestro_id'))
+    return base, pairs
+
+def synthetic_chunk(base, pairs, replicas, rng, sigma=0.1):
+    """
+    `replicas` copias del inventario (como inventarios regionales). Cada fila hoja recibe un
+    factor lognormal común a todas sus columnas, de modo que se mantienen las proporciones
+    entre gases, totales y emisiones netas; las categorías padre se recalculan como la suma
+    de sus hojas en el mismo año y réplica (o, si no tienen hojas ese año, con su propio factor).
+    """
+    value_cols = [col for col in VALUE_COLUMNS if col in base.columns]
+    rows = pl.concat([base.with_columns(pl.lit(r, pl.UInt32).alias('_replica')) for r in range(replicas)])
+    factor = pl.Series(rng.lognormal(mean=0.0, sigma=sigma, size=rows.height))
+    rows = rows.with_columns([pl.col(col) * factor for col in value_cols])
+
+    parent_sums = (rows.filter(pl.col('Categoria_es_hoja')).join(pairs, on='Categoria_id')
+                   .group_by('_replica', 'Anio', 'Ancestro_id')
+                   .agg([pl.sum(col).alias(f'_{col}') for col in value_cols]))
+    rows = rows.join(parent_sums, left_on=['_replica', 'Anio', 'Categoria_id'],
+                     right_on=['_replica', 'Anio', 'Ancestro_id'], how='left')
+    return rows.with_columns([
+        pl.when(pl.col('Categoria_es_hoja') | pl.col(f'_{col}').is_null()).then(pl.col(col))
+        .otherwise(pl.col(f'_{col}')).alias(col)
+        for col in value_cols
+    ]).sort('_replica', '_orden').select(
+        [pl.col(new).alias(old) for old, new in COLUMN_RENAMES.items()] + value_cols
+    )
+
+def write_synthetic_csv(rows, dest, chunk_rows=500_000, source=SOURCE_CSV, seed=0, sigma=0.1):
+    """
+    Escribe en `dest` un inventario sintético de al menos `rows` filas (réplicas completas
+    del inventario base), generado y escrito por bloques de unas `chunk_rows` filas para
+    que la memoria no crezca con el tamaño. Devuelve la ruta.
+    """
+    base, pairs = _hierarchy_template(source)
+    rng = np.random.default_rng(seed)
+    total_replicas = max(1, math.ceil(rows / base.height))
+    per_chunk = max(1, chunk_rows // base.height)
+    with open(dest, 'wb') as f:
+        for start in range(0, total_replicas, per_chunk):
+            chunk = synthetic_chunk(base, pairs, min(per_chunk, total_replicas - start), rng, sigma)
+            chunk.write_csv(f, include_header=start == 0)
+    return dest
@@ -0,0 +1,201 @@
+import re
+
+import polars as pl
+
+# Etiqueta del total nacional, que actúa como raíz del árbol de categorías
+ROOT_LABEL = 'Nacional'
+
+# Código IPCC al inicio de la etiqueta: "1 Energía", "1.A.1.a. Producción...", "4(II).B. Cropland", "1.A.3.bi Carros"
+_CODE_PATTERN = re.compile(r'^\s*(\d+(?:\([IVX]+\))?(?:\.[0-9A-Za-z]+)*)\.?(?:\s|$)')
+
+# Segmento que une una letra minúscula con un numeral romano (y opcionalmente un dígito): "ai", "bv", "ci1"
+_MERGED_SEGMENT_PATTERN = re.compile(r'^([a-z])([ivx]+)(\d*)$')
+
+# Subárboles IPCC considerados industriales: Industrias de la energía, Industrias manufactureras y construcción,
+# y Procesos industriales
+INDUSTRIAL_CATEGORY_CODES = ['1.A.1', '1.A.2', '2']
+
+# Columnas de índice que se añaden a los datos (todas enteras o booleanas)
+CATEGORY_COLUMNS = ['Categoria_id', 'Categoria_padre_id', 'Categoria_nivel', 'Categoria_es_hoja', 'Categoria_fin']
+
+def _split_code(code):
+    """
+    Divide un código IPCC en segmentos normalizados.
+
+    "4(II).B" -> ["4", "(II)", "B"]; "1.A.1.ai" -> ["1", "A", "1", "a", "i"].
+    Un segmento como "ai" solo se separa cuando sigue a un dígito (nivel donde se espera
+    una letra minúscula), para no confundir numerales romanos como "vi" con "v" + "i".
+    """
+    head, *rest = code.split('.')
+    match = re.match(r'^(\d+)(\([IVX]+\))?$', head)
+    segments = [match.group(1)] + ([match.group(2)] if match.group(2) else [])
+    for segment in rest:
+        merged = _MERGED_SEGMENT_PATTERN.match(segment)
+        if merged and len(segment) > 1 and segments[-1].isdigit() and len(segments) > 1:
+            segments.extend(part for part in merged.groups() if part)
+        else:
+            segments.append(segment)
+    return segments
+
+def _join_segments(segments):
+    return '.'.join(segments).replace('.(', '(')
+
+def parse_category_code(label):
+    """
+    Extrae el código IPCC normalizado de una etiqueta de `Clasificacion`.
+    Devuelve None si la etiqueta no empieza por un código reconocible.
+    """
+    if label is None:
+        return None
+    match = _CODE_PATTERN.match(label)
+    if not match:
+        return None
+    return _join_segments(_split_code(match.group(1)))
+
+def _sort_key(segments):
+    return [(0, int(s), '') if s.isdigit() else (1, 0, s) for s in segments]
+
+def build_category_index(classifications):
+    """
+    Construye el índice jerárquico de categorías a partir de las etiquetas de `Clasificacion`.
+
+    Cada categoría recibe como `Categoria_id` su posición en un recorrido en preorden del
+    árbol, y `Categoria_fin` es el último id de su subárbol; así, el subárbol de una
+    categoría es el rango entero [Categoria_id, Categoria_fin]. El padre es el ancestro
+    más cercano presente en los datos y "Nacional" es la raíz. Las etiquetas sin código
+    reconocible (distintas de "Nacional") quedan fuera del árbol con nivel -1.
+    """
+    labels = sorted({label for label in classifications if label is not None})
+    codes = {}
+    invalid = []
+    has_root = False
+    for label in labels:
+        code = parse_category_code(label)
+        if code is not None:
+            codes.setdefault(code, []).append(label)
+        elif label == ROOT_LABEL:
+            has_root = True
+        else:
+            invalid.append(label)
+
+    segments = {code: _split_code(code) for code in codes}
+    children = {code: [] for code in codes}
+    parents = {}
+    for code, parts in segments.items():
+        parents[code] = None
+        for depth in range(len(parts) - 1, 0, -1):
+            candidate = _join_segments(parts[:depth])
+            if candidate in segments:
+                parents[code] = candidate
+                children[candidate].append(code)
+                break
+
+    def by_code(code):
+        return _sort_key(segments[code])
+
+    # Recorrido en preorden; "Nacional" (si existe) ocupa la posición 0 y abarca todo el árbol
+    order = [ROOT_LABEL] if has_root else []
+    fin = {}
+    def visit(code):
+        order.append(code)
+        for child in sorted(children[code], key=by_code):
+            visit(child)
+        fin[code] = len(order) - 1
+
+    for code in sorted((code for code in codes if parents[code] is None), key=by_code):
+        visit(code)
+
+    ids = {code: position for position, code in enumerate(order)}
+    root_id = 0 if has_root else -1
+    rows = []
+    if has_root:
+        rows.append((ROOT_LABEL, None, root_id, -1, 0, False, len(order) - 1))
+    for code in order[root_id + 1:]:
+        parent_id = ids[parents[code]] if parents[code] is not None else root_id
+        for label in codes[code]:
+            rows.append((label, code, ids[code], parent_id, len(segments[code]), not children[code], fin[code]))
+    for offset, label in enumerate(invalid):
+        position = len(order) + offset
+        rows.append((label, None, position, -1, -1, False, position))
+
+    return pl.DataFrame(rows, schema={
+        'Clasificacion': pl.String,
+        'Categoria_codigo': pl.String,
+        'Categoria_id': pl.Int32,
+        'Categoria_padre_id': pl.Int32,
+        'Categoria_nivel': pl.Int8,
+        'Categoria_es_hoja': pl.Boolean,
+        'Categoria_fin': pl.Int32
+    }, orient='row')
+
+def attach_category_index(df, index=None):
+    """
+    Añade a `df` las columnas enteras del índice jerárquico (ver `CATEGORY_COLUMNS`).
+    Si no se proporciona `index`, se construye a partir de las etiquetas presentes en `df`.
+    La clave de unión adopta el tipo de `Clasificacion` en `df` (String, Enum o Categorical).
+    """
+    if index is None:
+        index = build_category_index(df['Clasificacion'].unique().to_list())
+    label_dtype = df.schema['Clasificacion']
+    return df.join(
+        index.select([pl.col('Clasificacion').cast(label_dtype)] + CATEGORY_COLUMNS),
+        on='Clasificacion', how='left'
+    )
+
+def leaves_only(df):
+    """
+    Conserva solo las categorías hoja, para que las sumas no cuenten a la vez padres e hijos.
+    """
+    return df.filter(pl.col('Categoria_es_hoja'))
+
+def filter_subtrees(df, index, codes):
+    """
+    Filtra las filas que pertenecen al subárbol de cualquiera de los códigos indicados
+    (incluida la propia categoría), como un filtro de rangos enteros sobre `Categoria_id`.
+    """
+    ranges = index.filter(pl.col('Categoria_codigo').is_in(list(codes))).select(['Categoria_id', 'Categoria_fin']).rows()
+    if not ranges:
+        return df.clear()
+    mask = pl.lit(False)
+    for start, end in ranges:
+        mask = mask | pl.col('Categoria_id').is_between(start, end)
+    return df.filter(mask)
+
+def attach_ancestor(df, index, level):
+    """
+    Añade a `df` el ancestro de nivel `level` de cada fila (0 = Nacional, 1 = sector, ...)
+    como `Ancestro_id` y `Ancestro`; las filas que están por encima de ese nivel o fuera
+    del árbol son su propio ancestro.
+
+    El ancestro se localiza con un `join_asof` sobre los ids en preorden: el último nodo
+    de nivel `level` con id menor o igual es el ancestro si la fila cae dentro de su rango.
+    El resultado queda ordenado por `Categoria_id`.
+    """
+    level_nodes = index.filter(pl.col('Categoria_nivel') == level).select([
+        pl.col('Categoria_id').alias('Ancestro_id'),
+        pl.col('Categoria_fin').alias('Ancestro_fin'),
+        pl.col('Clasificacion').cast(df.schema['Clasificacion']).alias('Ancestro')
+    ]).unique('Ancestro_id').sort('Ancestro_id')
+
+    matched = df.sort('Categoria_id').join_asof(level_nodes, left_on='Categoria_id', right_on='Ancestro_id',
+                                                strategy='backward')
+    in_subtree = pl.col('Ancestro_fin').is_not_null() & (pl.col('Categoria_id') <= pl.col('Ancestro_fin'))
+    return matched.with_columns(
+        pl.when(in_subtree).then(pl.col('Ancestro_id')).otherwise(pl.col('Categoria_id')).alias('Ancestro_id'),
+        pl.when(in_subtree).then(pl.col('Ancestro')).otherwise(pl.col('Clasificacion')).alias('Ancestro')
+    ).drop('Ancestro_fin')
+
+def rollup_to_level(df, index, level, value_cols, by=('Anio',)):
+    """
+    Agrega las categorías hoja al ancestro de nivel `level` (0 = Nacional, 1 = sector, ...).
+
+    Las hojas que están por encima de ese nivel se conservan como su propio grupo
+    (ver `attach_ancestor`).
+    """
+    matched = attach_ancestor(leaves_only(df), index, level)
+    return matched.with_columns(
+        pl.col('Ancestro_id').alias('Categoria_id'),
+        pl.col('Ancestro').alias('Clasificacion')
+    ).group_by(list(by) + ['Categoria_id', 'Clasificacion']).agg(
+        [pl.col(col).cast(pl.Float64).sum().alias(col) for col in value_cols]
+    ).sort(list(by) + ['Categoria_id'])
@@ -0,0 +1,143 @@
+import plotly.graph_objects as go
+from plotly.colors import qualitative
+
+from aggregations import yearly_totals, classification_totals
+
+# Tipos de emisión disponibles: columna total, columnas por gas (CH4, CO2, N2O) y sufijo para los títulos
+EMISSION_TYPES = {
+    "Emisiones Totales (Original)": ("Total_Emisiones", ["CH4_eq", "CO2_eq", "N2O_eq"], "(Original)"),
+    "Emisiones Ponderadas por GWP": ("Total_GWP_weighted", ["CH4_GWP_weighted", "CO2_GWP_weighted", "N2O_GWP_weighted"], "(Ponderadas por GWP)"),
+    "Impacto Combinado": ("Impacto_Combinado", ["CH4_damage_weighted", "CO2_damage_weighted", "N2O_damage_weighted"], "(Impacto Combinado)")
+}
+
+# Constructores de figuras: reciben arrays de NumPy extraídos directamente de Polars y crean
+# objetos de Plotly sin DataFrame intermedio de pandas (ni `melt`): cada columna es una traza.
+
+def line_figure(x, traces, title, x_title, y_title, legend_title=None, stacked=False, height=400):
+    """
+    Figura de líneas (o de áreas apiladas con `stacked=True`) con una traza por entrada de `traces` (nombre -> array).
+    """
+    fig = go.Figure()
+    for name, y in traces.items():
+        fig.add_trace(go.Scatter(
+            x=x, y=y, name=name, mode="lines",
+            stackgroup="uno" if stacked else None,
+            hovertemplate=f"{x_title}=%{{x}}<br>{y_title}=%{{y}}<extra>{name}</extra>"
+        ))
+    fig.update_layout(title=title, xaxis_title=x_title, yaxis_title=y_title, height=height,
+                      legend_title_text=legend_title, showlegend=len(traces) > 1 or stacked)
+    return fig
+
+def bar_figure(values, labels, title, x_title, y_title, height=500):
+    """
+    Barras horizontales, la mayor arriba.
+    """
+    fig = go.Figure(go.Bar(
+        x=values, y=labels, orientation="h",
+        hovertemplate=f"{x_title}=%{{x}}<br>{y_title}=%{{y}}<extra></extra>"
+    ))
+    fig.update_layout(title=title, xaxis_title=x_title, yaxis_title=y_title,
+                      yaxis={"categoryorder": "total ascending"}, height=height)
+    return fig
+
+# Figuras a partir de datos ya agregados (ver `aggregations.yearly_totals` y `classification_totals`)
+def emissions_by_year_figure(yearly, emission_col, title_suffix=""):
+    return line_figure(yearly["Anio"].to_numpy(),
+                       {"Total_Emisiones_Anual": yearly[emission_col].to_numpy()},
+                       title=f"Tendencia de Emisiones Totales {title_suffix} por Año",
+                       x_title="Año", y_title="Emisiones Totales (CO2eq)")
+
+def emissions_by_gas_type_figure(yearly, gas_cols, title_suffix=""):
+    # Formato ancho: cada columna de gas es directamente una traza del área apilada
+    return line_figure(yearly["Anio"].to_numpy(),
+                       {col: yearly[col].to_numpy() for col in gas_cols},
+                       title=f"Emisiones {title_suffix} por Tipo de Gas a lo largo del Tiempo",
+                       x_title="Año", y_title="Emisiones (CO2eq)", legend_title="Tipo de Gas", stacked=True)
+
+def top_classifications_figure(totals, top_n=10, title_suffix=""):
+    top = totals.head(top_n)
+    return bar_figure(top["Suma_Total_Emisiones"].to_numpy(), top["Clasificacion"].to_numpy(),
+                      title=f"Top {top_n} Clasificaciones con Mayores Emisiones {title_suffix}",
+                      x_title="Emisiones Totales (CO2eq)", y_title="Clasificación")
+
+def pie_chart_figure(totals, title_suffix=""):
+    fig = go.Figure(go.Pie(values=totals["Suma_Total_Emisiones"].to_numpy(),
+                           labels=totals["Clasificacion"].to_numpy(),
+                           hole=0.3, # Añade un agujero para un donut chart
+                           textposition='inside', textinfo='percent+label'))
+    fig.update_layout(title=f"Distribución de Emisiones {title_suffix} por Clasificación", height=500)
+    return fig
+
+# Función para generar visualizaciones
+def generate_emissions_by_year(df, emission_col, title_suffix=""): # Añadido emission_col y title_suffix
+    return emissions_by_year_figure(yearly_totals(df, [emission_col]), emission_col, title_suffix)
+
+def generate_emissions_by_gas_type(df, gas_cols, title_suffix=""): # Añadido gas_cols y title_suffix
+    return emissions_by_gas_type_figure(yearly_totals(df, gas_cols), gas_cols, title_suffix)
+
+def generate_top_classifications(df, emission_col, top_n=10, title_suffix=""): # Añadido emission_col y title_suffix
+    return top_classifications_figure(classification_totals(df, emission_col, top_n), top_n, title_suffix)
+
+def generate_pie_chart_by_classification(df, emission_col, title_suffix=""): # Nueva función para gráfico de pastel
+    return pie_chart_figure(classification_totals(df, emission_col), title_suffix)
+
+def generate_correlation_heatmap(corr_matrix, title_suffix=""):
+    # `corr_matrix` es la matriz cuadrada de `correlations.correlation_matrix` (columna "Variable" + una por gas)
+    labels = corr_matrix["Variable"].to_list()
+    fig = go.Figure(go.Heatmap(z=corr_matrix.drop("Variable").to_numpy(), x=labels, y=labels,
+                               texttemplate="%{z}"))
+    fig.update_layout(title=f"Matriz de Correlación entre Gases de Efecto Invernadero {title_suffix}",
+                      yaxis={"autorange": "reversed"}, height=400)
+    return fig
+
+def generate_scenario_comparison(scenarios_df, value_col, title_suffix=""):
+    # Una línea por escenario de ponderación: el resultado largo de `scenarios.compute_scenarios`
+    # se pivota en Polars a una columna por escenario
+    wide = scenarios_df.pivot(on="Escenario", index="Anio", values=value_col).sort("Anio")
+    return line_figure(wide["Anio"].to_numpy(),
+                       {name: wide[name].to_numpy() for name in wide.columns if name != "Anio"},
+                       title=f"Comparación de Escenarios de Ponderación {title_suffix}",
+                       x_title="Año", y_title="Emisiones Ponderadas (CO2eq)", legend_title="Escenario")
+
+def generate_trend_forecast(series, forecast, title_suffix="", show_moving_average=False):
+    # Historia de `trends.trend_series` (una línea por clasificación) y, en discontinua y del mismo
+    # color, la proyección lineal de `trends.forecast_series`
+    value_col = "Media_movil" if show_moving_average else "Valor"
+    wide = series.pivot(on="Clasificacion", index="Anio", values=value_col).sort("Anio")
+    names = [name for name in wide.columns if name != "Anio"]
+    fig = line_figure(wide["Anio"].to_numpy(), {name: wide[name].to_numpy() for name in names},
+                      title=f"Tendencia y Proyección por Clasificación {title_suffix}",
+                      x_title="Año", y_title="Emisiones (CO2eq)", legend_title="Clasificación")
+    palette = qualitative.Plotly
+    for i, name in enumerate(names):
+        color = palette[i % len(palette)]
+        fig.data[i].update(line={"color": color}, legendgroup=name)
+        projection = forecast.filter(forecast["Clasificacion"] == name)
+        if projection.is_empty():
+            continue
+        fig.add_trace(go.Scatter(
+            x=projection["Anio"].to_numpy(), y=projection["Pronostico"].to_numpy(), mode="lines",
+            name=f"{name} (proyección)", legendgroup=name, showlegend=False,
+            line={"color": color, "dash": "dash"},
+            hovertemplate=f"Año=%{{x}}<br>Proyección=%{{y}}<extra>{name}</extra>"
+        ))
+    fig.update_layout(showlegend=True)
+    return fig
+
+def generate_dataset_comparison(yearly, labels, title_suffix=""):
+    # Totales anuales de `comparison.compare_datasets` lado a lado: una línea por inventario
+    return line_figure(yearly["Anio"].to_numpy(), {label: yearly[label].to_numpy() for label in labels},
+                       title=f"Comparación de Inventarios {title_suffix} por Año",
+                       x_title="Año", y_title="Emisiones (CO2eq)", legend_title="Inventario")
+
+def generate_dataset_difference(yearly, labels, reference, title_suffix=""):
+    # Barras agrupadas con la diferencia anual de cada inventario respecto a `reference`
+    fig = go.Figure([
+        go.Bar(x=yearly["Anio"].to_numpy(), y=yearly[f"Diferencia_{label}"].to_numpy(), name=label,
+               hovertemplate=f"Año=%{{x}}<br>Diferencia=%{{y}}<extra>{label}</extra>")
+        for label in labels if label != reference
+    ])
+    fig.update_layout(title=f"Diferencia {title_suffix} respecto a {reference}", xaxis_title="Año",
+                      yaxis_title="Diferencia (CO2eq)", legend_title_text="Inventario", barmode="group",
+                      showlegend=True, height=400)
+    return fig
@@ -0,0 +1,132 @@
+"""
+Comparación de varios inventarios (regiones, o la presentación revisada frente a la anterior).
+
+Los inventarios se cargan y ponderan en paralelo en un pool de hilos: Polars libera el GIL
+mientras lee y agrega, de modo que las cargas se solapan en lugar de sumarse, y a diferencia
+de un pool de procesos los DataFrames resultantes no se copian entre procesos.
+
+Para comparar, la suma de cada inventario por (Anio, Clasificacion) se alinea sobre un índice
+común de claves (la unión de las claves de todos los inventarios) mediante joins por la
+izquierda, con una columna por inventario. Sobre esa tabla alineada, las diferencias con el
+inventario de referencia se calculan para todos los inventarios en una sola pasada.
+"""
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import polars as pl
+
+from aggregations import CUBE_KEYS
+
+# Inventario por defecto y variable de entorno con la lista de inventarios (separados por `os.pathsep`)
+DEFAULT_DATA_FILE = "data/proyecto2.csv"
+DATA_FILES_ENV = "EMISSIONS_DATA_FILES"
+
+def configured_data_files(argv=None):
+    """
+    Inventarios a analizar: los archivos pasados como argumentos (`streamlit run main.py -- a.csv b.csv`),
+    si no los hay los de `EMISSIONS_DATA_FILES` y, en último caso, el inventario por defecto.
+    Se ignoran las opciones (`--...`). Lanza FileNotFoundError con la lista de las rutas que
+    no existen, en lugar de analizar en silencio otro inventario.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    files = [arg for arg in argv if not arg.startswith("--")]
+    if not files:
+        files = [path for path in os.environ.get(DATA_FILES_ENV, "").split(os.pathsep) if path]
+    files = list(dict.fromkeys(files)) or [DEFAULT_DATA_FILE]
+    missing = [path for path in files if not os.path.isfile(path)]
+    if missing:
+        raise FileNotFoundError(f"No se encuentran los inventarios: {', '.join(missing)}")
+    return files
+
+def dataset_labels(file_paths):
+    """
+    Nombre corto de cada inventario (el del archivo sin extensión); si dos coinciden, se usa la ruta.
+    """
+    names = [os.path.splitext(os.path.basename(path))[0] for path in file_paths]
+    return {
+        path: name if names.count(name) == 1 else os.path.splitext(os.path.normpath(path))[0]
+        for path, name in zip(file_paths, names)
+    }
+
+def load_datasets(file_paths, loader, max_workers=None):
+    """
+    Aplica `loader` a cada ruta de forma concurrente y devuelve {nombre: resultado} en el orden
+    de `file_paths`. Los errores de cualquier carga se propagan.
+    """
+    labels = dataset_labels(file_paths)
+    if len(file_paths) == 1:
+        return {labels[file_paths[0]]: loader(file_paths[0])}
+    with ThreadPoolExecutor(max_workers=max_workers or min(len(file_paths), os.cpu_count() or 1)) as pool:
+        results = list(pool.map(loader, file_paths))
+    return {labels[path]: result for path, result in zip(file_paths, results)}
+
+def align_datasets(frames, value_col, keys=CUBE_KEYS):
+    """
+    Tabla alineada: una fila por cada clave de `keys` presente en algún inventario y una columna
+    por inventario con la suma de `value_col` (nula si el inventario no tiene esa clave).
+    Acepta filas procesadas o cubos, y Clasificacion como Enum o texto.
+    """
+    totals = {
+        label: frame.lazy()
+        .with_columns(pl.col('Clasificacion').cast(pl.String))
+        .group_by(keys).agg(pl.sum(value_col).alias(label))
+        for label, frame in frames.items()
+    }
+    key_index = pl.concat([total.select(keys) for total in totals.values()]).unique()
+    aligned = key_index
+    for label, total in totals.items():
+        aligned = aligned.join(total, on=keys, how='left')
+    return aligned.sort(keys).collect()
+
+def dataset_differences(aligned, reference, keys=CUBE_KEYS):
+    """
+    Añade a la tabla alineada, para cada inventario distinto de `reference`, la diferencia absoluta
+    (`Diferencia_<nombre>`) y porcentual (`Diferencia_pct_<nombre>`) respecto a la referencia.
+    Una clave ausente en un inventario cuenta como 0 en la diferencia.
+    """
+    labels = [col for col in aligned.columns if col not in keys and col != reference]
+    base = pl.col(reference).fill_null(0)
+    expressions = []
+    for label in labels:
+        difference = pl.col(label).fill_null(0) - base
+        expressions += [
+            difference.alias(f"Diferencia_{label}"),
+            pl.when(base != 0).then(difference / base.abs() * 100).alias(f"Diferencia_pct_{label}")
+        ]
+    return aligned.with_columns(expressions)
+
+def compare_datasets(frames, value_col, reference=None):
+    """
+    Comparación completa de `frames` ({nombre: filas o cubo}) para `value_col`:
+
+    - `alineado`: tabla por (Anio, Clasificacion) con una columna por inventario y sus diferencias;
+    - `anual`: totales por año de cada inventario y sus diferencias;
+    - `clasificaciones`: totales por clasificación (todos los años) y sus diferencias.
+
+    `reference` es el inventario con el que se comparan los demás (por defecto, el primero).
+    """
+    labels = list(frames)
+    reference = labels[0] if reference is None else reference
+    aligned = align_datasets(frames, value_col)
+    # `sum` ignora los nulos: un año sin una clasificación no resta en el total de ese inventario
+    totals = lambda by: aligned.group_by(by).agg(pl.col(labels).sum()).sort(by)  # noqa: E731
+    return {
+        'alineado': dataset_differences(aligned, reference),
+        'anual': dataset_differences(totals('Anio'), reference, keys=['Anio']),
+        'clasificaciones': dataset_differences(totals('Clasificacion'), reference, keys=['Clasificacion'])
+    }
+
+if __name__ == "__main__":
+    import time
+    from data_cache import load_cached_emissions_cube
+
+    file_paths = configured_data_files()
+    start = time.perf_counter()
+    cubes = load_datasets(file_paths, load_cached_emissions_cube)
+    print(f"{len(cubes)} inventarios cargados en {time.perf_counter() - start:.2f} s: {', '.join(cubes)}")
+    comparison = compare_datasets(cubes, "Total_Emisiones")
+    print(comparison['anual'])
+    if len(cubes) > 1:
+        label = list(cubes)[1]
+        print(comparison['clasificaciones'].sort(pl.col(f"Diferencia_{label}").abs(), descending=True).head(10))
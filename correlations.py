@@ -0,0 +1,104 @@
+"""
+Servicio de correlaciones entre gases, compartido por el mapa de calor y las métricas de texto.
+
+Todas las parejas de columnas se calculan en una sola consulta de Polars. Cada pareja
+usa solo las filas en las que ambas columnas son válidas (eliminación por parejas), de
+modo que las filas quedan alineadas y no se recortan columnas por separado.
+"""
+from itertools import combinations
+
+import polars as pl
+
+from category_hierarchy import attach_ancestor
+
+CORRELATION_COLUMNS = ['CH4_eq', 'CO2_eq', 'N2O_eq']
+
+CORRELATION_METHODS = {
+    'Pearson': 'pearson',
+    'Spearman': 'spearman'
+}
+
+def _valid(col):
+    return pl.col(col).is_not_null() & pl.col(col).is_not_nan()
+
+def _pair_expressions(columns, method):
+    """
+    Expresiones de correlación y de número de filas válidas para cada pareja de columnas.
+    """
+    exprs = []
+    for a, b in combinations(columns, 2):
+        valid = _valid(a) & _valid(b)
+        exprs.append(pl.corr(pl.col(a).filter(valid), pl.col(b).filter(valid), method=method)
+                     .fill_nan(None).alias(f'{a}|{b}'))
+        exprs.append(valid.sum().alias(f'n:{a}|{b}'))
+    return exprs
+
+def _to_long(wide, columns, by=()):
+    """
+    Convierte el resultado ancho de `_pair_expressions` en filas (by..., Variable_1, Variable_2, Correlacion, N).
+    """
+    pairs = list(combinations(columns, 2))
+    return pl.concat([
+        wide.select(
+            *by,
+            pl.lit(a).alias('Variable_1'),
+            pl.lit(b).alias('Variable_2'),
+            pl.col(f'{a}|{b}').alias('Correlacion'),
+            pl.col(f'n:{a}|{b}').cast(pl.UInt32).alias('N')
+        )
+        for a, b in pairs
+    ])
+
+def correlation_pairs(df, columns=CORRELATION_COLUMNS, method='pearson'):
+    """
+    Correlación de cada pareja de columnas en formato largo: Variable_1, Variable_2, Correlacion, N.
+    `Correlacion` es nula si la pareja tiene menos de dos filas válidas o varianza nula.
+    """
+    return _to_long(df.select(_pair_expressions(columns, method)), columns)
+
+def pairs_to_matrix(pairs, columns=CORRELATION_COLUMNS):
+    """
+    Matriz de correlación cuadrada (columna `Variable` + una columna por variable)
+    a partir del resultado de `correlation_pairs`.
+    """
+    values = {(a, a): 1.0 for a in columns}
+    for a, b, corr, _ in pairs.select(['Variable_1', 'Variable_2', 'Correlacion', 'N']).iter_rows():
+        values[(a, b)] = values[(b, a)] = corr
+    return pl.DataFrame({
+        'Variable': columns,
+        **{b: [values[(a, b)] for a in columns] for b in columns}
+    })
+
+def correlation_matrix(df, columns=CORRELATION_COLUMNS, method='pearson'):
+    """
+    Matriz de correlación cuadrada de las columnas indicadas (ver `pairs_to_matrix`).
+    """
+    return pairs_to_matrix(correlation_pairs(df, columns, method), columns)
+
+def correlation_by_group(df, group_col, columns=CORRELATION_COLUMNS, method='pearson'):
+    """
+    Correlaciones por pareja para todos los grupos de `group_col` en un único `group_by`.
+    Devuelve filas (grupo, Variable_1, Variable_2, Correlacion, N).
+    """
+    wide = df.group_by(group_col).agg(_pair_expressions(columns, method)).sort(group_col)
+    return _to_long(wide, columns, by=[group_col]).sort([group_col, 'Variable_1', 'Variable_2'])
+
+def correlation_by_sector(df, index, level=1, columns=CORRELATION_COLUMNS, method='pearson'):
+    """
+    Correlaciones por sector IPCC: cada fila se asigna a su ancestro de nivel `level`
+    (ver `category_hierarchy.attach_ancestor`). Devuelve filas (Sector, ...).
+    """
+    with_sector = attach_ancestor(df, index, level).with_columns(pl.col('Ancestro').cast(pl.String).alias('Sector'))
+    return correlation_by_group(with_sector, 'Sector', columns, method)
+
+if __name__ == "__main__":
+    from enhanced_data_processing import process_data_with_weighting
+    from category_hierarchy import build_category_index, attach_category_index, leaves_only
+
+    df = process_data_with_weighting("data/proyecto2.csv")
+    index = build_category_index(df['Clasificacion'].unique().to_list())
+    df = leaves_only(attach_category_index(df, index))
+    for name, method in CORRELATION_METHODS.items():
+        print(f"{name}:")
+        print(correlation_matrix(df, method=method))
+    print(correlation_by_sector(df, index))
@@ -0,0 +1,164 @@
+"""
+Carga del CSV de inventario de emisiones, compartida por `enhanced_data_processing` y `visualization`.
+
+La fuente puede ser un CSV, un Parquet o un directorio de fragmentos (shards) CSV/Parquet;
+en todos los casos se devuelve un único LazyFrame, apto para el motor de streaming de Polars.
+
+El formato (separador y separador decimal) se detecta una sola vez leyendo una muestra
+del inicio del archivo, y el esquema se declara completo para que Polars no infiera tipos:
+las columnas numéricas se leen directamente como Float64 en una sola pasada. Solo cuando
+el archivo usa coma decimal con ',' como separador de campos (valores entre comillas),
+combinación que Polars no admite de forma nativa, esas columnas se leen como texto y se
+convierten reemplazando la coma.
+"""
+import csv
+import glob
+import os
+import re
+
+import polars as pl
+
+# Nombres de columna del CSV original -> nombres usados en el resto del proyecto
+COLUMN_RENAMES = {
+    'AÑO': 'Anio',
+    'CLASIFICACION': 'Clasificacion'
+}
+
+NUMERIC_COLUMNS = ['CH4_eq', 'CO2_eq', 'N2O_eq', 'Total_Emisiones', 'Emisiones_netas']
+
+# Esquema del CSV original (antes de renombrar); las columnas desconocidas se leen como texto
+EMISSIONS_SCHEMA = {
+    'AÑO': pl.Int64,
+    'CLASIFICACION': pl.String,
+    **{col: pl.Float64 for col in NUMERIC_COLUMNS}
+}
+
+# Extensiones reconocidas al escanear un directorio de fragmentos
+SHARD_EXTENSIONS = ('.csv', '.parquet')
+
+# Bytes leídos del inicio del archivo para detectar el formato
+SNIFF_BYTES = 64 * 1024
+
+_DECIMAL_COMMA_PATTERN = re.compile(r'^\s*-?\d+,\d+\s*$')
+_DECIMAL_POINT_PATTERN = re.compile(r'^\s*-?\d*\.\d+\s*$')
+
+def sniff_csv_format(file_path, sample_bytes=SNIFF_BYTES):
+    """
+    Detecta el separador de campos, el separador decimal y los nombres de columna
+    a partir de las primeras líneas del archivo.
+
+    Devuelve un diccionario con `separator`, `decimal_comma` y `columns`.
+    """
+    with open(file_path, 'rb') as f:
+        sample = f.read(sample_bytes).decode('utf-8-sig', errors='replace')
+    lines = sample.splitlines()
+    if len(sample) == sample_bytes and len(lines) > 1:
+        # La última línea puede estar cortada
+        lines = lines[:-1]
+    if not lines:
+        return {'separator': ',', 'decimal_comma': False, 'columns': []}
+
+    header = lines[0]
+    separator = ';' if header.count(';') > header.count(',') else ','
+    rows = list(csv.reader(lines, delimiter=separator))
+    columns = rows[0]
+
+    # Votación sobre los valores de las columnas numéricas conocidas
+    numeric_positions = [i for i, col in enumerate(columns) if col in NUMERIC_COLUMNS]
+    comma_votes = point_votes = 0
+    for row in rows[1:]:
+        for i in numeric_positions:
+            if i < len(row):
+                comma_votes += bool(_DECIMAL_COMMA_PATTERN.match(row[i]))
+                point_votes += bool(_DECIMAL_POINT_PATTERN.match(row[i]))
+    return {'separator': separator, 'decimal_comma': comma_votes > point_votes, 'columns': columns}
+
+def build_schema(columns):
+    """
+    Esquema completo para las columnas indicadas: tipos conocidos de `EMISSIONS_SCHEMA`
+    y texto para el resto.
+    """
+    return {col: EMISSIONS_SCHEMA.get(col, pl.String) for col in columns}
+
+def scan_emissions_csv(file_path, schema=None):
+    """
+    Devuelve el LazyFrame del CSV con las columnas renombradas y las columnas numéricas
+    como Float64 con los nulos rellenados con 0.
+
+    `schema` permite fijar explícitamente el esquema completo del archivo (nombres
+    originales); si no se indica, se construye a partir de la cabecera.
+    """
+    csv_format = sniff_csv_format(file_path)
+    if schema is None:
+        schema = build_schema(csv_format['columns'])
+    numeric_cols = [col for col in NUMERIC_COLUMNS if col in schema]
+
+    # Polars no admite coma decimal con ',' como separador: esas columnas pasan por texto
+    convert_from_text = csv_format['decimal_comma'] and csv_format['separator'] == ','
+    if convert_from_text:
+        schema = {col: (pl.String if col in numeric_cols else dtype) for col, dtype in schema.items()}
+
+    lf = pl.scan_csv(
+        file_path,
+        separator=csv_format['separator'],
+        decimal_comma=csv_format['decimal_comma'] and not convert_from_text,
+        schema=schema
+    )
+    return _normalize_columns(lf, schema, numeric_cols, convert_from_text)
+
+def _normalize_columns(lf, schema, numeric_cols, convert_from_text):
+    """
+    Renombra las columnas y deja las numéricas como Float64 con los nulos en 0.
+    """
+    if convert_from_text:
+        numeric = [pl.col(col).str.replace_all(",", ".").cast(pl.Float64) for col in numeric_cols]
+    else:
+        numeric = [pl.col(col).cast(pl.Float64) for col in numeric_cols]
+    return lf.rename({old: new for old, new in COLUMN_RENAMES.items() if old in schema}).with_columns(
+        [expr.fill_null(0) for expr in numeric]
+    )
+
+def scan_emissions_parquet(file_path):
+    """
+    Devuelve el LazyFrame de un Parquet con las mismas columnas y tipos que `scan_emissions_csv`.
+    Las columnas numéricas guardadas como texto se convierten reemplazando la coma decimal.
+    """
+    lf = pl.scan_parquet(file_path)
+    schema = lf.collect_schema()
+    numeric_cols = [col for col in NUMERIC_COLUMNS if col in schema]
+    text_cols = [col for col in numeric_cols if schema[col] == pl.String]
+    lf = lf.with_columns(pl.col(col).str.replace_all(",", ".") for col in text_cols)
+    return _normalize_columns(lf, schema, numeric_cols, convert_from_text=False)
+
+def list_shards(directory):
+    """
+    Fragmentos CSV/Parquet de un directorio, en orden alfabético para que el resultado sea reproducible.
+    """
+    shards = sorted(
+        path for path in glob.glob(os.path.join(directory, '*'))
+        if path.lower().endswith(SHARD_EXTENSIONS) and os.path.isfile(path)
+    )
+    if not shards:
+        raise FileNotFoundError(f"No hay archivos {', '.join(SHARD_EXTENSIONS)} en '{directory}'")
+    return shards
+
+def scan_emissions_source(source, schema=None):
+    """
+    LazyFrame normalizado para un CSV, un Parquet o un directorio de fragmentos.
+
+    Los fragmentos se concatenan de forma perezosa, así que con `collect(engine="streaming")`
+    o `sink_parquet` se procesan por lotes sin cargar la fuente completa en memoria.
+    `schema` solo se aplica a los CSV.
+    """
+    paths = list_shards(source) if os.path.isdir(source) else [source]
+    frames = [
+        scan_emissions_parquet(path) if path.lower().endswith('.parquet') else scan_emissions_csv(path, schema=schema)
+        for path in paths
+    ]
+    return frames[0] if len(frames) == 1 else pl.concat(frames, how='diagonal_relaxed')
+
+def load_emissions_csv(file_path, schema=None):
+    """
+    Versión ansiosa de `scan_emissions_csv`.
+    """
+    return scan_emissions_csv(file_path, schema=schema).collect()
@@ -0,0 +1,323 @@
+import hashlib
+import json
+import os
+import re
+import warnings
+
+import polars as pl
+
+from enhanced_data_processing import (GWP_VALUES, ENVIRONMENTAL_DAMAGE_FACTORS, COMBINED_IMPACT_WEIGHTS,
+                                      build_weighting_pipeline, process_data_with_weighting)
+from aggregations import build_emissions_cube, update_emissions_cube
+
+# Directorio por defecto de la caché persistente (se puede cambiar con la variable de entorno)
+CACHE_DIR = os.environ.get("EMISSIONS_CACHE_DIR", ".cache")
+
+# Incrementar cuando cambie la lógica de `process_data_with_weighting` para invalidar las cachés existentes
+CACHE_FORMAT_VERSION = 1
+
+# Huellas ya calculadas, indexadas por (ruta, tamaño, fecha de modificación), para no releer el CSV en cada llamada
+_fingerprints = {}
+
+def _file_digest(file_path):
+    """
+    Calcula el SHA-256 del archivo fuente, reutilizando el resultado mientras el archivo no cambie.
+    """
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _fingerprints:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        _fingerprints[memo_key] = digest.hexdigest()
+    return _fingerprints[memo_key]
+
+def compute_cache_key(file_path, compact=False):
+    """
+    Clave de caché: hash del archivo fuente más las tablas de ponderación vigentes.
+    Cualquier cambio en el CSV, en `GWP_VALUES`, en `ENVIRONMENTAL_DAMAGE_FACTORS` o en
+    `COMBINED_IMPACT_WEIGHTS` produce otra clave.
+    """
+    weights = json.dumps({
+        'compact': compact,
+        'version': CACHE_FORMAT_VERSION,
+        'gwp': GWP_VALUES,
+        'damage': ENVIRONMENTAL_DAMAGE_FACTORS,
+        'impact': COMBINED_IMPACT_WEIGHTS
+    }, sort_keys=True)
+    digest = hashlib.sha256(_file_digest(file_path).encode())
+    digest.update(weights.encode())
+    return digest.hexdigest()[:32]
+
+def _cache_prefix(file_path, compact=False):
+    # El hash de la ruta absoluta distingue fuentes con el mismo nombre en directorios distintos
+    variant = "compact" if compact else "full"
+    path_hash = hashlib.sha256(os.path.abspath(file_path).encode()).hexdigest()[:12]
+    return f"{os.path.splitext(os.path.basename(file_path))[0]}-{path_hash}-{variant}-"
+
+def get_cache_path(file_path, cache_dir=CACHE_DIR, compact=False):
+    """
+    Ruta del archivo Arrow IPC que corresponde al estado actual de la fuente y las ponderaciones.
+    """
+    return os.path.join(cache_dir, f"{_cache_prefix(file_path, compact)}{compute_cache_key(file_path, compact)}.arrow")
+
+def _entry_files(cache_path):
+    """
+    Archivos asociados a una entrada de caché: cubo pre-agregado sin deltas, manifiesto de
+    deltas y prefijo de los archivos de delta.
+    """
+    stem = cache_path[:-len(".arrow")]
+    return {
+        'cube': f"{stem}.cube.arrow",
+        'manifest': f"{stem}.deltas.json",
+        'delta_prefix': f"{stem}.delta-"
+    }
+
+def _cube_file(cache_path, applied_deltas):
+    """
+    Nombre del cubo que incluye los `applied_deltas` primeros deltas del manifiesto. Cada
+    ingesta escribe un cubo nuevo, y el manifiesto (el número de deltas que registra) decide
+    cuál es el vigente: un cubo escrito por una ingesta interrumpida nunca se usa.
+    """
+    if applied_deltas == 0:
+        return os.path.basename(_entry_files(cache_path)['cube'])
+    return f"{os.path.basename(cache_path)[:-len('.arrow')]}.cube-{applied_deltas:04d}.arrow"
+
+# Nombre de un archivo de entrada tras el prefijo: clave de caché y sufijo (.arrow, .cube.arrow, .deltas.json...)
+_ENTRY_NAME_PATTERN = re.compile(r'^(?P<key>[0-9a-f]{32})\.')
+
+def _stale_entries(file_path, cache_dir, keep, compact=False):
+    """
+    Archivos de las entradas de la misma fuente y variante con una clave distinta de la de
+    `keep`, agrupados por clave: {clave: [nombres de archivo]}.
+    """
+    prefix = _cache_prefix(file_path, compact)
+    keep_key = os.path.basename(keep)[len(prefix):-len(".arrow")]
+    entries = {}
+    for name in os.listdir(cache_dir):
+        if not name.startswith(prefix) or name.endswith(".tmp"):
+            continue
+        match = _ENTRY_NAME_PATTERN.match(name[len(prefix):])
+        if match and match['key'] != keep_key:
+            entries.setdefault(match['key'], []).append(name)
+    return entries
+
+def _reweight_part(part):
+    """
+    Vuelve a aplicar las ponderaciones vigentes a una parte ya procesada (las columnas de origen
+    se conservan en ella), manteniendo sus tipos.
+    """
+    reweighted = build_weighting_pipeline(part.lazy()).collect()
+    return reweighted.select(pl.col(col).cast(dtype) for col, dtype in part.schema.items())
+
+def _carry_over_deltas(file_path, cache_dir, cache_path, compact=False):
+    """
+    Si la clave cambió sin que cambiara la fuente (nuevas ponderaciones o `CACHE_FORMAT_VERSION`),
+    traslada a la entrada nueva los deltas de la anterior, vueltos a ponderar.
+    """
+    source_digest = _file_digest(file_path)
+    prefix = _cache_prefix(file_path, compact)
+    manifests = [_read_manifest(os.path.join(cache_dir, f"{prefix}{key}.arrow"))
+                 for key in _stale_entries(file_path, cache_dir, cache_path, compact)]
+    candidates = [manifest for manifest in manifests
+                  if manifest['source_sha256'] == source_digest and manifest['deltas']]
+    if not candidates:
+        return
+    delta_prefix = os.path.basename(_entry_files(cache_path)['delta_prefix'])
+    deltas = []
+    for i, delta in enumerate(max(candidates, key=lambda manifest: len(manifest['deltas']))['deltas']):
+        delta_file = f"{delta_prefix}{i:04d}-{delta['sha256'][:12]}.arrow"
+        _write_ipc_atomic(_reweight_part(pl.read_ipc(os.path.join(cache_dir, delta['file']))),
+                          os.path.join(cache_dir, delta_file))
+        deltas.append({**delta, 'file': delta_file})
+    _write_manifest(cache_path, {'source_sha256': source_digest, 'deltas': deltas})
+
+def _prune_stale_entries(file_path, cache_dir, keep, compact=False):
+    """
+    Elimina las entradas de la misma fuente y variante con otra clave (con sus cubos y deltas),
+    que ya no pueden volver a usarse. Sus deltas ya se han trasladado a `keep` si la fuente
+    es la misma; si la fuente cambió se descartan, y se avisa de ello.
+    """
+    source_digest = _file_digest(file_path)
+    prefix = _cache_prefix(file_path, compact)
+    for key, names in _stale_entries(file_path, cache_dir, keep, compact).items():
+        manifest = _read_manifest(os.path.join(cache_dir, f"{prefix}{key}.arrow"))
+        if manifest['deltas'] and manifest['source_sha256'] != source_digest:
+            sources = ", ".join(delta['source'] for delta in manifest['deltas'])
+            warnings.warn(f"La fuente {file_path} ha cambiado: se descartan {len(manifest['deltas'])} deltas "
+                          f"ingeridos en la caché anterior ({sources}). Vuelve a ingerirlos con `--delta` si "
+                          f"no están incluidos en la fuente nueva.", stacklevel=3)
+        for name in names:
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError:
+                pass
+
+def _write_ipc_atomic(df, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.write_ipc(tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+
+def _read_manifest(cache_path):
+    """
+    Manifiesto de la entrada: huella de la fuente (`source_sha256`) y deltas ingeridos, en orden.
+    """
+    manifest_path = _entry_files(cache_path)['manifest']
+    if not os.path.exists(manifest_path):
+        return {'source_sha256': None, 'deltas': []}
+    with open(manifest_path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_manifest(cache_path, manifest):
+    manifest_path = _entry_files(cache_path)['manifest']
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def _unify_label_dtype(parts):
+    """
+    Con el esquema compacto cada delta puede ampliar el Enum de `Clasificacion` con etiquetas
+    nuevas (siempre añadidas al final); las partes anteriores se convierten al Enum más reciente.
+    """
+    label_dtype = parts[-1].schema['Clasificacion']
+    if not isinstance(label_dtype, pl.Enum):
+        return parts
+    return [
+        part if part.schema['Clasificacion'] == label_dtype
+        else part.with_columns(pl.col('Clasificacion').cast(label_dtype))
+        for part in parts
+    ]
+
+def load_cached_processed_data(file_path, cache_dir=CACHE_DIR, compact=False):
+    """
+    Devuelve el resultado de `process_data_with_weighting` desde la caché en disco.
+    Las variantes completa y compacta (`compact=True`) se guardan por separado.
+
+    La caché se guarda en formato Arrow IPC sin comprimir, de modo que se abre
+    mediante memory-map sin volver a interpretar el CSV. Si no existe (o está
+    invalidada) se procesa la fuente y se escribe de forma atómica; si el
+    directorio no es escribible se devuelve el DataFrame sin cachear. Los deltas
+    registrados con `ingest_delta` se añaden a continuación sin copiar los datos
+    y se conservan (vueltos a ponderar) aunque cambien las ponderaciones.
+    """
+    cache_path = get_cache_path(file_path, cache_dir, compact)
+    if not os.path.exists(cache_path):
+        df = process_data_with_weighting(file_path, compact=compact)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Los deltas se trasladan antes de escribir la parte base, que marca la entrada como completa
+            _carry_over_deltas(file_path, cache_dir, cache_path, compact)
+            _write_ipc_atomic(df, cache_path)
+            _prune_stale_entries(file_path, cache_dir, keep=cache_path, compact=compact)
+        except OSError:
+            return df
+
+    return _read_parts(cache_path, _read_manifest(cache_path)['deltas'])
+
+def _read_parts(cache_path, deltas):
+    # Parte base más las partes de `deltas`, abiertas con memory-map
+    cache_dir = os.path.dirname(cache_path)
+    parts = [pl.read_ipc(cache_path, memory_map=True)]
+    parts += [pl.read_ipc(os.path.join(cache_dir, delta['file']), memory_map=True) for delta in deltas]
+    if len(parts) == 1:
+        return parts[0]
+    return pl.concat(_unify_label_dtype(parts), rechunk=False)
+
+def load_cached_emissions_cube(file_path, cache_dir=CACHE_DIR, compact=False):
+    """
+    Devuelve el cubo por (Anio, Clasificacion) persistido junto a los datos procesados,
+    construyéndolo la primera vez. `ingest_delta` lo mantiene actualizado.
+    """
+    df = load_cached_processed_data(file_path, cache_dir, compact)
+    cache_path = get_cache_path(file_path, cache_dir, compact)
+    if not os.path.exists(cache_path):
+        # Directorio no escribible: no hay caché en disco
+        return build_emissions_cube(df)
+    # El cubo corresponde exactamente a los deltas de este manifiesto (no a los que `df` haya leído)
+    manifest = _read_manifest(cache_path)
+    deltas = manifest['deltas']
+    cube_path = os.path.join(cache_dir, manifest.get('cube') or _cube_file(cache_path, len(deltas)))
+    if os.path.exists(cube_path):
+        return pl.read_ipc(cube_path, memory_map=True)
+    cube = build_emissions_cube(_read_parts(cache_path, deltas))
+    try:
+        _write_ipc_atomic(cube, cube_path)
+    except OSError:
+        pass
+    return cube
+
+def get_dataset_version(file_path, cache_dir=CACHE_DIR, compact=False):
+    """
+    Identificador barato del estado del dataset (fuente, ponderaciones y deltas ingeridos),
+    pensado como argumento de las funciones cacheadas con `st.cache_data`.
+    """
+    cache_path = get_cache_path(file_path, cache_dir, compact)
+    deltas = _read_manifest(cache_path)['deltas'] if os.path.exists(cache_path) else []
+    return f"{compute_cache_key(file_path, compact)}+{len(deltas)}"
+
+def ingest_delta(file_path, delta_path, cache_dir=CACHE_DIR, compact=False):
+    """
+    Ingesta incremental: procesa solo las filas de `delta_path` (un CSV con el mismo formato
+    que la fuente), las añade como una parte nueva del dataset cacheado de `file_path` y
+    actualiza el cubo pre-agregado sumando únicamente las celdas afectadas.
+
+    El coste es proporcional al tamaño del delta. Ingerir dos veces el mismo archivo no
+    tiene efecto. El manifiesto es el punto de confirmación: la parte nueva y el cubo
+    actualizado se escriben con nombres propios antes que él, de modo que una ingesta
+    interrumpida no deja el delta contado en el cubo vigente y puede repetirse.
+    Devuelve un resumen con las filas añadidas y los años afectados.
+    """
+    cache_path = get_cache_path(file_path, cache_dir, compact)
+    cube = load_cached_emissions_cube(file_path, cache_dir, compact)
+    deltas = _read_manifest(cache_path)['deltas']
+    delta_hash = _file_digest(delta_path)
+    if any(delta['sha256'] == delta_hash for delta in deltas):
+        return {'rows': 0, 'years': [], 'already_ingested': True}
+
+    delta_df = process_data_with_weighting(delta_path, compact=compact)
+    if compact:
+        # Ampliar el Enum vigente con las etiquetas nuevas del delta, conservando el orden existente
+        last_part = deltas[-1]['file'] if deltas else os.path.basename(cache_path)
+        current = pl.scan_ipc(os.path.join(cache_dir, last_part)).collect_schema()['Clasificacion']
+        known = set(current.categories.to_list())
+        new_labels = sorted(set(delta_df['Clasificacion'].cast(pl.String).drop_nulls().to_list()) - known)
+        label_dtype = pl.Enum(current.categories.to_list() + new_labels) if new_labels else current
+        delta_df = delta_df.with_columns(pl.col('Clasificacion').cast(pl.String).cast(label_dtype))
+
+    delta_file = f"{os.path.basename(_entry_files(cache_path)['delta_prefix'])}{len(deltas):04d}-{delta_hash[:12]}.arrow"
+    _write_ipc_atomic(delta_df, os.path.join(cache_dir, delta_file))
+
+    if compact and cube.schema['Clasificacion'] != delta_df.schema['Clasificacion']:
+        cube = cube.with_columns(pl.col('Clasificacion').cast(delta_df.schema['Clasificacion']))
+    updated_cube = update_emissions_cube(cube, build_emissions_cube(delta_df))
+    cube_file = _cube_file(cache_path, len(deltas) + 1)
+    _write_ipc_atomic(updated_cube, os.path.join(cache_dir, cube_file))
+
+    previous_cube = os.path.join(cache_dir, _read_manifest(cache_path).get('cube') or _cube_file(cache_path, len(deltas)))
+    deltas.append({'file': delta_file, 'sha256': delta_hash, 'source': os.path.basename(delta_path), 'rows': delta_df.height})
+    _write_manifest(cache_path, {'source_sha256': _file_digest(file_path), 'cube': cube_file, 'deltas': deltas})
+    try:
+        os.remove(previous_cube)
+    except OSError:
+        pass
+    return {'rows': delta_df.height, 'years': sorted(delta_df['Anio'].unique().to_list()), 'already_ingested': False}
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gestiona la caché de datos procesados.")
+    parser.add_argument("file_path", nargs="?", default="data/proyecto2.csv", help="CSV fuente del inventario")
+    parser.add_argument("--delta", action="append", default=[], help="CSV con filas nuevas a ingerir (repetible)")
+    parser.add_argument("--compact", action="store_true", help="Usar la variante con esquema compacto")
+    args = parser.parse_args()
+
+    for delta_path in args.delta:
+        summary = ingest_delta(args.file_path, delta_path, compact=args.compact)
+        if summary['already_ingested']:
+            print(f"{delta_path}: ya ingerido, sin cambios")
+        else:
+            print(f"{delta_path}: {summary['rows']} filas añadidas (años {summary['years']})")
+    df = load_cached_processed_data(args.file_path, compact=args.compact)
+    print(f"Dataset en caché: {df.height} filas, versión {get_dataset_version(args.file_path, compact=args.compact)}")
@@ -0,0 +1,49 @@
+"""
+Paginación en el servidor para la tabla de datos detallados.
+
+Solo la ventana visible se proyecta, se ordena y se corta en Polars, y se entrega
+como tabla Arrow, sin pasar por pandas. Polars convierte un `sort` seguido de `head`
+en una selección parcial (top-k), así que para las primeras páginas no se ordena el
+DataFrame completo.
+"""
+import math
+
+import polars as pl
+
+PAGE_SIZES = [50, 100, 250, 500]
+
+def page_count(n_rows, page_size):
+    """
+    Número de páginas para `n_rows` filas (al menos una, aunque no haya datos).
+    """
+    return max(1, math.ceil(n_rows / page_size))
+
+def get_page(df, page, page_size, sort_by=None, descending=False, columns=None):
+    """
+    Devuelve la página `page` (empezando en 1) como DataFrame de Polars.
+
+    `columns` limita las columnas devueltas (proyección); la columna de orden no
+    necesita estar entre ellas.
+    """
+    offset = (page - 1) * page_size
+    lf = df.lazy()
+    if sort_by:
+        # El número de fila desempata los valores iguales, para que las páginas no se solapen entre reruns
+        lf = lf.with_row_index('_fila').sort(
+            [sort_by, '_fila'], descending=[descending, False], nulls_last=True
+        ).head(offset + page_size).drop('_fila')
+    if columns:
+        lf = lf.select(columns)
+    return lf.slice(offset, page_size).collect()
+
+def get_page_arrow(df, page, page_size, sort_by=None, descending=False, columns=None):
+    """
+    Igual que `get_page`, pero devuelve la ventana como `pyarrow.Table` para enviarla
+    directamente al navegador. Las etiquetas Enum/Categorical se envían como texto: los
+    diccionarios de Arrow con índices sin signo no son compatibles con todos los lectores.
+    """
+    window = get_page(df, page, page_size, sort_by, descending, columns)
+    return window.with_columns(
+        pl.col(col).cast(pl.String) for col, dtype in window.schema.items()
+        if isinstance(dtype, (pl.Enum, pl.Categorical))
+    ).to_arrow()
@@ -1,5 +1,10 @@
+import os
+import sys
+
 import polars as pl
-import numpy as np
+
+from csv_loader import list_shards, scan_emissions_source
+from instrumentation import stage
 
 # Potenciales de Calentamiento Global (GWP) a 100 años según IPCC AR6
 # Estos valores reflejan cuántas veces más potente es cada gas comparado con CO2
@@ -16,116 +21,208 @@ ENVIRONMENTAL_DAMAGE_FACTORS = {
     'N2O': 9       # Daño muy alto y persistente
 }
 
-def process_data_with_weighting(file_path):
+# Pesos del índice de impacto combinado: Impacto = gwp * Total GWP + damage * Total daño
+COMBINED_IMPACT_WEIGHTS = {
+    'gwp': 0.7,
+    'damage': 0.3
+}
+
+GAS_COLUMNS = ['CO2', 'CH4', 'N2O']
+
+# Columnas calculadas por el pipeline; en el esquema compacto se guardan como Float32
+DERIVED_COLUMNS = (
+    [f'{gas}_GWP_weighted' for gas in GAS_COLUMNS] + ['Total_GWP_weighted']
+    + [f'{gas}_damage_weighted' for gas in GAS_COLUMNS] + ['Total_damage_weighted', 'Impacto_Combinado']
+    + [f'{gas}_porcentaje_contribucion' for gas in GAS_COLUMNS]
+)
+
+# Tipo de dato de `Anio` en el esquema compacto (los años caben holgadamente en 16 bits)
+COMPACT_YEAR_DTYPE = pl.Int16
+
+def _engine(streaming):
+    # Motor de Polars: "streaming" procesa por lotes con memoria acotada
+    return "streaming" if streaming else "auto"
+
+def _source_bytes(source):
+    # Bytes de la fuente que se leen y convierten (para la instrumentación)
+    if isinstance(source, pl.LazyFrame):
+        return None
+    paths = list_shards(source) if os.path.isdir(source) else [source]
+    return sum(os.path.getsize(path) for path in paths)
+
+def build_weighting_pipeline(source, schema=None):
     """
-    Procesa los datos aplicando ponderaciones basadas en el potencial de calentamiento global
-    y factores de daño ambiental.
+    Construye el plan perezoso (LazyFrame) de carga y ponderación.
+
+    `source` es un CSV, un Parquet o un directorio de fragmentos (ver
+    `csv_loader.scan_emissions_source`), o un LazyFrame ya normalizado.
+    Todas las columnas derivadas se declaran como expresiones sobre el escaneo, de modo
+    que Polars las fusiona en un solo plan de consulta y la fuente se lee una única vez
+    al hacer `collect()`. `schema` se pasa al cargador para fijar los tipos del CSV sin inferencia.
     """
-    # Cargar y limpiar datos básicos
-    df = pl.read_csv(file_path)
-    df = df.rename({
-        'AÑO': 'Anio',
-        'CLASIFICACION': 'Clasificacion',
-        'CH4_eq': 'CH4_eq',
-        'CO2_eq': 'CO2_eq',
-        'N2O_eq': 'N2O_eq',
-        'Total_Emisiones': 'Total_Emisiones',
-        'Emisiones_netas': 'Emisiones_netas'
-    })
-    
-    # Convertir columnas numéricas
-    numeric_cols = ['CH4_eq', 'CO2_eq', 'N2O_eq', 'Total_Emisiones', 'Emisiones_netas']
-    for col in numeric_cols:
-        if col in df.columns:
-            df = df.with_columns(pl.col(col).cast(pl.String).str.replace_all(",", ".").cast(pl.Float64))
-    
-    # Rellenar valores nulos con 0
-    for col in numeric_cols:
-        if col in df.columns:
-            df = df.with_columns(pl.col(col).fill_null(0))
-    
+    # Columnas renombradas y numéricas ya convertidas a Float64 con nulos en 0
+    if isinstance(source, pl.LazyFrame):
+        lf = source
+    else:
+        lf = scan_emissions_source(source, schema=schema)
+
     # Filtrar filas con años nulos
-    df = df.filter(pl.col('Anio').is_not_null())
-    
-    # Calcular emisiones ponderadas por GWP (Potencial de Calentamiento Global)
-    df = df.with_columns([
-        (pl.col('CO2_eq') * GWP_VALUES['CO2']).alias('CO2_GWP_weighted'),
-        (pl.col('CH4_eq') * GWP_VALUES['CH4']).alias('CH4_GWP_weighted'),
-        (pl.col('N2O_eq') * GWP_VALUES['N2O']).alias('N2O_GWP_weighted')
-    ])
-    
-    # Calcular total ponderado por GWP
-    df = df.with_columns(
-        (pl.col('CO2_GWP_weighted') + pl.col('CH4_GWP_weighted') + pl.col('N2O_GWP_weighted')).alias('Total_GWP_weighted')
-    )
-    
-    # Calcular emisiones ponderadas por factor de daño ambiental
-    df = df.with_columns([
-        (pl.col('CO2_eq') * ENVIRONMENTAL_DAMAGE_FACTORS['CO2']).alias('CO2_damage_weighted'),
-        (pl.col('CH4_eq') * ENVIRONMENTAL_DAMAGE_FACTORS['CH4']).alias('CH4_damage_weighted'),
-        (pl.col('N2O_eq') * ENVIRONMENTAL_DAMAGE_FACTORS['N2O']).alias('N2O_damage_weighted')
-    ])
-    
-    # Calcular total ponderado por daño ambiental
-    df = df.with_columns(
-        (pl.col('CO2_damage_weighted') + pl.col('CH4_damage_weighted') + pl.col('N2O_damage_weighted')).alias('Total_damage_weighted')
+    lf = lf.filter(pl.col('Anio').is_not_null())
+
+    # Emisiones ponderadas por GWP (Potencial de Calentamiento Global) y por factor de daño ambiental
+    gwp = {gas: pl.col(f'{gas}_eq') * GWP_VALUES[gas] for gas in GAS_COLUMNS}
+    damage = {gas: pl.col(f'{gas}_eq') * ENVIRONMENTAL_DAMAGE_FACTORS[gas] for gas in GAS_COLUMNS}
+    total_gwp = gwp['CO2'] + gwp['CH4'] + gwp['N2O']
+    total_damage = damage['CO2'] + damage['CH4'] + damage['N2O']
+
+    return lf.with_columns(
+        *[expr.alias(f'{gas}_GWP_weighted') for gas, expr in gwp.items()],
+        total_gwp.alias('Total_GWP_weighted'),
+        *[expr.alias(f'{gas}_damage_weighted') for gas, expr in damage.items()],
+        total_damage.alias('Total_damage_weighted'),
+        # Índice de impacto combinado (GWP + Daño Ambiental)
+        ((total_gwp * COMBINED_IMPACT_WEIGHTS['gwp']) + (total_damage * COMBINED_IMPACT_WEIGHTS['damage'])).alias('Impacto_Combinado'),
+        # Porcentajes de contribución por gas (basado en GWP); las divisiones por cero quedan en 0
+        *[(gwp[gas] / total_gwp * 100).fill_null(0).alias(f'{gas}_porcentaje_contribucion')
+          for gas in GAS_COLUMNS]
     )
-    
-    # Calcular índice de impacto combinado (GWP + Daño Ambiental)
-    df = df.with_columns(
-        ((pl.col('Total_GWP_weighted') * 0.7) + (pl.col('Total_damage_weighted') * 0.3)).alias('Impacto_Combinado')
+
+def apply_compact_schema(df):
+    """
+    Reduce la memoria del DataFrame procesado: `Clasificacion` como Enum (diccionario de
+    etiquetas), `Anio` como Int16 y las columnas derivadas como Float32. Las columnas de
+    origen (`*_eq`, `Total_Emisiones`, `Emisiones_netas`) conservan Float64.
+
+    Sobre un LazyFrame se usa `pl.Categorical`, porque las categorías del Enum no se conocen
+    hasta materializar los datos.
+    """
+    if isinstance(df, pl.LazyFrame):
+        label_dtype = pl.Categorical
+        available = df.collect_schema().names()
+    else:
+        label_dtype = pl.Enum(df['Clasificacion'].drop_nulls().unique().sort())
+        available = df.columns
+    return df.with_columns(
+        pl.col('Clasificacion').cast(label_dtype),
+        pl.col('Anio').cast(COMPACT_YEAR_DTYPE),
+        *[pl.col(col).cast(pl.Float32) for col in DERIVED_COLUMNS if col in available]
     )
-    
-    # Calcular porcentajes de contribución por gas (basado en GWP)
-    df = df.with_columns([
-        (pl.col('CO2_GWP_weighted') / pl.col('Total_GWP_weighted') * 100).alias('CO2_porcentaje_contribucion'),
-        (pl.col('CH4_GWP_weighted') / pl.col('Total_GWP_weighted') * 100).alias('CH4_porcentaje_contribucion'),
-        (pl.col('N2O_GWP_weighted') / pl.col('Total_GWP_weighted') * 100).alias('N2O_porcentaje_contribucion')
-    ])
-    
-    # Manejar divisiones por cero
-    df = df.with_columns([
-        pl.col('CO2_porcentaje_contribucion').fill_null(0),
-        pl.col('CH4_porcentaje_contribucion').fill_null(0),
-        pl.col('N2O_porcentaje_contribucion').fill_null(0)
-    ])
-    
-    return df
 
-def calculate_weighted_statistics(df):
+def estimate_memory_savings(compact_df):
+    """
+    Estima cuánta memoria ahorra el esquema compacto respecto al esquema completo
+    (String, Int64 y Float64) sin materializar la versión completa del DataFrame.
+    """
+    compact_bytes = compact_df.estimated_size()
+    full_bytes = 0
+    for col in compact_df.columns:
+        series = compact_df[col]
+        if isinstance(series.dtype, (pl.Enum, pl.Categorical)):
+            full_bytes += series.cast(pl.String).estimated_size()
+        elif series.dtype == COMPACT_YEAR_DTYPE:
+            full_bytes += series.estimated_size() * 4
+        elif series.dtype == pl.Float32:
+            full_bytes += series.estimated_size() * 2
+        else:
+            full_bytes += series.estimated_size()
+    saved_bytes = full_bytes - compact_bytes
+    return {
+        'full_bytes': full_bytes,
+        'compact_bytes': compact_bytes,
+        'saved_bytes': saved_bytes,
+        'saved_pct': saved_bytes / full_bytes * 100 if full_bytes else 0.0
+    }
+
+def process_data_with_weighting(file_path, lazy=False, compact=False, schema=None, streaming=False):
+    """
+    Procesa los datos aplicando ponderaciones basadas en el potencial de calentamiento global
+    y factores de daño ambiental.
+
+    `file_path` puede ser un CSV, un Parquet o un directorio de fragmentos CSV/Parquet.
+    Con `lazy=True` devuelve el LazyFrame sin materializar, para que el llamador
+    pueda añadir filtros o agregaciones al mismo plan antes de `collect()`.
+    Con `compact=True` aplica `apply_compact_schema` al resultado.
+    Con `streaming=True` el plan se ejecuta con el motor de streaming de Polars (lectura por lotes).
+    `schema` fija el esquema del CSV (ver `csv_loader.scan_emissions_csv`).
+    """
+    lf = build_weighting_pipeline(file_path, schema=schema)
+    if lazy:
+        return apply_compact_schema(lf) if compact else lf
+    with stage("ponderacion") as s:
+        s.input_bytes = _source_bytes(file_path)
+        df = lf.collect(engine=_engine(streaming))
+        return s.measure(apply_compact_schema(df) if compact else df)
+
+def write_weighted_parquet(source, output_path, compact=False, schema=None):
+    """
+    Escribe las filas ponderadas de `source` en un Parquet sin materializarlas en memoria
+    (`sink_parquet` con el motor de streaming). Devuelve `output_path`.
+    """
+    lf = process_data_with_weighting(source, lazy=True, compact=compact, schema=schema)
+    lf.sink_parquet(output_path, engine="streaming")
+    return output_path
+
+def calculate_weighted_statistics(df, streaming=False):
     """
     Calcula estadísticas avanzadas con las ponderaciones aplicadas.
+
+    Acepta un DataFrame o un LazyFrame (por ejemplo, `process_data_with_weighting(..., lazy=True)`
+    sobre un directorio de fragmentos). Las dos agregaciones se ejecutan juntas con
+    `pl.collect_all`, y con `streaming=True` usan el motor de streaming, de modo que la
+    memoria queda acotada por el número de años y clasificaciones, no por el de filas.
     """
+    lf = df.lazy()
+    pct_cols = [f'{gas}_porcentaje_contribucion' for gas in ['CO2', 'CH4', 'N2O']]
+
+    # En el esquema compacto las columnas derivadas son Float32 y `Anio` Int16: se suman en
+    # Float64 (como `aggregations.build_emissions_cube`) y las claves vuelven a los tipos del
+    # esquema completo: el resultado tiene los mismos tipos con ambos esquemas y los totales
+    # solo difieren en el redondeo Float32 de cada fila (error relativo del orden de 1e-9)
+    total = lambda col: pl.col(col).cast(pl.Float64).sum()  # noqa: E731
+
+    # Sumas parciales por año: los totales globales se derivan de ellas (unas decenas de
+    # filas), así el orden de suma es el mismo con ambos motores y, para un mismo esquema,
+    # el resultado es idéntico en memoria y en streaming
+    per_year = lf.group_by(pl.col('Anio').cast(pl.Int64)).agg([
+        total('CO2_GWP_weighted').alias('CO2_total'),
+        total('CH4_GWP_weighted').alias('CH4_total'),
+        total('N2O_GWP_weighted').alias('N2O_total'),
+        total('Total_GWP_weighted').alias('Total_GWP'),
+        total('Total_damage_weighted'),
+        total('Impacto_Combinado'),
+        *[total(col) for col in pct_cols],
+        pl.len().alias('Registros')
+    ]).sort('Anio')
+
+    # Clasificaciones más problemáticas; el nombre desempata para que el top no dependa del motor
+    top_classifications = lf.group_by('Clasificacion').agg([
+        total('Total_GWP_weighted').alias('Total_GWP_weighted'),
+        total('Impacto_Combinado').alias('Impacto_Combinado')
+    ]).with_columns(pl.col('Clasificacion').cast(pl.String)).sort(
+        ['Total_GWP_weighted', 'Clasificacion'], descending=[True, False]
+    ).head(10)
+
+    with stage("estadisticas_ponderadas") as s:
+        per_year, top_classifications = pl.collect_all([per_year, top_classifications], engine=_engine(streaming))
+        s.rows = per_year['Registros'].sum()
+
     stats = {}
-    
+
     # Estadísticas básicas de emisiones ponderadas
-    stats['total_gwp_weighted'] = df['Total_GWP_weighted'].sum()
-    stats['total_damage_weighted'] = df['Total_damage_weighted'].sum()
-    stats['total_combined_impact'] = df['Impacto_Combinado'].sum()
-    
+    stats['total_gwp_weighted'] = per_year['Total_GWP'].sum()
+    stats['total_damage_weighted'] = per_year['Total_damage_weighted'].sum()
+    stats['total_combined_impact'] = per_year['Impacto_Combinado'].sum()
+
     # Contribución promedio por gas
-    stats['avg_co2_contribution'] = df['CO2_porcentaje_contribucion'].mean()
-    stats['avg_ch4_contribution'] = df['CH4_porcentaje_contribucion'].mean()
-    stats['avg_n2o_contribution'] = df['N2O_porcentaje_contribucion'].mean()
-    
+    records = per_year['Registros'].sum()
+    for gas, col in zip(['co2', 'ch4', 'n2o'], pct_cols):
+        stats[f'avg_{gas}_contribution'] = per_year[col].sum() / records if records else None
+
     # Gas más problemático por año
-    emissions_by_year = df.group_by('Anio').agg([
-        pl.sum('CO2_GWP_weighted').alias('CO2_total'),
-        pl.sum('CH4_GWP_weighted').alias('CH4_total'),
-        pl.sum('N2O_GWP_weighted').alias('N2O_total'),
-        pl.sum('Total_GWP_weighted').alias('Total_GWP')
-    ]).sort('Anio')
-    
-    stats['emissions_by_year'] = emissions_by_year
-    
+    stats['emissions_by_year'] = per_year.select('Anio', 'CO2_total', 'CH4_total', 'N2O_total', 'Total_GWP')
+
     # Clasificaciones más problemáticas
-    top_classifications = df.group_by('Clasificacion').agg([
-        pl.sum('Total_GWP_weighted').alias('Total_GWP_weighted'),
-        pl.sum('Impacto_Combinado').alias('Impacto_Combinado')
-    ]).sort('Total_GWP_weighted', descending=True).head(10)
-    
     stats['top_classifications'] = top_classifications
-    
     return stats
 
 def get_gas_impact_info():
@@ -161,16 +258,22 @@ def get_gas_impact_info():
     return gas_info
 
 if __name__ == "__main__":
-    # Procesar datos con ponderaciones
-    file_path = "data/proyecto2.csv"
-    df_weighted = process_data_with_weighting(file_path)
-    
-    print("DataFrame con ponderaciones aplicadas:")
-    print(df_weighted.head())
-    print(f"\nColumnas disponibles: {df_weighted.columns}")
-    
-    # Calcular estadísticas
-    stats = calculate_weighted_statistics(df_weighted)
+    # Procesar datos con ponderaciones; un directorio de fragmentos se procesa en modo streaming
+    file_path = sys.argv[1] if len(sys.argv) > 1 else "data/proyecto2.csv"
+    if os.path.isdir(file_path):
+        df_weighted = process_data_with_weighting(file_path, lazy=True)
+        print(f"Fragmentos en '{file_path}' (modo streaming)")
+        print(df_weighted.head().collect())
+        stats = calculate_weighted_statistics(df_weighted, streaming=True)
+    else:
+        df_weighted = process_data_with_weighting(file_path)
+
+        print("DataFrame con ponderaciones aplicadas:")
+        print(df_weighted.head())
+        print(f"\nColumnas disponibles: {df_weighted.columns}")
+
+        # Calcular estadísticas
+        stats = calculate_weighted_statistics(df_weighted)
     print(f"\nTotal GWP ponderado: {stats['total_gwp_weighted']:,.0f}")
     print(f"Total daño ambiental ponderado: {stats['total_damage_weighted']:,.0f}")
     print(f"Impacto combinado total: {stats['total_combined_impact']:,.0f}")
@@ -0,0 +1,250 @@
+"""
+Instrumentación opcional por etapas (carga, filtrado, agregaciones, gráficos, tabla...).
+
+Cada etapa registra su tiempo de pared, las filas procesadas y los bytes producidos (tamaño
+estimado del resultado) y, si se conoce, los bytes de entrada leídos. Solo se mide dentro de
+una ejecución activada con `instrumented_run`; fuera de ella `stage` no hace nada, así que
+los módulos pueden instrumentarse sin coste cuando la opción está desactivada.
+
+Activación: `EMISSIONS_INSTRUMENTATION=1` (todas las ejecuciones) o la casilla del panel de
+diagnóstico del dashboard (solo esa sesión). Salidas:
+- registro estructurado: una línea JSON por etapa en el logger `emisiones.instrumentacion`
+  (y en el archivo `EMISSIONS_INSTRUMENTATION_LOG`, si se indica);
+- métricas acumuladas del proceso en formato de texto de Prometheus, reescritas al final de
+  cada ejecución en `EMISSIONS_METRICS_FILE` (para el textfile collector de node_exporter);
+- `profiled`: perfil cProfile de una única ejecución, con volcado opcional en `EMISSIONS_PROFILE_DIR`.
+"""
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+ENABLED_BY_DEFAULT = os.environ.get("EMISSIONS_INSTRUMENTATION", "0") != "0"
+METRICS_FILE = os.environ.get("EMISSIONS_METRICS_FILE") or None
+LOG_FILE = os.environ.get("EMISSIONS_INSTRUMENTATION_LOG") or None
+PROFILE_DIR = os.environ.get("EMISSIONS_PROFILE_DIR") or None
+
+logger = logging.getLogger("emisiones.instrumentacion")
+
+# Ejecución en curso de cada hilo (cada sesión de Streamlit ejecuta el script en su propio hilo)
+_local = threading.local()
+
+# Totales del proceso por etapa: llamadas, segundos, filas, bytes y duración de la última llamada
+_registry = {}
+_registry_lock = threading.Lock()
+_runs_total = 0
+_log_configured = False
+
+def measure_output(value):
+    """
+    Filas y bytes de un resultado: DataFrame de Polars, tabla de PyArrow o diccionario de ellos.
+    """
+    if isinstance(value, dict):
+        rows = bytes_ = 0
+        for item in value.values():
+            item_rows, item_bytes = measure_output(item)
+            rows += item_rows or 0
+            bytes_ += item_bytes or 0
+        return rows, bytes_
+    if hasattr(value, 'estimated_size') and hasattr(value, 'height'):
+        return value.height, value.estimated_size()
+    if hasattr(value, 'num_rows') and hasattr(value, 'nbytes'):
+        return value.num_rows, value.nbytes
+    return None, None
+
+class StageRecord:
+    """
+    Medición de una etapa. `measure(value)` fija filas y bytes a partir del resultado.
+    """
+
+    def __init__(self, name, depth=0):
+        self.name = name
+        self.depth = depth
+        self.seconds = 0.0
+        self.rows = None
+        self.bytes = None
+        self.input_bytes = None
+        self._start = time.perf_counter()
+
+    def measure(self, value):
+        self.rows, self.bytes = measure_output(value)
+        return value
+
+    def as_dict(self):
+        return {'etapa': self.name, 'nivel': self.depth, 'segundos': self.seconds,
+                'filas': self.rows, 'bytes': self.bytes, 'bytes_entrada': self.input_bytes}
+
+class _NullStage:
+    # Sustituto sin coste cuando la instrumentación está desactivada
+    def measure(self, value):
+        return value
+
+    def __setattr__(self, name, value):
+        pass
+
+_NULL_STAGE = _NullStage()
+
+class RunRecorder:
+    """
+    Etapas de una ejecución (un rerun del dashboard o una llamada a un CLI), en orden de finalización.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.run_id = uuid.uuid4().hex[:12]
+        self.stages = []
+        self.depth = 0
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def as_rows(self):
+        """
+        Etapas en orden de inicio (las anidadas después de su etapa padre) como lista de diccionarios.
+        """
+        return [record.as_dict() for record in sorted(self.stages, key=lambda record: record._start)]
+
+def is_active():
+    return getattr(_local, 'recorder', None) is not None
+
+@contextmanager
+def stage(name):
+    """
+    Mide el bloque como la etapa `name` de la ejecución en curso (no hace nada si no hay ninguna).
+
+        with stage("carga") as s:
+            df = s.measure(load(...))
+    """
+    recorder = getattr(_local, 'recorder', None)
+    if recorder is None:
+        yield _NULL_STAGE
+        return
+    record = StageRecord(name, recorder.depth)
+    recorder.depth += 1
+    try:
+        yield record
+    finally:
+        record.seconds = time.perf_counter() - record._start
+        recorder.depth -= 1
+        recorder.stages.append(record)
+        logger.info(json.dumps({'evento': 'etapa', 'ejecucion': recorder.run_id, **record.as_dict()}, ensure_ascii=False))
+
+def _configure_log_file():
+    global _log_configured
+    if _log_configured:
+        return
+    _log_configured = True
+    if LOG_FILE:
+        handler = logging.FileHandler(LOG_FILE, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+def _update_registry(recorder):
+    global _runs_total
+    with _registry_lock:
+        _runs_total += 1
+        for record in recorder.stages:
+            totals = _registry.setdefault(record.name, {'calls': 0, 'seconds': 0.0, 'rows': 0, 'bytes': 0, 'last_seconds': 0.0})
+            totals['calls'] += 1
+            totals['seconds'] += record.seconds
+            totals['rows'] += record.rows or 0
+            totals['bytes'] += record.bytes or 0
+            totals['last_seconds'] = record.seconds
+
+@contextmanager
+def instrumented_run(enabled=None, label="ejecucion"):
+    """
+    Activa la medición de etapas en el hilo actual durante el bloque y devuelve el `RunRecorder`
+    (o None si está desactivada). Al terminar, acumula las métricas del proceso, escribe el
+    resumen en el registro y, si está configurado, reescribe el archivo de Prometheus.
+    """
+    if enabled is None:
+        enabled = ENABLED_BY_DEFAULT
+    if not enabled or is_active():
+        yield getattr(_local, 'recorder', None)
+        return
+    _configure_log_file()
+    recorder = RunRecorder(label)
+    _local.recorder = recorder
+    try:
+        yield recorder
+    finally:
+        _local.recorder = None
+        recorder.seconds = time.perf_counter() - recorder.started
+        _update_registry(recorder)
+        logger.info(json.dumps({'evento': 'ejecucion', 'ejecucion': recorder.run_id, 'etiqueta': label,
+                                'segundos': recorder.seconds, 'etapas': len(recorder.stages)}, ensure_ascii=False))
+        if METRICS_FILE:
+            write_prometheus(METRICS_FILE)
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def prometheus_text():
+    """
+    Métricas acumuladas del proceso en el formato de exposición de texto de Prometheus.
+    """
+    metrics = [
+        ('emissions_stage_calls_total', 'counter', 'Ejecuciones de cada etapa', 'calls'),
+        ('emissions_stage_seconds_total', 'counter', 'Tiempo de pared acumulado por etapa', 'seconds'),
+        ('emissions_stage_rows_total', 'counter', 'Filas procesadas por etapa', 'rows'),
+        ('emissions_stage_bytes_total', 'counter', 'Bytes producidos por etapa', 'bytes'),
+        ('emissions_stage_last_seconds', 'gauge', 'Duración de la última ejecución de cada etapa', 'last_seconds')
+    ]
+    with _registry_lock:
+        registry = {name: dict(totals) for name, totals in _registry.items()}
+        runs = _runs_total
+    lines = ['# HELP emissions_instrumented_runs_total Ejecuciones instrumentadas',
+             '# TYPE emissions_instrumented_runs_total counter',
+             f'emissions_instrumented_runs_total {runs}']
+    for metric, kind, help_text, field in metrics:
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} {kind}']
+        lines += [f'{metric}{{stage="{_escape_label(name)}"}} {totals[field]}' for name, totals in sorted(registry.items())]
+    return '\n'.join(lines) + '\n'
+
+def write_prometheus(path):
+    """
+    Escribe `prometheus_text()` en `path` de forma atómica (el recolector nunca lee un archivo a medias).
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
+
+@contextmanager
+def profiled(enabled=True, top=30, output_dir=PROFILE_DIR):
+    """
+    Ejecuta el bloque bajo cProfile y deja en el diccionario devuelto el informe de las `top`
+    funciones con mayor tiempo acumulado (`report`) y, con `output_dir`, la ruta del `.prof`
+    (para snakeviz o `python -m pstats`).
+    """
+    result = {}
+    if not enabled:
+        yield result
+        return
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Solo puede haber un perfilador activo por proceso (por ejemplo, otra sesión perfilando)
+        result['error'] = str(e)
+        yield result
+        return
+    try:
+        yield result
+    finally:
+        profiler.disable()
+        buffer = io.StringIO()
+        pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(top)
+        result['report'] = buffer.getvalue()
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            result['path'] = os.path.join(output_dir, f"perfil-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}.prof")
+            profiler.dump_stats(result['path'])
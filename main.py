@@ -1,9 +1,23 @@
+import os
+import sys
 import streamlit as st
 import polars as pl
-import plotly.express as px
-import numpy as np
-from scipy import stats
-from enhanced_data_processing import process_data_with_weighting, get_gas_impact_info
+from enhanced_data_processing import get_gas_impact_info, estimate_memory_savings
+from data_cache import load_cached_processed_data, load_cached_emissions_cube, get_dataset_version
+from aggregations import slice_cube, section_results, CUBE_COUNT_COLUMN
+from data_table import PAGE_SIZES, page_count, get_page_arrow
+from correlations import CORRELATION_METHODS, correlation_pairs, pairs_to_matrix, correlation_by_sector
+from category_hierarchy import (build_category_index, attach_category_index, leaves_only, filter_subtrees,
+                                INDUSTRIAL_CATEGORY_CODES)
+from charts import (EMISSION_TYPES, emissions_by_year_figure, emissions_by_gas_type_figure,
+                    top_classifications_figure, pie_chart_figure, generate_correlation_heatmap,
+                    generate_scenario_comparison, generate_trend_forecast, generate_dataset_comparison,
+                    generate_dataset_difference)
+from comparison import configured_data_files, dataset_labels, load_datasets, compare_datasets
+from scenarios import GWP_PRESETS, SCENARIO_VALUE_COLUMNS, compute_scenarios, scenario_deltas
+from trends import trend_summary, trend_series, forecast_series
+from result_cache import ResultCache
+from instrumentation import ENABLED_BY_DEFAULT, instrumented_run, profiled, stage
 
 # Configuración de la página
 st.set_page_config(
@@ -13,130 +27,147 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Función para cargar y procesar los datos (ahora usa la función mejorada)
+# Esquema compacto (Enum, Int16 y Float32 en columnas derivadas) para reducir la memoria por réplica
+COMPACT_SCHEMA = os.environ.get("EMISSIONS_COMPACT_SCHEMA", "1") != "0"
+
+# Caché de resultados filtrados compartida entre sesiones: tamaño máximo en MB y directorio
+# opcional para persistir los resultados como Arrow (sin directorio, solo en memoria), con
+# su propio tamaño máximo en disco
+RESULT_CACHE_MB = int(os.environ.get("EMISSIONS_RESULT_CACHE_MB", "256"))
+RESULT_CACHE_DIR = os.environ.get("EMISSIONS_RESULT_CACHE_DIR") or None
+RESULT_CACHE_DISK_MB = int(os.environ.get("EMISSIONS_RESULT_CACHE_DISK_MB", "1024"))
+
+# Inventarios disponibles: argumentos de `streamlit run main.py -- a.csv b.csv`, `EMISSIONS_DATA_FILES`
+# o el inventario por defecto
+try:
+    DATA_FILES = configured_data_files()
+except FileNotFoundError as e:
+    st.error(str(e))
+    st.stop()
+
+# Función para cargar y procesar los datos (usa la caché Arrow en disco compartida entre procesos).
+# `dataset_version` cambia al ingerir deltas, lo que invalida solo las entradas de estas funciones.
+# Los cargadores usan `st.cache_resource`: los DataFrames son de solo lectura y todas las sesiones
+# comparten el mismo objeto, en lugar de recibir en cada rerun una copia deserializada del dataset.
+@st.cache_resource
+def load_processed_data(file_path, dataset_version):
+    df = load_cached_processed_data(file_path, compact=COMPACT_SCHEMA)
+    return attach_category_index(df, load_category_index(file_path, dataset_version))
+
+# Índice jerárquico de categorías IPCC (código, padre, nivel, hoja) para filtros enteros
+@st.cache_resource
+def load_category_index(file_path, dataset_version):
+    df = load_cached_processed_data(file_path, compact=COMPACT_SCHEMA)
+    return build_category_index(df["Clasificacion"].unique().to_list())
+
+# Ahorro de memoria del esquema compacto: recorre todas las columnas (convierte las etiquetas a texto),
+# así que se calcula una vez por versión del dataset y cada rerun solo lee las cifras
 @st.cache_data
-def load_processed_data(file_path):
-    return process_data_with_weighting(file_path)
-
-# Función para generar visualizaciones
-def generate_emissions_by_year(df, emission_col, title_suffix=""): # Añadido emission_col y title_suffix
-    emisiones_por_anio = df.group_by("Anio").agg(pl.sum(emission_col).alias("Total_Emisiones_Anual")).sort("Anio")
-    fig = px.line(emisiones_por_anio.to_pandas(), x="Anio", y="Total_Emisiones_Anual",
-                  title=f"Tendencia de Emisiones Totales {title_suffix} por Año",
-                  labels={"Anio": "Año", "Total_Emisiones_Anual": "Emisiones Totales (CO2eq)"})
-    fig.update_layout(height=400)
-    return fig
-
-def generate_emissions_by_gas_type(df, gas_cols, title_suffix=""): # Añadido gas_cols y title_suffix
-    emisiones_gases_por_anio = df.group_by("Anio").agg(
-        [pl.sum(col).alias(col) for col in gas_cols]
-    ).sort("Anio")
-    
-    emisiones_gases_por_anio_pd = emisiones_gases_por_anio.to_pandas().melt(id_vars=["Anio"],
-                                                                           value_vars=gas_cols,
-                                                                           var_name="Tipo_Gas",
-                                                                           value_name="Emisiones")
-    
-    fig = px.area(emisiones_gases_por_anio_pd, x="Anio", y="Emisiones", color="Tipo_Gas",
-                  title=f"Emisiones {title_suffix} por Tipo de Gas a lo largo del Tiempo",
-                  labels={"Anio": "Año", "Emisiones": "Emisiones (CO2eq)", "Tipo_Gas": "Tipo de Gas"})
-    fig.update_layout(height=400)
-    return fig
-
-def generate_top_classifications(df, emission_col, top_n=10, title_suffix=""): # Añadido emission_col y title_suffix
-    emisiones_por_clasificacion = df.group_by("Clasificacion").agg(
-        pl.sum(emission_col).alias("Suma_Total_Emisiones")
-    ).sort("Suma_Total_Emisiones", descending=True).head(top_n)
-    
-    fig = px.bar(emisiones_por_clasificacion.to_pandas(), x="Suma_Total_Emisiones", y="Clasificacion",
-                 orientation="h", title=f"Top {top_n} Clasificaciones con Mayores Emisiones {title_suffix}",
-                 labels={"Suma_Total_Emisiones": "Emisiones Totales (CO2eq)", "Clasificacion": "Clasificación"})
-    fig.update_layout(yaxis={"categoryorder":"total ascending"}, height=500)
-    return fig
-
-def generate_pie_chart_by_classification(df, emission_col, title_suffix=""): # Nueva función para gráfico de pastel
-    emisiones_por_clasificacion = df.group_by("Clasificacion").agg(
-        pl.sum(emission_col).alias("Suma_Total_Emisiones")
-    ).sort("Suma_Total_Emisiones", descending=True)
-    
-    fig = px.pie(emisiones_por_clasificacion.to_pandas(), values="Suma_Total_Emisiones", names="Clasificacion",
-                 title=f"Distribución de Emisiones {title_suffix} por Clasificación",
-                 hole=0.3) # Añade un agujero para un donut chart
-    fig.update_traces(textposition='inside', textinfo='percent+label')
-    fig.update_layout(height=500)
-    return fig
-
-def generate_correlation_heatmap(df):
-    # Seleccionar solo las columnas de emisiones para la correlación
-    emissions_data = df.select(["CH4_eq", "CO2_eq", "N2O_eq"])
-    
-    # Convertir a pandas DataFrame para calcular la matriz de correlación
-    corr_matrix = emissions_data.to_pandas().corr()
-    
-    fig = px.imshow(corr_matrix, text_auto=True, aspect="auto",
-                    title="Matriz de Correlación entre Gases de Efecto Invernadero")
-    fig.update_layout(height=400)
-    return fig
+def load_memory_savings(file_path, dataset_version):
+    return estimate_memory_savings(load_processed_data(file_path, dataset_version))
 
-# Función principal de la aplicación
-def main():
+# Cubos pre-agregados por (Anio, Clasificacion) de todos los inventarios, persistidos en la caché y
+# actualizados por la ingesta incremental; los que no están en disco se procesan en paralelo (un hilo por inventario)
+@st.cache_resource
+def load_all_cubes(file_paths, dataset_versions):
+    def load_cube(file_path):
+        cube = load_cached_emissions_cube(file_path, compact=COMPACT_SCHEMA)
+        return attach_category_index(cube, build_category_index(cube["Clasificacion"].unique().to_list()))
+    return load_datasets(list(file_paths), load_cube)
+
+# Una única instancia por proceso de Streamlit, compartida por todas las sesiones
+@st.cache_resource
+def get_result_cache():
+    return ResultCache(max_bytes=RESULT_CACHE_MB * 1_000_000, persist_dir=RESULT_CACHE_DIR,
+                       max_disk_bytes=RESULT_CACHE_DISK_MB * 1_000_000)
+
+# Correlaciones entre gases memorizadas por estado de filtros; los DataFrames (`_df`, `_category_index`)
+# no se hashean, la clave es `filter_state` = (versión del dataset, años seleccionados, solo hojas)
+@st.cache_data
+def load_gas_correlations(_df, filter_state, method):
+    return correlation_pairs(_df, method=method)
+
+@st.cache_data
+def load_sector_correlations(_df, _category_index, filter_state, method):
+    return correlation_by_sector(_df, _category_index, method=method)
+
+# Contenido del dashboard; cada sección se mide como una etapa cuando el diagnóstico está activo
+def render_dashboard():
     st.title("🌍 Dashboard de Análisis de Emisiones")
     st.markdown("### Análisis de la cantidad y gravedad de las emisiones y su impacto ambiental")
     
-    # Cargar datos
-    file_path = "data/proyecto2.csv"
-    df = load_processed_data(file_path)
+    # Cargar datos: todos los inventarios a la vez; el seleccionado alimenta todas las secciones
+    # salvo la comparación entre inventarios
+    labels = dataset_labels(DATA_FILES)
+    file_path = DATA_FILES[0]
+    if len(DATA_FILES) > 1:
+        file_path = st.sidebar.selectbox("Inventario analizado", DATA_FILES, format_func=labels.get)
+    with stage("carga_datos") as s:
+        dataset_versions = tuple(load_datasets(
+            DATA_FILES, lambda path: get_dataset_version(path, compact=COMPACT_SCHEMA)).values())
+        cubes = load_all_cubes(tuple(DATA_FILES), dataset_versions)
+        dataset_version = dataset_versions[DATA_FILES.index(file_path)]
+        df = s.measure(load_processed_data(file_path, dataset_version))
+        cube = cubes[labels[file_path]]
+        category_index = load_category_index(file_path, dataset_version)
     
     # Sidebar para filtros
     st.sidebar.header("Filtros")
     
     # Filtro por año
-    years = sorted(df["Anio"].unique().to_list())
+    years = sorted(cube["Anio"].unique().to_list())
     selected_years = st.sidebar.multiselect("Seleccionar Años", years, default=years)
     
-    # Filtrar datos según selección
-    if selected_years:
-        df_filtered = df.filter(pl.col("Anio").is_in(selected_years))
-    else:
-        df_filtered = df
+    # Las categorías padre ya incluyen a sus hijas (y "Nacional" a todas): sumar solo hojas evita el doble conteo
+    only_leaves = st.sidebar.checkbox("Contar solo categorías hoja (evita doble conteo)", value=True)
+    filter_state = (dataset_version, tuple(sorted(selected_years)), only_leaves)
+
+    # Filtrar datos según selección: los gráficos usan la porción del cubo y solo las secciones
+    # que necesitan filas individuales filtran el DataFrame completo. Los resultados se comparten
+    # entre sesiones a través de la caché de resultados (las sesiones reciben el mismo DataFrame).
+    result_cache = get_result_cache()
+    def filter_cube():
+        sliced = slice_cube(cube, selected_years)
+        return leaves_only(sliced) if only_leaves else sliced
+    def filter_rows():
+        rows = df.filter(pl.col("Anio").is_in(selected_years)) if selected_years else df
+        return leaves_only(rows) if only_leaves else rows
+    with stage("filtrado") as s:
+        cube_filtered = result_cache.get_or_compute(("cubo",) + filter_state, filter_cube)
+        # Las filas filtradas son casi una copia del dataset: solo en memoria, nunca en disco
+        df_filtered = s.measure(result_cache.get_or_compute(("filas",) + filter_state, filter_rows, persist=False))
     
     # Selección de tipo de emisión para visualizaciones
     emission_type = st.sidebar.radio(
         "Seleccionar Tipo de Emisión",
-        ("Emisiones Totales (Original)", "Emisiones Ponderadas por GWP", "Impacto Combinado")
+        tuple(EMISSION_TYPES)
     )
-    
-    if emission_type == "Emisiones Totales (Original)":
-        current_emission_col = "Total_Emisiones"
-        gas_cols_for_viz = ["CH4_eq", "CO2_eq", "N2O_eq"]
-        title_suffix = "(Original)"
-    elif emission_type == "Emisiones Ponderadas por GWP":
-        current_emission_col = "Total_GWP_weighted"
-        gas_cols_for_viz = ["CH4_GWP_weighted", "CO2_GWP_weighted", "N2O_GWP_weighted"]
-        title_suffix = "(Ponderadas por GWP)"
-    else: # Impacto Combinado
-        current_emission_col = "Impacto_Combinado"
-        gas_cols_for_viz = ["CH4_damage_weighted", "CO2_damage_weighted", "N2O_damage_weighted"]
-        title_suffix = "(Impacto Combinado)"
+    current_emission_col, gas_cols_for_viz, title_suffix = EMISSION_TYPES[emission_type]
+    with stage("agregados_seccion") as s:
+        results = s.measure(result_cache.get_or_compute(
+            ("seccion",) + filter_state + (emission_type, None),
+            lambda: section_results(cube_filtered, current_emission_col, gas_cols_for_viz)
+        ))
 
     # Métricas principales
     st.header("📈 Métricas Clave")
     col1, col2, col3, col4 = st.columns(4)
+    totals = results["totales"].row(0, named=True)
     
     with col1:
-        total_emissions = df_filtered[current_emission_col].sum()
+        total_emissions = totals[current_emission_col]
         st.metric(f"Total {emission_type}", f"{total_emissions:,.0f} CO2eq")
     
     with col2:
-        co2_emissions = df_filtered[gas_cols_for_viz[1]].sum() # CO2_eq o CO2_GWP_weighted
+        co2_emissions = totals[gas_cols_for_viz[1]] # CO2_eq o CO2_GWP_weighted
         st.metric(f"Emisiones CO2 {title_suffix}", f"{co2_emissions:,.0f} CO2eq")
     
     with col3:
-        ch4_emissions = df_filtered[gas_cols_for_viz[0]].sum() # CH4_eq o CH4_GWP_weighted
+        ch4_emissions = totals[gas_cols_for_viz[0]] # CH4_eq o CH4_GWP_weighted
         st.metric(f"Emisiones CH4 {title_suffix}", f"{ch4_emissions:,.0f} CO2eq")
     
     with col4:
-        n2o_emissions = df_filtered[gas_cols_for_viz[2]].sum() # N2O_eq o N2O_GWP_weighted
+        n2o_emissions = totals[gas_cols_for_viz[2]] # N2O_eq o N2O_GWP_weighted
         st.metric(f"Emisiones N2O {title_suffix}", f"{n2o_emissions:,.0f} CO2eq")
     
     # Visualizaciones principales
@@ -144,59 +175,175 @@ def main():
     
     # Gráfico de tendencias por año
     st.subheader(f"Tendencia de Emisiones Totales {title_suffix}")
-    fig1 = generate_emissions_by_year(df_filtered, current_emission_col, title_suffix)
-    st.plotly_chart(fig1, use_container_width=True)
+    with stage("grafico_tendencia"):
+        fig1 = emissions_by_year_figure(results["anual"], current_emission_col, title_suffix)
+        st.plotly_chart(fig1, use_container_width=True)
     
     # Gráfico de emisiones por tipo de gas
     st.subheader(f"Emisiones {title_suffix} por Tipo de Gas")
-    fig2 = generate_emissions_by_gas_type(df_filtered, gas_cols_for_viz, title_suffix)
-    st.plotly_chart(fig2, use_container_width=True)
+    with stage("grafico_por_gas"):
+        fig2 = emissions_by_gas_type_figure(results["anual"], gas_cols_for_viz, title_suffix)
+        st.plotly_chart(fig2, use_container_width=True)
     
     # Top clasificaciones
     st.subheader(f"Principales Fuentes de Emisiones {title_suffix}")
     top_n = st.slider("Número de clasificaciones a mostrar", 5, 20, 10, key="top_n_slider")
-    fig3 = generate_top_classifications(df_filtered, current_emission_col, top_n, title_suffix)
-    st.plotly_chart(fig3, use_container_width=True)
+    with stage("grafico_top_clasificaciones"):
+        fig3 = top_classifications_figure(results["clasificaciones"], top_n, title_suffix)
+        st.plotly_chart(fig3, use_container_width=True)
 
     # Nueva gráfica: Distribución de Emisiones por Clasificación (Pie Chart)
     st.subheader(f"Distribución Porcentual de Emisiones {title_suffix} por Clasificación")
-    fig_pie = generate_pie_chart_by_classification(df_filtered, current_emission_col, title_suffix)
-    st.plotly_chart(fig_pie, use_container_width=True)
+    with stage("grafico_distribucion"):
+        fig_pie = pie_chart_figure(results["clasificaciones"], title_suffix)
+        st.plotly_chart(fig_pie, use_container_width=True)
 
     # Nueva gráfica: Matriz de Correlación
     st.subheader("Matriz de Correlación entre Gases de Efecto Invernadero")
-    fig_corr = generate_correlation_heatmap(df_filtered)
-    st.plotly_chart(fig_corr, use_container_width=True)
+    correlation_method = st.radio("Método de correlación", tuple(CORRELATION_METHODS), horizontal=True)
+    with stage("correlaciones") as s:
+        gas_correlations = s.measure(load_gas_correlations(df_filtered, filter_state, CORRELATION_METHODS[correlation_method]))
+    with stage("grafico_correlacion"):
+        fig_corr = generate_correlation_heatmap(pairs_to_matrix(gas_correlations), f"({correlation_method})")
+        st.plotly_chart(fig_corr, use_container_width=True)
 
     # Apartado de Análisis Industrial
     st.header("🏭 Análisis Específico de la Industria")
-    st.markdown("Aquí se presenta un análisis detallado de las emisiones provenientes de sectores industriales. Se consideran clasificaciones que contienen 'Industr' o 'Fabricación'.")
+    st.markdown("Aquí se presenta un análisis detallado de las emisiones provenientes de sectores industriales. Se consideran las categorías IPCC 1.A.1 (Industrias de la energía), 1.A.2 (Industrias manufactureras y construcción) y 2 (Procesos industriales) con todas sus subcategorías.")
 
-    # Filtrar datos para clasificaciones industriales
-    industrial_df = df_filtered.filter(
-        pl.col("Clasificacion").str.contains("Industr") | pl.col("Clasificacion").str.contains("Fabricación")
-    )
+    # Filtrar datos para clasificaciones industriales (subárboles del índice jerárquico)
+    with stage("agregados_industria") as s:
+        industrial_results = s.measure(result_cache.get_or_compute(
+            ("seccion",) + filter_state + (emission_type, tuple(INDUSTRIAL_CATEGORY_CODES)),
+            lambda: section_results(filter_subtrees(cube_filtered, category_index, INDUSTRIAL_CATEGORY_CODES),
+                                    current_emission_col, gas_cols_for_viz)
+        ))
 
-    if not industrial_df.is_empty():
+    if not industrial_results["clasificaciones"].is_empty():
         # Top clasificaciones industriales
         st.subheader(f"Top Clasificaciones Industriales {title_suffix}")
         top_n_industry = st.slider("Número de clasificaciones industriales a mostrar", 3, 15, 5, key="top_n_industry_slider")
-        fig_industry_bar = generate_top_classifications(industrial_df, current_emission_col, top_n_industry, f"{title_suffix} (Industrial)")
-        st.plotly_chart(fig_industry_bar, use_container_width=True)
+        with stage("grafico_industria_top"):
+            fig_industry_bar = top_classifications_figure(industrial_results["clasificaciones"], top_n_industry, f"{title_suffix} (Industrial)")
+            st.plotly_chart(fig_industry_bar, use_container_width=True)
 
         # Tendencia de emisiones industriales por año
         st.subheader(f"Tendencia de Emisiones Industriales {title_suffix} por Año")
-        fig_industry_line = generate_emissions_by_year(industrial_df, current_emission_col, f"{title_suffix} (Industrial)")
-        st.plotly_chart(fig_industry_line, use_container_width=True)
+        with stage("grafico_industria_tendencia"):
+            fig_industry_line = emissions_by_year_figure(industrial_results["anual"], current_emission_col, f"{title_suffix} (Industrial)")
+            st.plotly_chart(fig_industry_line, use_container_width=True)
 
         # Distribución de emisiones industriales por tipo de gas
         st.subheader(f"Emisiones Industriales {title_suffix} por Tipo de Gas")
-        fig_industry_area = generate_emissions_by_gas_type(industrial_df, gas_cols_for_viz, f"{title_suffix} (Industrial)")
-        st.plotly_chart(fig_industry_area, use_container_width=True)
+        with stage("grafico_industria_por_gas"):
+            fig_industry_area = emissions_by_gas_type_figure(industrial_results["anual"], gas_cols_for_viz, f"{title_suffix} (Industrial)")
+            st.plotly_chart(fig_industry_area, use_container_width=True)
 
     else:
         st.info("No se encontraron datos para clasificaciones industriales en el rango de años seleccionado.")
 
+    # Escenarios de ponderación alternativos (sin reprocesar los datos: un producto matricial sobre el cubo)
+    st.header("⚖️ Escenarios de Ponderación")
+    st.markdown("Compara los totales ponderados con los GWP de distintos informes del IPCC o con pesos personalizados (CH4, CO2, N2O).")
+    selected_presets = st.multiselect("Conjuntos de GWP", list(GWP_PRESETS), default=list(GWP_PRESETS))
+    scenario_sets = {name: GWP_PRESETS[name] for name in selected_presets}
+    if st.checkbox("Añadir escenario personalizado"):
+        custom_col1, custom_col2, custom_col3 = st.columns(3)
+        scenario_sets["Personalizado"] = {
+            'CH4': custom_col1.number_input("GWP CH4", min_value=0.0, value=28.0),
+            'CO2': custom_col2.number_input("GWP CO2", min_value=0.0, value=1.0),
+            'N2O': custom_col3.number_input("GWP N2O", min_value=0.0, value=265.0)
+        }
+    if scenario_sets:
+        scenario_col = st.radio("Indicador", SCENARIO_VALUE_COLUMNS, horizontal=True, key="scenario_indicator")
+        with stage("escenarios") as s:
+            scenarios_by_year = s.measure(compute_scenarios(cube_filtered, scenario_sets))
+            scenario_totals = scenario_deltas(compute_scenarios(cube_filtered, scenario_sets, by=()),
+                                              next(iter(scenario_sets)), scenario_col, by=())
+        with stage("grafico_escenarios"):
+            st.plotly_chart(generate_scenario_comparison(scenarios_by_year, scenario_col), use_container_width=True)
+        st.dataframe(scenario_totals, use_container_width=True)
+    else:
+        st.info("Selecciona al menos un conjunto de GWP.")
+
+    # Tendencias por clasificación: todos los indicadores se calculan a la vez sobre la matriz año x categoría
+    st.header("📉 Tendencias y Proyecciones")
+    st.markdown("Variación interanual, media móvil, tasa de crecimiento anual compuesta (TCAC) y proyección "
+                f"lineal de cada clasificación para {emission_type.lower()}.")
+    trend_col1, trend_col2, trend_col3 = st.columns(3)
+    window = trend_col1.slider("Ventana de la media móvil (años)", min_value=1, max_value=10, value=3)
+    last_year = max(selected_years) if selected_years else max(years)
+    target_year = int(trend_col2.number_input("Año objetivo de la proyección", min_value=last_year + 1,
+                                              max_value=last_year + 50, value=last_year + 10))
+    fit_years = int(trend_col3.number_input("Años para el ajuste (0 = todos)", min_value=0, max_value=len(years), value=0))
+    with stage("tendencias") as s:
+        trends = s.measure(result_cache.get_or_compute(
+            ("tendencias",) + filter_state + (current_emission_col, window, target_year, fit_years),
+            lambda: {
+                'resumen': trend_summary(cube_filtered, current_emission_col, target_year, fit_years or None),
+                'serie': trend_series(cube_filtered, current_emission_col, window)
+            }
+        ))
+    trend_table = trends['resumen']
+    if trend_table.height > 0:
+        by_latest = trend_table.sort("Valor_final", descending=True, nulls_last=True)["Clasificacion"].to_list()
+        trend_categories = st.multiselect("Clasificaciones a proyectar", by_latest, default=by_latest[:5])
+        show_moving_average = st.checkbox(f"Mostrar la media móvil de {window} años en lugar de los valores anuales")
+        if trend_categories:
+            with stage("grafico_tendencias"):
+                st.plotly_chart(generate_trend_forecast(
+                    trends['serie'].filter(pl.col("Clasificacion").is_in(trend_categories)),
+                    forecast_series(trend_table, trend_categories), title_suffix, show_moving_average
+                ), use_container_width=True)
+
+        trend_columns = ["Clasificacion", "Valor_final", "TCAC_pct", "Variacion_ultimo_anio_pct",
+                         "Pendiente_anual", "R2", "Pronostico"]
+        ranked = trend_table.drop_nulls("Pendiente_anual").sort("Pendiente_anual", descending=True)
+        trend_col1, trend_col2 = st.columns(2)
+        with trend_col1:
+            st.subheader("Mayores aumentos (pendiente anual)")
+            st.dataframe(ranked.head(10).select(trend_columns), use_container_width=True, hide_index=True)
+        with trend_col2:
+            st.subheader("Mayores descensos (pendiente anual)")
+            st.dataframe(ranked.tail(10).reverse().select(trend_columns), use_container_width=True, hide_index=True)
+    else:
+        st.info("No hay datos para calcular tendencias con los filtros seleccionados.")
+
+    # Comparación entre inventarios alineados por (Anio, Clasificacion), con los mismos filtros
+    st.header("🔀 Comparación de Inventarios")
+    if len(cubes) > 1:
+        reference = st.selectbox("Inventario de referencia", list(cubes), index=list(cubes).index(labels[file_path]))
+        def compare():
+            sliced = {label: slice_cube(dataset_cube, selected_years) for label, dataset_cube in cubes.items()}
+            if only_leaves:
+                sliced = {label: leaves_only(dataset_cube) for label, dataset_cube in sliced.items()}
+            return compare_datasets(sliced, current_emission_col, reference)
+        with stage("comparacion") as s:
+            comparison = s.measure(result_cache.get_or_compute(
+                ("comparacion", dataset_versions, tuple(sorted(selected_years)), only_leaves, current_emission_col, reference),
+                compare
+            ))
+        with stage("grafico_comparacion"):
+            compare_col1, compare_col2 = st.columns(2)
+            with compare_col1:
+                st.plotly_chart(generate_dataset_comparison(comparison['anual'], list(cubes), title_suffix),
+                                use_container_width=True)
+            with compare_col2:
+                st.plotly_chart(generate_dataset_difference(comparison['anual'], list(cubes), reference, title_suffix),
+                                use_container_width=True)
+
+        compared = st.selectbox("Clasificaciones con mayor diferencia en", [label for label in cubes if label != reference])
+        st.dataframe(
+            comparison['clasificaciones']
+            .select("Clasificacion", reference, compared, f"Diferencia_{compared}", f"Diferencia_pct_{compared}")
+            .sort(pl.col(f"Diferencia_{compared}").abs(), descending=True)
+            .head(15),
+            use_container_width=True, hide_index=True
+        )
+    else:
+        st.info("Para comparar inventarios (por ejemplo, la presentación revisada frente a la anterior), indícalos al "
+                "arrancar: `streamlit run main.py -- anterior.csv revisada.csv` o en `EMISSIONS_DATA_FILES`.")
+
     # Análisis estadístico
     st.header("📈 Análisis Estadístico")
     
@@ -204,37 +351,31 @@ def main():
     
     with col1:
         st.subheader("Estadísticas Descriptivas")
-        stats_df = df_filtered.select(["CH4_eq", "CO2_eq", "N2O_eq", "Total_Emisiones", "Total_GWP_weighted", "Impacto_Combinado"]).describe()
-        st.dataframe(stats_df.to_pandas())
+        with stage("descriptivas") as s:
+            s.rows = df_filtered.height
+            stats_df = result_cache.get_or_compute(("descriptivas",) + filter_state, lambda: df_filtered.select(
+                ["CH4_eq", "CO2_eq", "N2O_eq", "Total_Emisiones", "Total_GWP_weighted", "Impacto_Combinado"]).describe())
+        st.dataframe(stats_df)
     
     with col2:
         st.subheader("Correlaciones entre Gases")
-        # Calcular correlaciones
-        ch4_emissions = df_filtered["CH4_eq"].to_numpy()
-        co2_emissions = df_filtered["CO2_eq"].to_numpy()
-        n2o_emissions = df_filtered["N2O_eq"].to_numpy()
-        
-        # Eliminar NaN
-        ch4_emissions = ch4_emissions[~np.isnan(ch4_emissions)]
-        co2_emissions = co2_emissions[~np.isnan(co2_emissions)]
-        n2o_emissions = n2o_emissions[~np.isnan(n2o_emissions)]
-        
-        # Asegurar misma longitud
-        min_len = min(len(ch4_emissions), len(co2_emissions), len(n2o_emissions))
-        if min_len > 1:
-            ch4_emissions = ch4_emissions[:min_len]
-            co2_emissions = co2_emissions[:min_len]
-            n2o_emissions = n2o_emissions[:min_len]
-            
-            corr_ch4_co2, _ = stats.pearsonr(ch4_emissions, co2_emissions)
-            corr_ch4_n2o, _ = stats.pearsonr(ch4_emissions, n2o_emissions)
-            corr_co2_n2o, _ = stats.pearsonr(co2_emissions, n2o_emissions)
-            
-            st.write(f"**CH4 vs CO2:** {corr_ch4_co2:.3f}")
-            st.write(f"**CH4 vs N2O:** {corr_ch4_n2o:.3f}")
-            st.write(f"**CO2 vs N2O:** {corr_co2_n2o:.3f}")
-        else:
-            st.write("No hay suficientes datos para calcular correlaciones.")
+        # Reutiliza las correlaciones ya calculadas para el mapa de calor
+        for gas_a, gas_b, corr, n_rows in gas_correlations.iter_rows():
+            label = f"{gas_a.removesuffix('_eq')} vs {gas_b.removesuffix('_eq')}"
+            if corr is None:
+                st.write(f"**{label}:** no hay suficientes datos para calcular la correlación.")
+            else:
+                st.write(f"**{label}:** {corr:.3f} ({correlation_method}, {n_rows} registros)")
+
+    # Correlaciones por sector IPCC (nivel 1), todas en un único group_by
+    with st.expander("Correlaciones por sector IPCC"):
+        with stage("correlaciones_sector") as s:
+            sector_correlations = s.measure(load_sector_correlations(df_filtered, category_index, filter_state,
+                                                                     CORRELATION_METHODS[correlation_method]))
+        sector_table = sector_correlations.with_columns(
+            (pl.col("Variable_1").str.strip_suffix("_eq") + " vs " + pl.col("Variable_2").str.strip_suffix("_eq")).alias("Pareja")
+        ).pivot(on="Pareja", index="Sector", values="Correlacion")
+        st.dataframe(sector_table, use_container_width=True)
     
     # Información sobre el impacto de los gases
     st.header("🔬 Impacto Detallado de los Gases")
@@ -249,14 +390,92 @@ def main():
 
     # Tabla de datos
     st.header("📋 Datos Detallados")
-    st.dataframe(df_filtered.to_pandas(), use_container_width=True)
+    # Solo la página visible se ordena, se proyecta y se envía (como Arrow) al navegador
+    table_col1, table_col2, table_col3 = st.columns([3, 2, 1])
+    with table_col1:
+        visible_columns = st.multiselect("Columnas", df_filtered.columns,
+                                         default=["Anio", "Clasificacion", "CH4_eq", "CO2_eq", "N2O_eq",
+                                                  "Total_Emisiones", "Total_GWP_weighted", "Impacto_Combinado"])
+    with table_col2:
+        sort_column = st.selectbox("Ordenar por", ["(sin orden)"] + df_filtered.columns)
+        sort_descending = st.checkbox("Orden descendente", value=True)
+    with table_col3:
+        page_size = st.selectbox("Filas por página", PAGE_SIZES, index=1)
+        n_pages = page_count(df_filtered.height, page_size)
+        page = st.number_input("Página", min_value=1, max_value=n_pages, value=1, step=1)
+    with stage("tabla_detalle") as s:
+        page_table = s.measure(get_page_arrow(df_filtered, page, page_size,
+                                              sort_by=None if sort_column == "(sin orden)" else sort_column,
+                                              descending=sort_descending, columns=visible_columns or None))
+        st.dataframe(page_table, use_container_width=True)
+    first_row = (page - 1) * page_size + 1 if page_table.num_rows else 0
+    st.caption(f"Filas {first_row:,}–{first_row + page_table.num_rows - 1 if page_table.num_rows else 0:,} "
+               f"de {df_filtered.height:,} (página {page} de {n_pages})")
     
     # Información adicional
     st.sidebar.markdown("---")
     st.sidebar.markdown("### Información del Dataset")
-    st.sidebar.write(f"**Total de registros:** {len(df_filtered)}")
+    st.sidebar.write(f"**Total de registros:** {cube_filtered[CUBE_COUNT_COLUMN].sum()}")
     st.sidebar.write(f"**Años disponibles:** {len(years)}")
-    st.sidebar.write(f"**Clasificaciones únicas:** {df_filtered["Clasificacion"].n_unique()}")
+    st.sidebar.write(f"**Clasificaciones únicas:** {cube_filtered['Clasificacion'].n_unique()}")
+    if COMPACT_SCHEMA:
+        memory = load_memory_savings(file_path, dataset_version)
+        st.sidebar.write(f"**Memoria del dataset:** {memory['compact_bytes'] / 1e6:,.1f} MB "
+                         f"(ahorro del {memory['saved_pct']:.0f}% con el esquema compacto)")
+    cache_stats = result_cache.stats()
+    st.sidebar.write(f"**Caché de resultados:** {cache_stats['entries']} entradas, "
+                     f"{cache_stats['bytes'] / 1e6:,.1f} de {cache_stats['max_bytes'] / 1e6:,.0f} MB, "
+                     f"{cache_stats['hit_rate']:.0%} de aciertos ({cache_stats['hits'] + cache_stats['disk_hits']} aciertos, "
+                     f"{cache_stats['misses']} fallos, {cache_stats['evictions']} expulsiones)")
+
+def render_debug_panel(recorder, profile):
+    """
+    Panel de diagnóstico en la barra lateral: tiempos, filas y bytes por etapa del rerun actual
+    y, si se pidió, el informe de cProfile.
+    """
+    st.sidebar.markdown("### 🛠️ Diagnóstico")
+    if recorder is None:
+        return
+    stages = pl.DataFrame(recorder.as_rows(), schema={"etapa": pl.String, "nivel": pl.Int64, "segundos": pl.Float64,
+                                                      "filas": pl.Int64, "bytes": pl.Int64, "bytes_entrada": pl.Int64})
+    st.sidebar.write(f"**Rerun:** {recorder.seconds * 1e3:,.0f} ms en {stages.height} etapas")
+    st.sidebar.dataframe(
+        stages.select(
+            (pl.lit("· ").repeat_by(pl.col("nivel")).list.join("") + pl.col("etapa")).alias("Etapa"),
+            (pl.col("segundos") * 1e3).round(1).alias("ms"),
+            pl.col("filas").alias("Filas"),
+            (pl.col("bytes") / 1e6).round(2).alias("MB")
+        ),
+        use_container_width=True, hide_index=True
+    )
+    if profile.get('error'):
+        st.sidebar.warning(f"No se pudo perfilar: {profile['error']}")
+    elif profile.get('report'):
+        with st.sidebar.expander("Perfil cProfile de este rerun"):
+            st.code(profile['report'], language=None)
+            if profile.get('path'):
+                st.caption(f"Perfil guardado en `{profile['path']}`")
+
+# Función principal de la aplicación
+def main():
+    # Los widgets de diagnóstico se dibujan al final de la barra lateral, pero su valor (del rerun
+    # anterior) se lee aquí, antes de medir; el botón de perfil solo vale para el rerun que provoca
+    debug = st.session_state.get("diagnostico", ENABLED_BY_DEFAULT)
+    profile_rerun = debug and st.session_state.get("perfilar_rerun", False)
+    with profiled(profile_rerun) as profile, instrumented_run(debug, label="rerun") as recorder:
+        render_dashboard()
+
+    st.sidebar.markdown("---")
+    st.sidebar.checkbox("Panel de diagnóstico (tiempos por etapa)", value=ENABLED_BY_DEFAULT, key="diagnostico")
+    if debug:
+        render_debug_panel(recorder, profile)
+        st.sidebar.button("Perfilar el siguiente rerun (cProfile)", key="perfilar_rerun")
 
 if __name__ == "__main__":
-    main()
+    # `python main.py --profile-startup` (o `streamlit run main.py -- --profile-startup`) muestra el
+    # informe de tiempos de importación en lugar de ejecutar el dashboard
+    if "--profile-startup" in sys.argv:
+        from startup_profile import print_import_report
+        print_import_report("main")
+    else:
+        main()
@@ -0,0 +1,195 @@
+"""
+Caché de resultados filtrados compartida entre sesiones.
+
+Guarda DataFrames de Polars (o diccionarios nombre -> DataFrame) sin copiarlos: todas las
+sesiones reciben el mismo objeto, que no se modifica. El tamaño total está acotado en
+bytes con expulsión LRU, y opcionalmente cada resultado se escribe en disco como Arrow
+IPC, de modo que otro proceso (u otra réplica con el mismo disco) lo abre con memory-map
+en lugar de recalcularlo. El disco tiene su propio límite en bytes, también con expulsión
+LRU según la fecha de modificación del índice de cada entrada (que se actualiza en cada
+acierto), de modo que las entradas de versiones antiguas del dataset acaban eliminándose.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import polars as pl
+
+class ResultCache:
+    """
+    Caché LRU acotada por bytes, segura entre hilos (cada sesión de Streamlit es un hilo).
+
+    Las claves son tuplas de valores simples (por ejemplo, versión del dataset, años,
+    tipo de emisión y sector); deben incluir la versión del dataset para que la
+    persistencia en disco no sirva resultados de datos antiguos.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, persist_dir=None, max_disk_bytes=1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.persist_dir = persist_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._bytes = 0
+        self._hits = self._misses = self._disk_hits = self._evictions = self._disk_evictions = 0
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+
+    @staticmethod
+    def _frames(value):
+        return value if isinstance(value, dict) else {'': value}
+
+    @classmethod
+    def _size(cls, value):
+        return sum(frame.estimated_size() for frame in cls._frames(value).values())
+
+    def _digest(self, key):
+        return hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+
+    def _frame_path(self, digest, name):
+        return os.path.join(self.persist_dir, f"{digest}.{name}.arrow" if name else f"{digest}.arrow")
+
+    def _load_from_disk(self, key):
+        digest = self._digest(key)
+        index_path = os.path.join(self.persist_dir, f"{digest}.json")
+        try:
+            with open(index_path, encoding="utf-8") as f:
+                index = json.load(f)
+            frames = {name: pl.read_ipc(self._frame_path(digest, name), memory_map=True) for name in index['frames']}
+            # La fecha de modificación del índice marca el último uso para la expulsión LRU en disco
+            os.utime(index_path)
+        except (OSError, ValueError):
+            # Sin entrada, o expulsada por otro proceso mientras se leía
+            return None
+        return frames if index['is_dict'] else frames['']
+
+    def _write_to_disk(self, key, value):
+        digest = self._digest(key)
+        suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        frames = self._frames(value)
+        for name, frame in frames.items():
+            path = self._frame_path(digest, name)
+            frame.write_ipc(f"{path}.{suffix}", compression="uncompressed")
+            os.replace(f"{path}.{suffix}", path)
+        # El índice se escribe el último: su presencia indica que la entrada está completa
+        index_path = os.path.join(self.persist_dir, f"{digest}.json")
+        disk_bytes = sum(os.path.getsize(self._frame_path(digest, name)) for name in frames)
+        with open(f"{index_path}.{suffix}", "w", encoding="utf-8") as f:
+            json.dump({'key': repr(key), 'frames': list(frames), 'is_dict': isinstance(value, dict),
+                       'bytes': disk_bytes}, f)
+        os.replace(f"{index_path}.{suffix}", index_path)
+        self._prune_disk(keep=digest)
+
+    def _prune_disk(self, keep=None):
+        """
+        Elimina del disco las entradas usadas hace más tiempo hasta quedar dentro de `max_disk_bytes`
+        (la entrada `keep`, recién escrita, se conserva aunque supere el límite).
+        """
+        with self._disk_lock:
+            entries = []
+            for name in os.listdir(self.persist_dir):
+                if not name.endswith(".json"):
+                    continue
+                index_path = os.path.join(self.persist_dir, name)
+                try:
+                    with open(index_path, encoding="utf-8") as f:
+                        index = json.load(f)
+                    entries.append((os.path.getmtime(index_path), name[:-len(".json")], index))
+                except (OSError, ValueError):
+                    continue
+            total = sum(index.get('bytes', 0) for _, _, index in entries)
+            for _, digest, index in sorted(entries, key=lambda entry: entry[0]):
+                if total <= self.max_disk_bytes:
+                    break
+                if digest == keep:
+                    continue
+                self._remove_from_disk(digest, index)
+                total -= index.get('bytes', 0)
+                with self._lock:
+                    self._disk_evictions += 1
+
+    def _remove_from_disk(self, digest, index):
+        # Primero el índice: sin él la entrada deja de considerarse completa
+        paths = [os.path.join(self.persist_dir, f"{digest}.json")]
+        paths += [self._frame_path(digest, name) for name in index['frames']]
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _store(self, key, value):
+        size = self._size(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            # Expulsar las entradas menos usadas; la recién añadida se conserva aunque supere el límite
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+
+    def get_or_compute(self, key, compute, persist=True):
+        """
+        Devuelve el resultado de `key`; si no está en memoria ni en disco, lo calcula con `compute()`.
+
+        Con `persist=False` el resultado solo se guarda en memoria (por ejemplo, copias casi
+        completas de las filas, que en disco solo duplicarían la caché de datos procesados).
+        `compute` se ejecuta fuera del bloqueo, por lo que dos sesiones que piden a la vez
+        la misma clave nueva pueden calcularla ambas; la segunda sustituye a la primera.
+        """
+        persist = persist and self.persist_dir is not None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return self._entries[key][0]
+
+        value = self._load_from_disk(key) if persist else None
+        if value is not None:
+            with self._lock:
+                self._disk_hits += 1
+        else:
+            value = compute()
+            with self._lock:
+                self._misses += 1
+            if persist:
+                self._write_to_disk(key, value)
+        self._store(key, value)
+        return value
+
+    def clear(self):
+        """
+        Vacía la memoria y, si hay persistencia, borra los archivos de la caché en disco.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.persist_dir:
+            for name in os.listdir(self.persist_dir):
+                if name.endswith((".arrow", ".json")):
+                    os.remove(os.path.join(self.persist_dir, name))
+
+    def stats(self):
+        """
+        Métricas de uso: aciertos en memoria y en disco, fallos, expulsiones (en memoria y en disco),
+        entradas y bytes.
+        """
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            return {
+                'hits': self._hits,
+                'disk_hits': self._disk_hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'disk_evictions': self._disk_evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hit_rate': (self._hits + self._disk_hits) / lookups if lookups else 0.0
+            }
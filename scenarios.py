@@ -0,0 +1,110 @@
+"""
+Motor de escenarios de ponderación: compara conjuntos alternativos de GWP y factores de
+daño sin reprocesar el inventario.
+
+Las emisiones ponderadas son lineales en las emisiones por gas, así que basta con sumar
+una vez las columnas CH4/CO2/N2O por grupo (matriz G de n x 3) y multiplicarla por la
+matriz de pesos de los K escenarios: todos los totales salen de un único producto matricial.
+"""
+import numpy as np
+import polars as pl
+
+from enhanced_data_processing import GWP_VALUES, ENVIRONMENTAL_DAMAGE_FACTORS, COMBINED_IMPACT_WEIGHTS
+
+# Orden de los gases en las matrices de pesos (columnas de la matriz K x 3)
+SCENARIO_GASES = ['CH4', 'CO2', 'N2O']
+
+# Conjuntos de GWP publicados por el IPCC. Los valores por defecto del proyecto
+# (`GWP_VALUES`, 28/265) coinciden con AR5 GWP100. AR6 distingue el metano fósil (29.8 a
+# 100 años, 82.5 a 20 años) del no fósil: los dos horizontes usan el no fósil, para que
+# comparar GWP100 con GWP20 solo cambie el horizonte temporal.
+GWP_PRESETS = {
+    'AR4 GWP100': {'CH4': 25, 'CO2': 1, 'N2O': 298},
+    'AR5 GWP100': {'CH4': 28, 'CO2': 1, 'N2O': 265},
+    'AR6 GWP100 (CH4 no fósil)': {'CH4': 27.0, 'CO2': 1, 'N2O': 273},
+    'AR6 GWP20 (CH4 no fósil)': {'CH4': 79.7, 'CO2': 1, 'N2O': 273}
+}
+
+# Columnas de resultado en formato largo
+SCENARIO_COLUMN = 'Escenario'
+SCENARIO_VALUE_COLUMNS = ['Total_GWP_weighted', 'Total_damage_weighted', 'Impacto_Combinado']
+
+def weights_matrix(weight_sets):
+    """
+    Convierte un diccionario nombre -> pesos en (nombres, matriz K x 3).
+    Los pesos de cada escenario pueden ser un diccionario por gas o una secuencia en el orden de `SCENARIO_GASES`.
+    """
+    names = list(weight_sets)
+    rows = []
+    for name in names:
+        weights = weight_sets[name]
+        if isinstance(weights, dict):
+            weights = [weights[gas] for gas in SCENARIO_GASES]
+        rows.append(weights)
+    matrix = np.asarray(rows, dtype=np.float64).reshape(len(names), len(SCENARIO_GASES))
+    return names, matrix
+
+def compute_scenarios(df, gwp_sets=None, damage_sets=None, impact_weights=None, by=('Anio',)):
+    """
+    Calcula los totales ponderados de K escenarios a la vez.
+
+    `gwp_sets` es un diccionario nombre -> pesos GWP (por defecto, `GWP_PRESETS`);
+    `damage_sets`, si se indica, debe tener los mismos nombres y sustituye a
+    `ENVIRONMENTAL_DAMAGE_FACTORS` en cada escenario. `impact_weights` sustituye a
+    `COMBINED_IMPACT_WEIGHTS`. `df` puede ser el DataFrame procesado o el cubo.
+
+    Devuelve un DataFrame largo con las columnas de `by`, `Escenario` y
+    `SCENARIO_VALUE_COLUMNS`, una fila por grupo y escenario.
+    """
+    gwp_sets = GWP_PRESETS if gwp_sets is None else gwp_sets
+    names, gwp_matrix = weights_matrix(gwp_sets)
+    if damage_sets is None:
+        damage_matrix = np.tile(weights_matrix({'': ENVIRONMENTAL_DAMAGE_FACTORS})[1], (len(names), 1))
+    else:
+        damage_matrix = weights_matrix({name: damage_sets[name] for name in names})[1]
+    impact_weights = COMBINED_IMPACT_WEIGHTS if impact_weights is None else impact_weights
+    impact_matrix = impact_weights['gwp'] * gwp_matrix + impact_weights['damage'] * damage_matrix
+
+    # Suma de emisiones por gas y grupo: G (n x 3)
+    by = list(by)
+    gas_sums = [pl.col(f'{gas}_eq').cast(pl.Float64).sum() for gas in SCENARIO_GASES]
+    grouped = df.group_by(by).agg(gas_sums).sort(by) if by else df.select(gas_sums)
+    gas_matrix = grouped.select([f'{gas}_eq' for gas in SCENARIO_GASES]).to_numpy()
+
+    # Un único producto matricial G (n x 3) @ W.T (3 x 3K) con GWP, daño e impacto de todos los escenarios
+    weights = np.vstack([gwp_matrix, damage_matrix, impact_matrix])
+    results = gas_matrix @ weights.T
+    n_groups, n_scenarios = gas_matrix.shape[0], len(names)
+
+    # Formato largo: bloques de n filas por escenario
+    long = {
+        SCENARIO_COLUMN: pl.Series(np.repeat(names, n_groups), dtype=pl.Enum(names)),
+        **{
+            col: results[:, block * n_scenarios:(block + 1) * n_scenarios].T.reshape(-1)
+            for block, col in enumerate(SCENARIO_VALUE_COLUMNS)
+        }
+    }
+    result = pl.DataFrame(long)
+    if by:
+        keys = grouped.select(by).select(pl.all().gather(np.tile(np.arange(n_groups), n_scenarios)))
+        result = pl.concat([keys, result], how='horizontal')
+    return result
+
+def scenario_deltas(scenarios, baseline, value_col='Total_GWP_weighted', by=('Anio',)):
+    """
+    Diferencia absoluta y relativa (%) de cada escenario respecto al escenario `baseline`.
+    """
+    by = list(by)
+    base = scenarios.filter(pl.col(SCENARIO_COLUMN) == baseline).select(by + [pl.col(value_col).alias('_base')])
+    joined = scenarios.join(base, on=by, how='left') if by else scenarios.join(base, how='cross')
+    return joined.with_columns(
+        (pl.col(value_col) - pl.col('_base')).alias('Diferencia'),
+        ((pl.col(value_col) / pl.col('_base') - 1) * 100).alias('Diferencia_pct')
+    ).drop('_base')
+
+if __name__ == "__main__":
+    from enhanced_data_processing import process_data_with_weighting
+
+    df = process_data_with_weighting("data/proyecto2.csv")
+    totals = compute_scenarios(df, {**GWP_PRESETS, 'Proyecto': GWP_VALUES}, by=())
+    print(scenario_deltas(totals, 'Proyecto', by=()))
@@ -0,0 +1,89 @@
+"""
+Informe del tiempo de importación de los puntos de entrada (dashboard y CLIs).
+
+Ejecuta el módulo en un subproceso con `python -X importtime`, agrega el tiempo
+acumulado de cada import de primer nivel y lista los módulos más costosos. Los
+módulos indicados en `deferred` se importan después del punto de entrada, en el
+mismo proceso, para medir por separado el coste que se aplaza hasta que se
+muestra la sección que los usa.
+
+Uso:
+    python startup_profile.py main --budget-ms 1500
+    python main.py --profile-startup
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+# Los módulos del proyecto se importan desde su directorio, sea cual sea el directorio actual
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _run_importtime(statement):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            capture_output=True, text=True, cwd=PROJECT_DIR)
+    if result.returncode != 0:
+        raise RuntimeError(f"Error al ejecutar '{statement}':\n{result.stderr[-2000:]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            # La sangría indica la profundidad: 1 espacio = import de primer nivel
+            entries.append((name, len(indent) // 2, int(self_us), int(cumulative_us)))
+    return entries
+
+def profile_imports(module, deferred=()):
+    """
+    Mide el import de `module` y, a continuación, el de cada módulo de `deferred`.
+
+    Devuelve un diccionario con el tiempo total de arranque (ms), el tiempo de cada
+    módulo diferido (ms) y la lista de módulos ordenada por tiempo propio.
+    """
+    statement = f"import {module}"
+    for name in deferred:
+        statement += f"; import {name}"
+    entries = _run_importtime(statement)
+
+    # El tiempo acumulado de un import de primer nivel incluye el de todos sus hijos; los
+    # módulos que el intérprete carga antes de la sentencia (site, encodings...) no cuentan
+    top_level = {name: cumulative for name, depth, _, cumulative in entries if depth == 0}
+    startup_us = top_level.get(module, 0)
+    deferred_us = {name: top_level[name] for name in deferred if name in top_level}
+    by_self_time = sorted(((name, self_us) for name, _, self_us, _ in entries), key=lambda item: item[1], reverse=True)
+    return {
+        'module': module,
+        'startup_ms': startup_us / 1000,
+        'deferred_ms': {name: deferred_us.get(name, 0) / 1000 for name in deferred},
+        'modules_by_self_time': [(name, self_us / 1000) for name, self_us in by_self_time]
+    }
+
+def print_import_report(module, deferred=(), top=15):
+    """
+    Imprime el informe de `profile_imports` y lo devuelve.
+    """
+    report = profile_imports(module, deferred)
+    print(f"Arranque de '{module}': {report['startup_ms']:,.0f} ms")
+    for name, ms in report['deferred_ms'].items():
+        print(f"  diferido '{name}': {ms:,.0f} ms adicionales (ya cargado si 0)")
+    print(f"\nMódulos con mayor tiempo propio de importación (top {top}):")
+    for name, ms in report['modules_by_self_time'][:top]:
+        print(f"  {ms:>8.1f} ms  {name}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("module", help="Módulo a importar (por ejemplo, main o batch_export)")
+    parser.add_argument("--deferred", nargs="*", default=[], help="Módulos que el punto de entrada importa más tarde")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Falla (código 1) si el arranque supera este tiempo, para detectar regresiones")
+    args = parser.parse_args()
+
+    report = print_import_report(args.module, args.deferred, args.top)
+    if args.budget_ms is not None and report['startup_ms'] > args.budget_ms:
+        print(f"\nEl arranque ({report['startup_ms']:,.0f} ms) supera el presupuesto de {args.budget_ms:,.0f} ms")
+        sys.exit(1)
@@ -0,0 +1,195 @@
+"""
+Tendencias y proyecciones por clasificación, calculadas para todas las categorías a la vez.
+
+Las sumas por (Anio, Clasificacion) se pivotan a una matriz año x categoría (años
+consecutivos en filas, NaN donde no hay dato) y cada indicador es una operación vectorizada
+sobre esa matriz: variación interanual, media móvil, TCAC (tasa de crecimiento anual
+compuesta) y la recta de mínimos cuadrados de cada columna, obtenida con sumas enmascaradas
+en lugar de un ajuste por categoría. El coste crece con el tamaño de la matriz, no con un
+bucle de Python por categoría.
+"""
+import numpy as np
+import polars as pl
+
+TREND_KEYS = ['Anio', 'Clasificacion']
+
+def year_category_matrix(df, value_col):
+    """
+    Matriz (años x categorías) de la suma de `value_col`.
+
+    Devuelve `(years, categories, matrix)`: los años van del mínimo al máximo sin huecos
+    (los años sin datos quedan como NaN) y `categories`, en orden alfabético, sigue el orden
+    de las columnas.
+    Acepta el DataFrame procesado o el cubo.
+    """
+    totals = df.group_by(TREND_KEYS).agg(pl.sum(value_col).alias(value_col))
+    if totals.is_empty():
+        return np.array([], dtype=np.int64), [], np.empty((0, 0))
+    years = np.arange(totals['Anio'].min(), totals['Anio'].max() + 1)
+    wide = (
+        pl.DataFrame({'Anio': years}, schema={'Anio': totals.schema['Anio']})
+        .join(totals.with_columns(pl.col('Clasificacion').cast(pl.String))
+              .pivot(on='Clasificacion', index='Anio', values=value_col), on='Anio', how='left')
+        .sort('Anio')
+    )
+    # `pivot` ordena las columnas por orden de aparición: se reordenan explícitamente
+    categories = sorted(col for col in wide.columns if col != 'Anio')
+    matrix = wide.select(pl.col(categories).cast(pl.Float64)).to_numpy()
+    return years, categories, matrix
+
+def rolling_mean(matrix, window):
+    """
+    Media móvil de `window` años por columna, sobre los valores disponibles de la ventana
+    (NaN si la ventana no tiene ninguno). Sumas acumuladas: una sola pasada por columna.
+    """
+    valid = ~np.isnan(matrix)
+    sums = np.vstack([np.zeros((1, matrix.shape[1])), np.cumsum(np.where(valid, matrix, 0.0), axis=0)])
+    counts = np.vstack([np.zeros((1, matrix.shape[1])), np.cumsum(valid, axis=0)])
+    start = np.maximum(np.arange(1, matrix.shape[0] + 1) - window, 0)
+    window_sums = sums[1:] - sums[start]
+    window_counts = counts[1:] - counts[start]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(window_counts > 0, window_sums / window_counts, np.nan)
+
+def year_over_year(matrix):
+    """
+    Variación porcentual respecto al año anterior (NaN en el primer año, sin dato o con base 0).
+    """
+    change = np.full(matrix.shape, np.nan)
+    previous = matrix[:-1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        change[1:] = np.where(previous != 0, (matrix[1:] - previous) / np.abs(previous) * 100, np.nan)
+    return change
+
+def _first_last_valid(years, matrix):
+    """
+    Año y valor del primer y del último dato de cada columna (NaN si la columna está vacía).
+    """
+    valid = ~np.isnan(matrix)
+    has_data = valid.any(axis=0)
+    first = np.argmax(valid, axis=0)
+    last = matrix.shape[0] - 1 - np.argmax(valid[::-1], axis=0)
+    columns = np.arange(matrix.shape[1])
+    nan_if_empty = lambda values: np.where(has_data, values, np.nan)  # noqa: E731
+    return (nan_if_empty(years[first]), nan_if_empty(matrix[first, columns]),
+            nan_if_empty(years[last]), nan_if_empty(matrix[last, columns]))
+
+def linear_trend(years, matrix):
+    """
+    Recta de mínimos cuadrados de cada columna usando solo los años con dato.
+
+    Devuelve `(slope, intercept, r2, n, x0)`, donde la recta es `intercept + slope * (año - x0)`
+    con `x0` la media de `years` (centrar los años evita la pérdida de precisión). Las columnas
+    con menos de dos datos, o con un único año distinto, quedan como NaN.
+    """
+    x0 = years.mean()
+    x = (years - x0)[:, None]
+    valid = ~np.isnan(matrix)
+    y = np.where(valid, matrix, 0.0)
+    w = valid.astype(np.float64)
+    n = w.sum(axis=0)
+    sx, sy = (w * x).sum(axis=0), y.sum(axis=0)
+    sxx, sxy, syy = (w * x * x).sum(axis=0), (y * x).sum(axis=0), (y * y).sum(axis=0)
+    cov = n * sxy - sx * sy
+    var_x = n * sxx - sx * sx
+    var_y = n * syy - sy * sy
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = np.where((n >= 2) & (var_x > 0), cov / var_x, np.nan)
+        intercept = np.where(n > 0, (sy - slope * sx) / n, np.nan)
+        r2 = np.where(var_y > 0, cov * cov / (var_x * var_y), np.nan)
+    return slope, intercept, r2, n, x0
+
+def trend_summary(df, value_col, target_year=None, fit_years=None):
+    """
+    Indicadores de tendencia de cada clasificación, una fila por categoría:
+
+    - `Anio_inicial`/`Valor_inicial` y `Anio_final`/`Valor_final`: primer y último dato;
+    - `TCAC_pct`: tasa de crecimiento anual compuesta entre ambos (solo con valores positivos);
+    - `Variacion_ultimo_anio_pct`: variación interanual del último año del rango;
+    - `Pendiente_anual`, `R2`: recta de mínimos cuadrados (de los últimos `fit_years` años si se indica);
+    - `Pronostico` para `Anio_objetivo` (por defecto, diez años después del último año) según esa recta.
+    """
+    years, categories, matrix = year_category_matrix(df, value_col)
+    if not categories:
+        return pl.DataFrame(schema={'Clasificacion': pl.String})
+    target_year = int(years[-1]) + 10 if target_year is None else int(target_year)
+
+    first_year, first_value, last_year, last_value = _first_last_valid(years, matrix)
+    span = last_year - first_year
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cagr = np.where((first_value > 0) & (last_value > 0) & (span > 0),
+                        (np.power(last_value / first_value, 1 / np.where(span > 0, span, 1)) - 1) * 100, np.nan)
+
+    fit_rows = slice(-fit_years, None) if fit_years else slice(None)
+    slope, intercept, r2, n, x0 = linear_trend(years[fit_rows], matrix[fit_rows])
+
+    return pl.DataFrame({
+        'Clasificacion': categories,
+        'Anio_inicial': first_year,
+        'Valor_inicial': first_value,
+        'Anio_final': last_year,
+        'Valor_final': last_value,
+        'TCAC_pct': cagr,
+        'Variacion_ultimo_anio_pct': year_over_year(matrix)[-1],
+        'Pendiente_anual': slope,
+        'R2': r2,
+        'Anios_ajuste': n.astype(np.int64),
+        'Anio_objetivo': np.full(len(categories), target_year),
+        'Pronostico': intercept + slope * (target_year - x0)
+    }).with_columns(pl.col(pl.Float64).fill_nan(None)).with_columns(
+        pl.col('Anio_inicial', 'Anio_final').cast(pl.Int64)
+    )
+
+def trend_series(df, value_col, window=3):
+    """
+    Serie anual de cada clasificación en formato largo: `Valor`, `Variacion_interanual_pct`
+    y `Media_movil` (ventana de `window` años). Solo incluye los años con dato.
+    """
+    years, categories, matrix = year_category_matrix(df, value_col)
+    if not categories:
+        return pl.DataFrame(schema={'Anio': pl.Int64, 'Clasificacion': pl.String, 'Valor': pl.Float64})
+    n_years, n_categories = matrix.shape
+    # Orden de columnas (Fortran): cada categoría ocupa un bloque contiguo de años
+    return pl.DataFrame({
+        'Anio': np.tile(years, n_categories),
+        'Clasificacion': np.repeat(np.asarray(categories, dtype=object), n_years),
+        'Valor': matrix.ravel(order='F'),
+        'Variacion_interanual_pct': year_over_year(matrix).ravel(order='F'),
+        'Media_movil': rolling_mean(matrix, window).ravel(order='F')
+    }, schema_overrides={'Clasificacion': pl.String}).filter(pl.col('Valor').is_not_nan()).with_columns(
+        pl.col(pl.Float64).fill_nan(None)
+    )
+
+def forecast_series(summary, categories=None):
+    """
+    Puntos de la proyección lineal de cada clasificación, desde su último año con dato
+    hasta `Anio_objetivo`, en formato largo (Anio, Clasificacion, Pronostico).
+    """
+    if categories is not None:
+        summary = summary.filter(pl.col('Clasificacion').is_in(list(categories)))
+    summary = summary.drop_nulls(['Pendiente_anual', 'Anio_final', 'Pronostico'])
+    if summary.is_empty():
+        return pl.DataFrame(schema={'Anio': pl.Int64, 'Clasificacion': pl.String, 'Pronostico': pl.Float64})
+    start = summary['Anio_final'].to_numpy()
+    target = summary['Anio_objetivo'].to_numpy()
+    slope = summary['Pendiente_anual'].to_numpy()
+    offsets = np.arange(max(int((target - start).max()), 0) + 1)
+    years = start[:, None] + offsets[None, :]
+    # La recta pasa por el pronóstico del año objetivo con la pendiente ajustada
+    values = summary['Pronostico'].to_numpy()[:, None] - slope[:, None] * (target[:, None] - years)
+    keep = years <= target[:, None]
+    return pl.DataFrame({
+        'Anio': years[keep],
+        'Clasificacion': np.repeat(summary['Clasificacion'].to_numpy(), keep.sum(axis=1)),
+        'Pronostico': values[keep]
+    }, schema_overrides={'Clasificacion': pl.String})
+
+if __name__ == "__main__":
+    from enhanced_data_processing import process_data_with_weighting
+    from category_hierarchy import attach_category_index, leaves_only
+
+    df = leaves_only(attach_category_index(process_data_with_weighting("data/proyecto2.csv")))
+    summary = trend_summary(df, "Total_Emisiones", target_year=2035)
+    print("Clasificaciones con mayor crecimiento (pendiente anual, CO2eq/año):")
+    print(summary.sort("Pendiente_anual", descending=True, nulls_last=True).head(10))
+    print(trend_series(df, "Total_Emisiones").head())
@@ -1,33 +1,23 @@
+import os
+
 import polars as pl
-import plotly.express as px
 
-def process_data_for_viz(file_path):
-    df = pl.read_csv(file_path)
-    df = df.rename({
-        'AÑO': 'Anio',
-        'CLASIFICACION': 'Clasificacion',
-        'CH4_eq': 'CH4_eq',
-        'CO2_eq': 'CO2_eq',
-        'N2O_eq': 'N2O_eq',
-        'Total_Emisiones': 'Total_Emisiones',
-        'Emisiones_netas': 'Emisiones_netas'
-    })
-    numeric_cols = ['CH4_eq', 'CO2_eq', 'N2O_eq', 'Total_Emisiones', 'Emisiones_netas']
-    for col in numeric_cols:
-        if col in df.columns:
-            df = df.with_columns(pl.col(col).cast(pl.String).str.replace_all(",", ".").cast(pl.Float64))
-    for col in numeric_cols:
-        if col in df.columns:
-            df = df.with_columns(pl.col(col).fill_null(0))
-    return df
+from charts import line_figure, bar_figure
+from csv_loader import load_emissions_csv
+
+def process_data_for_viz(file_path, schema=None):
+    # Renombrado, conversión numérica y relleno de nulos en una sola pasada del cargador compartido
+    return load_emissions_csv(file_path, schema=schema)
 
-def generate_visualizations(df):
+def generate_visualizations(df, output_dir="."):
+    os.makedirs(output_dir, exist_ok=True)
     # Visualización 1: Emisiones Totales por Año
     emisiones_por_anio = df.group_by('Anio').agg(pl.sum('Total_Emisiones').alias('Total_Emisiones_Anual')).sort('Anio')
-    fig1 = px.line(emisiones_por_anio.to_pandas(), x='Anio', y='Total_Emisiones_Anual',
-                   title='Tendencia de Emisiones Totales por Año',
-                   labels={'Anio': 'Año', 'Total_Emisiones_Anual': 'Emisiones Totales (CO2eq)'})
-    fig1.write_html("emisiones_totales_por_anio.html")
+    fig1 = line_figure(emisiones_por_anio['Anio'].to_numpy(),
+                       {'Total_Emisiones_Anual': emisiones_por_anio['Total_Emisiones_Anual'].to_numpy()},
+                       title='Tendencia de Emisiones Totales por Año',
+                       x_title='Año', y_title='Emisiones Totales (CO2eq)')
+    fig1.write_html(os.path.join(output_dir, "emisiones_totales_por_anio.html"))
     print("Gráfico 'emisiones_totales_por_anio.html' generado exitosamente.")
 
     # Visualización 2: Emisiones por Tipo de Gas a lo largo del Tiempo (Área Stacked)
@@ -39,16 +29,12 @@ def generate_visualizations(df):
         pl.sum('N2O_eq').alias('N2O_eq')
     ).sort('Anio')
 
-    # Convertir a formato largo para Plotly Express
-    emisiones_gases_por_anio_pd = emisiones_gases_por_anio.to_pandas().melt(id_vars=['Anio'],
-                                                                           value_vars=['CH4_eq', 'CO2_eq', 'N2O_eq'],
-                                                                           var_name='Tipo_Gas',
-                                                                           value_name='Emisiones')
-
-    fig2 = px.area(emisiones_gases_por_anio_pd, x='Anio', y='Emisiones', color='Tipo_Gas',
-                   title='Emisiones por Tipo de Gas a lo largo del Tiempo',
-                   labels={'Anio': 'Año', 'Emisiones': 'Emisiones (CO2eq)', 'Tipo_Gas': 'Tipo de Gas'})
-    fig2.write_html("emisiones_por_tipo_gas.html")
+    # Cada columna de gas es una traza del área apilada (sin pasar a formato largo)
+    fig2 = line_figure(emisiones_gases_por_anio['Anio'].to_numpy(),
+                       {col: emisiones_gases_por_anio[col].to_numpy() for col in ['CH4_eq', 'CO2_eq', 'N2O_eq']},
+                       title='Emisiones por Tipo de Gas a lo largo del Tiempo',
+                       x_title='Año', y_title='Emisiones (CO2eq)', legend_title='Tipo de Gas', stacked=True)
+    fig2.write_html(os.path.join(output_dir, "emisiones_por_tipo_gas.html"))
     print("Gráfico 'emisiones_por_tipo_gas.html' generado exitosamente.")
 
     # Visualización 3: Top 10 Clasificaciones con Mayores Emisiones (Barra Horizontal)
@@ -57,11 +43,11 @@ def generate_visualizations(df):
         pl.sum('Total_Emisiones').alias('Suma_Total_Emisiones')
     ).sort('Suma_Total_Emisiones', descending=True).head(10)
 
-    fig3 = px.bar(emisiones_por_clasificacion.to_pandas(), x='Suma_Total_Emisiones', y='Clasificacion',
-                   orientation='h', title='Top 10 Clasificaciones con Mayores Emisiones',
-                   labels={'Suma_Total_Emisiones': 'Emisiones Totales (CO2eq)', 'Clasificacion': 'Clasificación'})
-    fig3.update_layout(yaxis={'categoryorder':'total ascending'})
-    fig3.write_html("top_clasificaciones_emisiones.html")
+    fig3 = bar_figure(emisiones_por_clasificacion['Suma_Total_Emisiones'].to_numpy(),
+                      emisiones_por_clasificacion['Clasificacion'].to_numpy(),
+                      title='Top 10 Clasificaciones con Mayores Emisiones',
+                      x_title='Emisiones Totales (CO2eq)', y_title='Clasificación')
+    fig3.write_html(os.path.join(output_dir, "top_clasificaciones_emisiones.html"))
     print("Gráfico 'top_clasificaciones_emisiones.html' generado exitosamente.")
 
 if __name__ == "__main__":